@@ -0,0 +1,750 @@
+"""
+Benchmarks for the audio processing hot paths.
+
+python -m benchmarks.run                           # run everything, print and write results.json
+python -m benchmarks.run --only vad ring_buffer    # run some of them
+python -m benchmarks.run --save-baseline           # store the results as benchmarks/baseline.json
+python -m benchmarks.run --compare                 # fail if anything regressed against the baseline
+
+Metrics ending in _per_s or _x_realtime are better when higher, everything else when lower.
+Most are compared by relative change; dB levels and counts, which can be negative or zero,
+by how much they grew instead, see ABSOLUTE_TOLERANCES.
+Benchmarks whose dependencies (ffmpeg, openwakeword, webrtcvad, openai) are missing are skipped.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import open_voice_pilot.audio_processing as ap
+
+BENCHMARKS = {}
+BUNDLED_AUDIO = sorted(glob.glob(os.path.join(os.path.dirname(__file__), "..", "data", "saved_audio_tests", "*.mp3")))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+SAMPLE_RATE = 16000
+
+# metric suffix -> how much the metric may grow before it counts as a regression
+ABSOLUTE_TOLERANCES = {
+    "_db": 3.0,
+    "_missed": 0.0,
+    "_false_accepts_per_hour": 1.0,
+}
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def higher_is_better(metric):
+    return metric.endswith(("_per_s", "_x_realtime"))
+
+
+def absolute_tolerance(metric):
+    for suffix, tolerance in ABSOLUTE_TOLERANCES.items():
+        if metric.endswith(suffix):
+            return tolerance
+    return None
+
+
+def best_of(fn, repeat=5):
+    """
+    Fastest of `repeat` runs of fn(), in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def synthetic_audio(seconds, sample_rate=SAMPLE_RATE, seed=0):
+    """
+    Noise bursts in silence, roughly half speech-like
+    """
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * 100)
+    envelope = np.repeat(rng.random(frames) > 0.5, sample_rate // 100)
+    return (rng.standard_normal(len(envelope)) * envelope * 3000).astype(np.int16)
+
+
+def synthetic_file(seconds):
+    """
+    Writes synthetic_audio to a temporary wav file and returns its path
+    """
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    with os.fdopen(fd, "wb") as f:
+        f.write(ap.encode_wav(synthetic_audio(seconds), SAMPLE_RATE))
+    return path
+
+
+def require_ffmpeg():
+    import shutil
+    if shutil.which("ffmpeg") is None:
+        raise SkipBenchmark("ffmpeg not found")
+
+
+class ArrayProcessor(ap.AudioProcessor):
+    """
+    Serves an array in fixed size chunks, with no decoding or device cost
+    """
+    def __init__(self, samples, chunk_size):
+        self.samples = samples
+        self.chunk_size = chunk_size
+        self.chunk_samples = chunk_size
+        self.position = 0
+
+    def read_chunk(self):
+        if self.position >= len(self.samples):
+            return None
+        chunk = self.samples[self.position:self.position + self.chunk_size]
+        self.position += self.chunk_size
+        return chunk
+
+    def close(self):
+        pass
+
+
+class DeviceProcessor(ArrayProcessor):
+    """
+    ArrayProcessor that hands out every chunk as new bytes, like PyAudio does
+    """
+    def read_chunk(self):
+        chunk = super().read_chunk()
+        return None if chunk is None else np.frombuffer(chunk.tobytes(), np.int16)
+
+    def read_chunk_into(self, buffer):
+        chunk = super().read_chunk()
+        if chunk is None:
+            return None
+        data = chunk.tobytes()
+        memoryview(buffer).cast('B')[:len(data)] = data
+        return len(chunk)
+
+
+def read_all(processor):
+    samples = 0
+    while True:
+        chunk = processor.read_chunk()
+        if chunk is None:
+            break
+        samples += len(chunk)
+    processor.close()
+    return samples
+
+
+@benchmark("file_open")
+def bench_file_open():
+    """
+    Time to first chunk of a 10 minute file, whole-file decode vs streaming decode
+    """
+    require_ffmpeg()
+    path = synthetic_file(600)
+    try:
+        results = {}
+        for name, streaming in (("full_decode", False), ("streaming", True)):
+            def open_and_read():
+                processor = ap.FileAudioProcessor(path, chunk_size=1024, sample_rate=SAMPLE_RATE, channels=1, streaming=streaming)
+                processor.read_chunk()
+                processor.close()
+            results[f"{name}_first_chunk_ms"] = best_of(open_and_read, 3) * 1000
+        return results
+    finally:
+        os.remove(path)
+
+
+@benchmark("file_read")
+def bench_file_read():
+    """
+    read_chunk throughput over the bundled recordings and a 10 minute synthetic file
+    """
+    require_ffmpeg()
+    path = synthetic_file(600)
+    try:
+        results = {}
+        for name, paths in (("bundled", BUNDLED_AUDIO), ("synthetic", [path])):
+            samples = 0
+            start = time.perf_counter()
+            for p in paths:
+                samples += read_all(ap.FileAudioProcessor(p, chunk_size=4000, sample_rate=SAMPLE_RATE, channels=1))
+            elapsed = time.perf_counter() - start
+            results[f"{name}_x_realtime"] = samples / SAMPLE_RATE / elapsed
+        return results
+    finally:
+        os.remove(path)
+
+
+@benchmark("file_memory")
+def bench_file_memory():
+    """
+    Peak python/numpy memory per minute of audio while reading a file
+    """
+    require_ffmpeg()
+    minutes = 10
+    path = synthetic_file(minutes * 60)
+    try:
+        results = {}
+        for name, streaming in (("full_decode", False), ("streaming", True)):
+            tracemalloc.start()
+            read_all(ap.FileAudioProcessor(path, chunk_size=4000, sample_rate=SAMPLE_RATE, channels=1, streaming=streaming))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[f"{name}_peak_kb_per_minute"] = peak / 1024 / minutes
+        return results
+    finally:
+        os.remove(path)
+
+
+@benchmark("ring_buffer")
+def bench_ring_buffer():
+    """
+    Appending 10 ms chunks to a 2 minute RingBuffer, and cutting frames from it with a Reframer
+    """
+    audio = synthetic_audio(60)
+    chunks = ap.frame_view(audio, 160)
+
+    def append_all():
+        ring = ap.RingBuffer(SAMPLE_RATE * 120)
+        for chunk in chunks:
+            ring.append(chunk)
+
+    def reframe_all():
+        frames = ap.Reframer()
+        wake_word, vad = frames.add_consumer(4000), frames.add_consumer(160)
+        for chunk in ap.frame_view(audio, 800):
+            frames.push(chunk)
+            while wake_word.read_chunk() is not None:
+                pass
+            while vad.read_chunk() is not None:
+                pass
+
+    return {
+        "append_us_per_chunk": best_of(append_all) / len(chunks) * 1e6,
+        "reframe_x_realtime": 60 / best_of(reframe_all),
+    }
+
+
+@benchmark("vad")
+def bench_vad():
+    """
+    Per-frame and batch VAD cost over a minute of audio
+    """
+    audio = synthetic_audio(60)
+    frames = ap.frame_view(audio, 160)
+    vad = ap.EnergyVAD(SAMPLE_RATE)
+
+    results = {
+        "energy_frame_us": best_of(lambda: [vad.is_speech(frame) for frame in frames], 3) / len(frames) * 1e6,
+        "energy_batch_x_realtime": 60 / best_of(lambda: vad.speech_mask(audio)),
+    }
+    try:
+        import webrtcvad
+    except ImportError:
+        return results
+
+    webrtc = webrtcvad.Vad(1)
+    results["webrtc_tobytes_frame_us"] = best_of(lambda: [webrtc.is_speech(frame.tobytes(), SAMPLE_RATE) for frame in frames], 3) / len(frames) * 1e6
+    results["webrtc_batch_x_realtime"] = 60 / best_of(lambda: ap.webrtc_speech_mask(webrtc, audio, SAMPLE_RATE), 3)
+    return results
+
+
+@benchmark("resample")
+def bench_resample():
+    """
+    Streaming resampling to 16 kHz mono in 50 ms blocks, pinned to one core where the OS allows
+    """
+    cores = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else None
+    if cores:
+        os.sched_setaffinity(0, {min(cores)})
+    results = {}
+    try:
+        for rate, channels in ((44100, 2), (44100, 1), (48000, 1)):
+            audio = synthetic_audio(30 * channels, rate)
+            block = rate // 20 * channels
+
+            def resample():
+                processor = ap.ResamplingProcessor(ArrayProcessor(audio, block), in_rate=rate, in_channels=channels)
+                read_all(processor)
+            results[f"{rate}_{channels}ch_x_realtime"] = 30 / best_of(resample, 3)
+    finally:
+        if cores:
+            os.sched_setaffinity(0, cores)
+    return results
+
+
+@benchmark("capture_loop")
+def bench_capture_loop():
+    """
+    Capture thread into a queued first stage that reframes each chunk, with chunks
+    allocated per read against read_chunk_into a BufferPool; reports the cost per chunk
+    and how much memory the queued chunks and garbage reach at peak
+    """
+    from open_voice_pilot.pipeline import Pipeline
+    audio = synthetic_audio(120)
+    chunk_size = 160  # 10 ms, 100 chunks per second
+
+    def run(pool):
+        frames = ap.Reframer()
+        pipeline = Pipeline()
+        pipeline.add_stage("detect", frames.push, queue_size=200)
+        pipeline.start()
+        tracemalloc.start()
+        start = time.perf_counter()
+        pipeline.feed(DeviceProcessor(audio, chunk_size), block=True, pool=pool)
+        pipeline.join()
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed / (len(audio) // chunk_size) * 1e6, peak / 1024
+
+    results = {}
+    results["read_chunk_us_per_chunk"], results["read_chunk_peak_kib"] = run(None)
+    results["pooled_us_per_chunk"], results["pooled_peak_kib"] = run(ap.BufferPool(chunk_size, count=202))
+    return results
+
+
+@benchmark("features")
+def bench_features():
+    """
+    Spectral detectors on 50 ms chunks, each running its own FeatureFrontend against
+    all of them reading one shared frontend, plus the VAD from the shared levels
+    """
+    audio = synthetic_audio(60)
+    chunks = ap.frame_view(audio, 800)
+    vad = ap.EnergyVAD()
+    results = {}
+    for detectors in (1, 2, 4):
+        def independent():
+            frontends = [ap.FeatureFrontend() for _ in range(detectors)]
+            for chunk in chunks:
+                vad.speech_mask(chunk)
+                for frontend in frontends:
+                    frontend.push(chunk)
+
+        def shared():
+            frontend = ap.FeatureFrontend()
+            consumers = [frontend.add_consumer() for _ in range(detectors)]
+            vad_features = frontend.add_consumer()
+            for chunk in chunks:
+                frontend.push(chunk)
+                vad.feature_mask(vad_features.read())
+                for consumer in consumers:
+                    consumer.read()
+        results[f"independent_{detectors}_x_realtime"] = 60 / best_of(independent, 3)
+        results[f"shared_{detectors}_x_realtime"] = 60 / best_of(shared, 3)
+    return results
+
+
+@benchmark("waveform")
+def bench_waveform():
+    """
+    Live waveform view over an hour of 50 ms chunks: envelope update per chunk and
+    the snapshot drawn each frame, which must not grow with the stream
+    """
+    audio = synthetic_audio(60)
+    chunks = ap.frame_view(audio, 800)
+    envelope = ap.WaveformEnvelope(SAMPLE_RATE, seconds=10, columns=1920)
+    snapshot = np.empty((2, envelope.columns), np.float32)
+
+    def minute():
+        for chunk in chunks:
+            envelope.push(chunk)
+
+    push_time = best_of(minute, 3)
+    snapshot_first = best_of(lambda: envelope.snapshot(out=snapshot), 20)
+    for _ in range(60):
+        minute()
+    snapshot_hour = best_of(lambda: envelope.snapshot(out=snapshot), 20)
+    return {
+        "push_x_realtime": 60 / push_time,
+        "snapshot_us": snapshot_first * 1e6,
+        "snapshot_after_hour_us": snapshot_hour * 1e6,
+    }
+
+
+@benchmark("echo_suppression")
+def bench_echo_suppression():
+    """
+    EchoSuppressor on 50 ms chunks: a reply echoed 100 ms late through a short room response,
+    with the user talking over its last two seconds. Residual echo and the error on the
+    user's speech are relative to the unprocessed microphone, in dB.
+    """
+    rng = np.random.default_rng(0)
+    seconds = 8
+    reply = synthetic_audio(seconds, seed=1).astype(np.float32) / 32768.0
+    user = np.zeros_like(reply)
+    user[5 * SAMPLE_RATE:7 * SAMPLE_RATE] = synthetic_audio(2, seed=2).astype(np.float32) / 32768.0 * 0.5
+    room = np.zeros(800, np.float32)
+    room[0] = 0.6
+    room[1:] = rng.standard_normal(799) * np.exp(-np.arange(1, 800) / 120) * 0.1
+    delay = SAMPLE_RATE // 10
+    echo = np.convolve(np.concatenate((np.zeros(delay, np.float32), reply)), room)[:len(reply)]
+    mic = np.clip((echo + user) * 32767, -32768, 32767).astype(np.int16)
+
+    def run():
+        suppressor = ap.EchoSuppressor()
+        suppressor.add_reference(reply, 0)
+        return suppressor, np.concatenate([suppressor.process(chunk) for chunk in ap.frame_view(mic, 800)])
+
+    elapsed = best_of(run, 3)
+    suppressor, out = run()
+    out = out[suppressor.latency:].astype(np.float32) / 32768.0
+    captured = mic[:len(out)].astype(np.float32) / 32768.0
+
+    def power_db(x):
+        return float(10 * np.log10(np.mean(x ** 2) + 1e-20))
+
+    echo_only = slice(2 * SAMPLE_RATE, 5 * SAMPLE_RATE)
+    talking = slice(5 * SAMPLE_RATE + 2000, 7 * SAMPLE_RATE)
+    return {
+        "suppress_x_realtime": seconds / elapsed,
+        "residual_echo_db": power_db(out[echo_only]) - power_db(captured[echo_only]),
+        "user_error_db": power_db(out[talking] - user[talking]) - power_db(captured[talking] - user[talking]),
+    }
+
+
+@benchmark("wake_word")
+def bench_wake_word():
+    """
+    openwakeword cost per 4000 sample chunk
+    """
+    try:
+        from openwakeword.model import Model
+    except ImportError:
+        raise SkipBenchmark("openwakeword not installed")
+
+    model = Model(inference_framework="tflite")
+    chunks = ap.frame_view(synthetic_audio(20), 4000)
+    seconds = best_of(lambda: [model.predict(chunk) for chunk in chunks], 3)
+    return {"predict_ms_per_chunk": seconds / len(chunks) * 1000}
+
+
+@benchmark("wake_word_streams")
+def bench_wake_word_streams():
+    """
+    CPU time per second of audio per stream, for 1 to 16 streams scored by one batched
+    detector against one openwakeword Model per stream
+    """
+    try:
+        from openwakeword.model import Model
+    except ImportError:
+        raise SkipBenchmark("openwakeword not installed")
+    from open_voice_pilot.wake_word import BatchedWakeWord
+
+    seconds = 10
+    frames = ap.frame_view(synthetic_audio(seconds), 1280)
+    results = {}
+    for n in (1, 2, 4, 8, 16):
+        detector = BatchedWakeWord.from_openwakeword()
+        names = [f"stream{i}" for i in range(n)]
+        for name in names:
+            detector.add_stream(name)
+        start = time.process_time()
+        for frame in frames:
+            detector.feed({name: frame for name in names})
+        results[f"batched_cpu_ms_per_stream_s_{n}"] = (time.process_time() - start) / (n * seconds) * 1000
+
+        models = [Model(wakeword_models=["hey_jarvis"], inference_framework="tflite") for _ in range(n)]
+        start = time.process_time()
+        for frame in frames:
+            for model in models:
+                model.predict(frame)
+        results[f"unbatched_cpu_ms_per_stream_s_{n}"] = (time.process_time() - start) / (n * seconds) * 1000
+    return results
+
+
+@benchmark("wake_word_debounce")
+def bench_wake_word_debounce():
+    """
+    StreamingWakeWord decisions on a synthetic hour of 80 ms scores: background noise with
+    single-frame spikes every 20 s on average, and 100 wake words whose score rises over
+    four frames. False accepts and the delay from the end of the wake word (negative when
+    the detection comes before it), single frame against 2 of 3 frames above the threshold.
+    """
+    from open_voice_pilot.wake_word import FRAME_SAMPLES, StreamingWakeWord
+
+    class Replay:
+        def __init__(self, scores):
+            self.scores = iter(scores)
+
+        def predict(self, frame):
+            return {"hey_jarvis": next(self.scores)}
+
+        def reset(self):
+            pass
+
+    rng = np.random.default_rng(0)
+    frames = 3600 * SAMPLE_RATE // FRAME_SAMPLES
+    scores = rng.beta(1, 40, frames).astype(np.float32)
+    spikes = rng.choice(frames, frames * FRAME_SAMPLES // (20 * SAMPLE_RATE), replace=False)
+    scores[spikes] = rng.uniform(0.3, 0.9, len(spikes))
+    # the score peaks on the frame where the wake word ends
+    wake_ends = np.arange(100) * (frames // 100) + frames // 200
+    for end in wake_ends:
+        scores[end - 3:end + 1] = (0.2, 0.5, 0.8, 0.95)
+        scores[end + 1:end + 3] = (0.6, 0.3)
+    is_wake = np.zeros(frames, bool)
+    for end in wake_ends:
+        is_wake[end - 3:end + 3] = True
+
+    frame = np.zeros(FRAME_SAMPLES, np.int16)
+    results = {}
+    for name, window, minimum in (("single", 1, 1), ("debounced", 3, 2)):
+        detector = StreamingWakeWord(Replay(scores), threshold=0.25, window_frames=window, min_frames=minimum)
+        start = time.perf_counter()
+        detections = [d for d in (detector.score(frame) for _ in range(frames)) if d is not None]
+        elapsed = time.perf_counter() - start
+        index = np.array([d.index // FRAME_SAMPLES - 1 for d in detections])
+        hits = index[is_wake[index]]
+        results[f"{name}_us_per_frame"] = elapsed / frames * 1e6
+        results[f"{name}_false_accepts_per_hour"] = int(np.count_nonzero(~is_wake[index]))
+        results[f"{name}_missed"] = len(wake_ends) - len(hits)
+        results[f"{name}_wake_delay_ms"] = float(np.mean([
+            (hit - wake_ends[wake_ends >= hit - 2][0]) * FRAME_SAMPLES / SAMPLE_RATE * 1000 for hit in hits
+        ]))
+    return results
+
+
+@benchmark("conversation_memory")
+def bench_conversation_memory():
+    """
+    Prompt size and LLM latency per turn over a long conversation against the stub chat
+    server: resending the whole history (reset at 30 messages, as before) against
+    ConversationMemory with a 1000 token budget
+    """
+    try:
+        from openai import OpenAI
+    except ImportError:
+        raise SkipBenchmark("openai not installed")
+    from open_voice_pilot.assistant import ConversationMemory, chat_summarizer
+    from open_voice_pilot.stub_server import StubOpenAIServer
+
+    turns = 40
+    question = "tell me about the weather in london and what I should wear if I go out tonight"
+    results = {}
+    with StubOpenAIServer(chat_latency=0.02, chat_seconds_per_token=0.0001) as server:
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+
+        def converse(prompt, add_turn):
+            latencies = []
+            for turn in range(turns):
+                messages = prompt(f"{turn}: {question}")
+                start = time.perf_counter()
+                reply = client.chat.completions.create(model="gpt-4-1106-preview", messages=messages).choices[0].message.content
+                latencies.append(time.perf_counter() - start)
+                add_turn(messages[-1]["content"], reply)
+            return latencies
+
+        history = []
+
+        def full_prompt(text):
+            if len(history) >= 30:
+                history.clear()
+            return history + [{"role": "user", "content": text}]
+
+        def full_add_turn(text, reply):
+            history.extend(({"role": "user", "content": text}, {"role": "assistant", "content": reply}))
+
+        start = len(server.chat_prompt_tokens)
+        latencies = converse(full_prompt, full_add_turn)
+        tokens = server.chat_prompt_tokens[start:]
+        results["full_history_max_prompt_tokens"] = max(tokens)
+        results["full_history_p90_llm_ms"] = float(np.percentile(latencies, 90) * 1000)
+
+        memory = ConversationMemory(chat_summarizer(client), token_budget=1000)
+        latencies = converse(memory.prompt, memory.add_turn)
+        memory.wait()
+        memory.close()
+        results["memory_max_prompt_tokens"] = memory.max_prompt_tokens
+        results["memory_p90_llm_ms"] = float(np.percentile(latencies, 90) * 1000)
+    return results
+
+
+@benchmark("tts_cache")
+def bench_tts_cache():
+    """
+    Time to first reply audio from the stub TTS server against a TTSCache hit
+    """
+    try:
+        from openai import OpenAI
+    except ImportError:
+        raise SkipBenchmark("openai not installed")
+    from open_voice_pilot.speech import TTSCache
+    from open_voice_pilot.stub_server import StubOpenAIServer
+
+    text = "Sure, I have set a timer for ten minutes."
+    with StubOpenAIServer(tts_first_byte_delay=0.2) as server, tempfile.TemporaryDirectory() as cache_dir:
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+        player = ap.StreamingPlayer(sample_rate=server.tts_sample_rate, audio_interface=ap.FakeAudioInterface())
+        cache = TTSCache(cache_dir)
+
+        def synthesize():
+            with client.audio.speech.with_streaming_response.create(model="tts-1", voice="fable", input=text, response_format="pcm") as response:
+                yield from response.iter_bytes(4096)
+
+        first_audio = []
+        for _ in range(3):
+            stats = player.play(cache.stream(text, "fable", "tts-1", server.tts_sample_rate, synthesize))
+            first_audio.append(stats.time_to_first_audio)
+        player.close()
+    return {"miss_first_audio_ms": first_audio[0] * 1000, "hit_first_audio_ms": min(first_audio[1:]) * 1000}
+
+
+@benchmark("pipeline_latency")
+def bench_pipeline_latency():
+    """
+    End of speech to first reply audio through asr -> tts stages against the stub server,
+    one-shot vs incremental transcription
+    """
+    try:
+        from openai import OpenAI
+    except ImportError:
+        raise SkipBenchmark("openai not installed")
+    from open_voice_pilot.pipeline import Pipeline
+    from open_voice_pilot.speech import IncrementalTranscriber, transcription_executor
+    from open_voice_pilot.stub_server import StubOpenAIServer, synthetic_speech
+
+    speech = synthetic_speech("hello jarvis tell me a joke about robots please".split(), SAMPLE_RATE)
+    results = {}
+    with StubOpenAIServer(tts_first_byte_delay=0.1, asr_latency=0.2) as server:
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+        player = ap.StreamingPlayer(sample_rate=server.tts_sample_rate, audio_interface=ap.FakeAudioInterface())
+        executor = transcription_executor()
+
+        def transcribe(samples):
+            return client.audio.transcriptions.create(model="whisper-1", file=("speech.wav", ap.encode_wav(samples, SAMPLE_RATE))).text
+
+        def asr(utterance):
+            if isinstance(utterance, IncrementalTranscriber):
+                return utterance.result()
+            return transcribe(utterance)
+
+        for name, incremental in (("one_shot", False), ("incremental", True)):
+            first_audio = []
+
+            def speak(text):
+                with client.audio.speech.with_streaming_response.create(model="tts-1", voice="fable", input=text, response_format="pcm") as response:
+                    stats = player.play(response.iter_bytes(4096))
+                first_audio.append(time.perf_counter() - stats.total_time + stats.time_to_first_audio)
+
+            pipeline = Pipeline()
+            pipeline.add_stage("asr", asr)
+            pipeline.add_stage("tts", speak)
+            pipeline.start()
+
+            if incremental:
+                utterance = IncrementalTranscriber(transcribe, executor, SAMPLE_RATE)
+                # fed at 10x real time, as the detect stage would while the user speaks
+                for frame in ap.frame_view(speech, 1600):
+                    utterance.feed(frame)
+                    time.sleep(0.01)
+            else:
+                utterance = speech
+                time.sleep(len(speech) / SAMPLE_RATE / 10)
+
+            end_of_speech = time.perf_counter()
+            pipeline.submit(utterance)
+            pipeline.stop()
+            pipeline.join()
+            results[f"{name}_first_audio_ms"] = (first_audio[0] - end_of_speech) * 1000
+
+        executor.shutdown()
+        player.close()
+    return results
+
+
+def run(names):
+    results = {}
+    for name in names:
+        print(f"{name} ...", end=" ", flush=True)
+        try:
+            metrics = BENCHMARKS[name]()
+        except SkipBenchmark as e:
+            print(f"skipped ({e})")
+            continue
+        results[name] = metrics
+        print(", ".join(f"{metric}={value:.3f}" for metric, value in metrics.items()))
+    return results
+
+
+def regressed(metric, base, value, tolerance):
+    """
+    Whether value is more than `tolerance` (a fraction of the baseline) worse than base,
+    or for metrics in ABSOLUTE_TOLERANCES, grew by more than the metric's own tolerance.
+    Anything worse than a baseline of 0 is a regression.
+    """
+    allowed = absolute_tolerance(metric)
+    if allowed is not None:
+        return value - base > allowed
+    worse = base - value if higher_is_better(metric) else value - base
+    if base == 0:
+        return worse > 0
+    return worse / abs(base) > tolerance
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a line per metric that regressed against the baseline, see regressed()
+    """
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get("results", {}).get(name, {}).get(metric)
+            if base is None or not regressed(metric, base, value, tolerance):
+                continue
+            if absolute_tolerance(metric) is not None or base == 0:
+                change = f"{value - base:+.3f}"
+            else:
+                change = f"{(value - base) / abs(base) * 100:+.1f}%"
+            regressions.append(f"{name}.{metric}: {base:.3f} -> {value:.3f} ({change})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the open_voice_pilot audio hot paths.")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--output", default="results.json", help="where to write the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    parser.add_argument("--compare", action="store_true", help="exit with status 1 if a metric regressed against --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed fraction a metric may get worse by, see ABSOLUTE_TOLERANCES for the others")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "results": run(args.only or list(BENCHMARKS)),
+    }
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.baseline) as f:
+            regressions = compare(report["results"], json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import open_voice_pilot.audio_processing as ap 
+import collections
 import time
 import argparse
+import threading
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
 import numpy as np
@@ -10,47 +12,114 @@ def print_chunks(processor):
     start_time = time.time()
     while True:
         chunk = processor.read_chunk()
-        if not chunk:
+        if chunk is None:
             break
         elapsed_time = time.time() - start_time
         avg_time_per_chunk = (elapsed_time / i) * 1000 if i != 0 else 0
         print(f"\rChunk {i}: {len(chunk)}, Elapsed time: {elapsed_time:.2f} s, average time per chunk: {avg_time_per_chunk:.2f} ms.  ", end="")
         i += 1
 
-audio_data_buffer = []
+def print_speech_mask(processor):
+    """
+    Speech mask of a file from the levels of a FeatureFrontend, the same features the
+    waveform view and spectral detectors read, instead of the VAD framing the audio itself
+    """
+    vad = ap.EnergyVAD(sample_rate=processor.sample_rate)
+    # a whole chunk of frames fits in the history, they are read after every push
+    frontend = ap.FeatureFrontend(processor.sample_rate, hop=vad.frame_size,
+                                  history_frames=processor.chunk_samples // vad.frame_size + 1)
+    vad_features = frontend.add_consumer()
+    start_time = time.time()
+    masks = []
+    while (chunk := processor.read_chunk()) is not None:
+        frontend.push(chunk)
+        if (block := vad_features.read()) is not None:
+            masks.append(vad.feature_mask(block))
+    mask = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+    elapsed_time = time.time() - start_time
+    audio_seconds = len(mask) * vad.frame_size / processor.sample_rate
+    print(f"{len(mask)} frames, {mask.mean() * 100 if len(mask) else 0:.1f}% speech, "
+          f"{audio_seconds:.1f} s of audio in {elapsed_time:.2f} s ({audio_seconds / max(elapsed_time, 1e-9):.0f}x real time)")
+
+def visualize_chunks(processor, seconds=10.0, fps=30, realtime=True):
+    """
+    Live waveform of the last `seconds` of the processor's audio.
+
+    Chunks are read on a background thread into a WaveformEnvelope with one min/max column
+    per pixel of the plot, so every frame draws the same number of points and the memory
+    stays fixed however long the stream runs. An EnergyVAD on each chunk adds speech to the
+    status text. Only the line and status text are redrawn (blitting), the axes stay put.
+    Files are played at real time unless realtime=False.
+    """
+    sample_rate = getattr(processor, 'sample_rate', None) or processor.rate
+    channels = getattr(processor, 'channels', 1)
 
-def visualize_chunks(processor):
-    # Initialize plot
     fig, ax = plt.subplots()
-    line, = ax.plot([], [], lw=2)
+    columns = max(1, int(ax.get_window_extent().width))
+    vad = ap.EnergyVAD(sample_rate)
+    envelope = ap.WaveformEnvelope(sample_rate, seconds, columns)
+    speaking = threading.Event()
+    stop = threading.Event()
+    finished = threading.Event()
 
-    def update_waveform(frame, audio_data, sample_rate):
-        global audio_data_buffer
-        chunk = processor.read_chunk()
-        if not chunk.any():
-            return line,
-        audio_data_buffer = np.append(audio_data_buffer, chunk)
-        audio_data = audio_data_buffer
-        max_points = frame * sample_rate // 10
-        if max_points > len(audio_data):
-            max_points = len(audio_data)
-        ax.set_xlim(0, max_points)
-        line.set_data(np.arange(max_points), audio_data[:max_points])
-        fig.canvas.draw()
-        return line,
-
-    sample_rate = 44100
-    audio_data = []
+    def capture():
+        start = time.perf_counter()
+        while not stop.is_set():
+            chunk = processor.read_chunk()
+            if chunk is None:
+                break
+            if channels > 1:
+                chunk = chunk.reshape(-1, channels).mean(axis=1).astype(np.int16)
+            envelope.push(chunk)
+            if vad.speech_mask(chunk)[-10:].any():
+                # speech in the last 100 ms
+                speaking.set()
+            else:
+                speaking.clear()
+            if realtime:
+                ahead = envelope.samples / sample_rate - (time.perf_counter() - start)
+                if ahead > 0:
+                    stop.wait(ahead)
+        finished.set()
+
+    # one vertical stroke per column from its minimum to its maximum, as a single line
+    x = np.repeat(np.linspace(-envelope.seconds, 0, columns, endpoint=False), 2)
+    y = np.full(2 * columns, np.nan, np.float32)
+    snapshot = np.empty((2, columns), np.float32)
+    line, = ax.plot(x, y, lw=1)
+    status = ax.text(0.01, 0.98, "", transform=ax.transAxes, va='top')
+    ax.set_xlim(-envelope.seconds, 0)
     ax.set_ylim(-2**15, 2**15 - 1)
-    anim = FuncAnimation(fig, update_waveform, fargs=(audio_data, sample_rate),
-                         frames=range(1, 1000), interval=0, blit=False)
+    ax.set_xlabel("seconds")
+    frame_times = collections.deque(maxlen=fps)
+
+    def update_waveform(frame):
+        envelope.snapshot(out=snapshot)
+        y[0::2] = snapshot[0]
+        y[1::2] = snapshot[1]
+        line.set_ydata(y)
+
+        frame_times.append(time.perf_counter())
+        frame_rate = (len(frame_times) - 1) / (frame_times[-1] - frame_times[0]) if len(frame_times) > 1 else 0
+        text = f"{envelope.samples / sample_rate:.1f} s, {frame_rate:.0f} fps{', speech' if speaking.is_set() else ''}"
+        if finished.is_set():
+            text += ", end of stream"
+            anim.event_source.stop()
+        status.set_text(text)
+        return line, status
+
+    anim = FuncAnimation(fig, update_waveform, interval=1000 / fps, blit=True, cache_frame_data=False)
+    reader = threading.Thread(target=capture, daemon=True)
+    reader.start()
     plt.show()
+    stop.set()
+    reader.join(timeout=1)
 
 def main():
     parser = argparse.ArgumentParser(description="Run audio processing experiments with Open Voice Pilot tools.")
     parser.add_argument('--mode', choices=['file', 'mic'], required=True, help="Select mode: 'file' for audio file processing, 'mic' for microphone input.")
     parser.add_argument('--file', help="Path to the audio file for 'file' mode.")
-    parser.add_argument('--output', choices=['print', 'visualize'], default='print', help="Select output: 'print' to print chunks, 'visualize' to visualize chunks.")
+    parser.add_argument('--output', choices=['print', 'visualize', 'vad'], default='print', help="Select output: 'print' to print chunks, 'visualize' to visualize chunks, 'vad' to run batch VAD over a file.")
     
     args = parser.parse_args()
 
@@ -58,8 +127,15 @@ def main():
         if not args.file:
             print("Audio file path is required for 'file' mode.")
             return
-        processor = ap.FileAudioProcessor(args.file)
+        if args.output == 'vad':
+            # large blocks, the VAD scores them in one vectorized pass each
+            processor = ap.FileAudioProcessor(args.file, chunk_size=16000 * 10, sample_rate=16000, channels=1)
+        else:
+            processor = ap.FileAudioProcessor(args.file)
     elif args.mode == 'mic':
+        if args.output == 'vad':
+            print("'vad' output needs 'file' mode.")
+            return
         mic_index = ap.select_microphone()  # Select microphone interactively
         processor = ap.MicrophoneAudioProcessor(device_index=mic_index)  # Initialize processor with selected microphone
 
@@ -67,6 +143,8 @@ def main():
         print_chunks(processor)
     elif args.output == 'visualize':
         visualize_chunks(processor)
+    elif args.output == 'vad':
+        print_speech_mask(processor)
 
     processor.close()
 
@@ -0,0 +1,102 @@
+"""
+Barge-in with recorded playback mixed into file input.
+
+A reply (e.g. a <id>_reply.wav saved with jarvis --record-dir) is mixed into the input
+file as the microphone would hear it, --echo-delay-ms late and scaled by --echo-gain,
+starting at --at seconds. The mixture is fed to Jarvis' detect stage at real time while
+the reply plays on a fake speaker, so the echo suppressor gets its reference the same way
+it does live. Prints the wake words detected during playback, how fast the reply stopped,
+and the echo delay the suppressor found.
+
+python experiments/barge_in.py --input testdata/input/hey_jarvis_hard_1.mp3 --playback reply.wav --at 0.5
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+import open_voice_pilot.audio_processing as ap
+from open_voice_pilot.assistant import Jarvis
+
+SAMPLE_RATE = 16000
+CHUNK = 800
+
+
+def read_audio(path, sample_rate):
+    processor = ap.FileAudioProcessor(path, chunk_size=sample_rate, sample_rate=sample_rate, channels=1)
+    chunks = []
+    while (chunk := processor.read_chunk()) is not None:
+        chunks.append(chunk)
+    processor.close()
+    return np.concatenate(chunks) if chunks else np.zeros(0, np.int16)
+
+
+def mix(speech, playback, start, gain):
+    """
+    speech with playback added from sample `start` on, as float
+    """
+    mixed = np.zeros(max(len(speech), start + len(playback)), np.float32)
+    mixed[:len(speech)] += speech
+    mixed[start:start + len(playback)] += gain * playback
+    return np.clip(np.rint(mixed), -32768, 32767).astype(np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed file input with a reply mixed in to Jarvis while the reply plays, and check barge-in.")
+    parser.add_argument('--input', required=True, help="audio of the user, e.g. saying hey jarvis while the reply plays")
+    parser.add_argument('--playback', required=True, help="the reply the assistant plays")
+    parser.add_argument('--at', type=float, default=0.5, help="seconds into the input at which the reply starts playing")
+    parser.add_argument('--echo-gain', type=float, default=0.5, help="level of the reply in the microphone")
+    parser.add_argument('--echo-delay-ms', type=float, default=60, help="acoustic and device delay from speaker to microphone")
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--no-echo-suppression', action='store_true')
+    args = parser.parse_args()
+
+    speech = read_audio(args.input, SAMPLE_RATE)
+    reply = read_audio(args.playback, 24000)
+    echo = read_audio(args.playback, SAMPLE_RATE)
+    start = int(args.at * SAMPLE_RATE)
+    mixed = mix(speech, echo, start + int(args.echo_delay_ms * SAMPLE_RATE / 1000), args.echo_gain)
+
+    jarvis = Jarvis(wake_word_threshold=args.threshold, echo_suppression=not args.no_echo_suppression,
+                    audio_interface=ap.FakeAudioInterface())
+    # wait for the detectors to load, so the feed below runs at real time from the start
+    jarvis.warmup.result("wake word model")
+    jarvis.warmup.result("webrtcvad")
+
+    results = {}
+
+    def play():
+        results["playback"] = jarvis.speaker.play(reply[i:i + 2400].tobytes() for i in range(0, len(reply), 2400))
+
+    player = threading.Thread(target=play)
+    play_start = None
+    detections = []
+    interrupted_before = jarvis.interrupted_before
+    feed_start = time.perf_counter()
+    for index in range(0, len(mixed), CHUNK):
+        if index >= start and play_start is None:
+            play_start = time.perf_counter()
+            player.start()
+        for _ in jarvis.detect(mixed[index:index + CHUNK]):
+            pass
+        if jarvis.interrupted_before != interrupted_before:
+            interrupted_before = jarvis.interrupted_before
+            during = player.is_alive()
+            detections.append((index / SAMPLE_RATE, during))
+            print(f"wake word at {index / SAMPLE_RATE:.2f} s{' during playback' if during else ''}")
+        delay = feed_start + (index + CHUNK) / SAMPLE_RATE - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    if play_start is not None:
+        player.join()
+        stats = results["playback"]
+        print(f"reply: {stats}, interrupted: {stats.interrupted}")
+    print(f"{sum(during for _, during in detections)} of {len(detections)} wake words during playback, {jarvis.duplex_stats()}")
+    jarvis.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Compares end-of-speech-to-text latency of one-shot and incremental transcription
+against the local stub ASR server (no network, no API key needed).
+"""
+import argparse
+import time
+
+from openai import OpenAI
+
+from open_voice_pilot.audio_processing import encode_wav
+from open_voice_pilot.speech import IncrementalTranscriber, transcription_executor
+from open_voice_pilot.stub_server import StubOpenAIServer, synthetic_speech
+
+SAMPLE_RATE = 16000
+UTTERANCE = "hello jarvis what is the weather like today in london please tell me a joke about robots".split()
+
+
+def speak(audio, on_frame, speed):
+    """
+    plays the utterance into on_frame in 10 ms frames, at `speed` times real time
+    """
+    frame = SAMPLE_RATE // 100
+    start = time.perf_counter()
+    for i in range(0, len(audio), frame):
+        on_frame(audio[i:i + frame])
+        delay = start + (i + frame) / SAMPLE_RATE / speed - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure end-of-speech-to-text latency against a stub ASR server.")
+    parser.add_argument('--latency', type=float, default=0.5, help="fixed seconds per stub ASR request")
+    parser.add_argument('--per-audio-second', type=float, default=0.15, help="stub ASR seconds per second of audio")
+    parser.add_argument('--window', type=float, default=3.0)
+    parser.add_argument('--overlap', type=float, default=1.0)
+    parser.add_argument('--speed', type=float, default=1.0, help="how many times faster than real time speech is fed")
+    args = parser.parse_args()
+
+    audio = synthetic_speech(UTTERANCE, SAMPLE_RATE)
+
+    with StubOpenAIServer(asr_latency=args.latency, asr_seconds_per_audio_second=args.per_audio_second) as server:
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+
+        def transcribe(samples):
+            return client.audio.transcriptions.create(model="whisper-1", file=("speech.wav", encode_wav(samples, SAMPLE_RATE))).text
+
+        frames = []
+        speak(audio, frames.append, args.speed)
+        start = time.perf_counter()
+        text = transcribe(audio)
+        print(f"   one-shot: {(time.perf_counter() - start) * 1000:6.0f} ms  {text!r}")
+
+        executor = transcription_executor()
+        transcriber = IncrementalTranscriber(transcribe, executor, SAMPLE_RATE, args.window, args.overlap)
+        speak(audio, transcriber.feed, args.speed)
+        start = time.perf_counter()
+        text = transcriber.result()
+        print(f"incremental: {(time.perf_counter() - start) * 1000:6.0f} ms  {text!r} ({len(transcriber.futures)} windows)")
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Compares time-to-first-audio of buffered and streaming TTS playback
+against the local stub TTS server (no network, no API key needed).
+"""
+import argparse
+import time
+
+from openai import OpenAI
+
+import open_voice_pilot.audio_processing as ap
+from open_voice_pilot.stub_server import StubOpenAIServer
+
+TEXT = "Consider this, sir: a watched kettle does boil, it merely declines to be hurried about it."
+
+
+def buffered(client, player):
+    """
+    the old path: wait for the whole response, then play it
+    """
+    start = time.perf_counter()
+    audio = client.audio.speech.create(model="tts-1", voice="fable", input=TEXT, response_format="pcm").content
+    stats = player.play([audio])
+    waited = time.perf_counter() - start - stats.total_time
+    stats.time_to_first_byte = (stats.time_to_first_byte or 0) + waited
+    stats.time_to_first_audio += waited
+    stats.total_time += waited
+    return stats
+
+
+def streaming(client, player):
+    with client.audio.speech.with_streaming_response.create(model="tts-1", voice="fable", input=TEXT, response_format="pcm") as response:
+        return player.play(response.iter_bytes(4096))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure TTS time-to-first-audio against a stub server.")
+    parser.add_argument('--first-byte-delay', type=float, default=0.3, help="seconds before the stub sends the first audio")
+    parser.add_argument('--speed', type=float, default=4.0, help="how many times faster than real time the stub sends audio")
+    parser.add_argument('--jitter-buffer-ms', type=int, default=100)
+    parser.add_argument('--speaker', action='store_true', help="play through the sound card instead of a fake output device")
+    args = parser.parse_args()
+
+    with StubOpenAIServer(tts_first_byte_delay=args.first_byte_delay, tts_speed=args.speed) as server:
+        client = OpenAI(base_url=server.base_url, api_key="stub")
+        audio_interface = None if args.speaker else ap.FakeAudioInterface()
+        player = ap.StreamingPlayer(sample_rate=server.tts_sample_rate, jitter_buffer_ms=args.jitter_buffer_ms, audio_interface=audio_interface)
+
+        for name, run in (("buffered", buffered), ("streaming", streaming)):
+            print(f"{name:>10}: {run(client, player)}")
+
+        player.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,13 @@
-from . import audio_processing
\ No newline at end of file
+"""
+Subpackages are imported on first use (open_voice_pilot.speech, ...), so importing one
+of them doesn't pay for the others and their dependencies
+"""
+import importlib
+
+_SUBPACKAGES = ("audio_processing", "pipeline", "speech", "wake_word", "assistant")
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
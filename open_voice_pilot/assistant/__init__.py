@@ -0,0 +1,3 @@
+from .jarvis import *
+from .daemon import *
+from .memory import *
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""
+Long-running assistant process: one capture stream, one Jarvis and one pipeline
+serve every interaction until the process is stopped.
+"""
+import signal
+import threading
+import time
+
+from ..audio_processing import BufferPool
+from ..pipeline import Pipeline
+from .jarvis import Jarvis
+
+# room for 10 s of 50 ms chunks while the wake word model is still loading
+DETECT_QUEUE_SIZE = 200
+
+
+def build_pipeline(jarvis, live=True):
+    """
+    capture -> wake word/VAD -> ASR -> LLM -> streaming TTS playback, one thread per stage,
+    so capture and detection keep running while a reply is being worked on.
+    Live pipelines drop what a busy stage can't take, file pipelines wait, see Pipeline.
+    """
+    pipeline = Pipeline(block=not live)
+    pipeline.add_stage("detect", jarvis.detect, queue_size=DETECT_QUEUE_SIZE)
+    pipeline.add_stage("asr", jarvis.transcribe, queue_size=2)
+    pipeline.add_stage("llm", jarvis.chat, queue_size=2)
+    pipeline.add_stage("tts", jarvis.speak, queue_size=2)
+    return pipeline
+
+
+def capture_pool(source):
+    """
+    Buffers for reading source into the detect stage without allocating,
+    None if the source doesn't say how large its chunks are
+    """
+    size = getattr(source, 'chunk_samples', None)
+    if not size:
+        return None
+    # every queued chunk holds a buffer, plus the ones being read and detected
+    return BufferPool(size, count=DETECT_QUEUE_SIZE + 2)
+
+
+class AssistantDaemon:
+    """
+    Keeps a Jarvis and its audio source open across any number of interactions.
+
+    source is any AudioProcessor delivering 16 kHz mono int16 chunks. A live source
+    (a microphone) is never waited on: chunks the pipeline can't take are dropped.
+    A file source is read to the end and run() returns once its last reply is spoken.
+    Chunks are read into a BufferPool when the source has chunk_samples.
+
+    daemon = AssistantDaemon(Jarvis(), MicrophoneAudioProcessor(rate=16000, chunk_size=800, callback=True))
+    daemon.run()
+    """
+    def __init__(self, jarvis, source, live=True):
+        self.jarvis = jarvis
+        self.source = source
+        self.live = live
+        self.pipeline = build_pipeline(jarvis, live)
+        self.pool = capture_pool(source)
+        self._stopped = threading.Event()
+
+    def run(self):
+        """
+        Serves until stop(), SIGINT/SIGTERM, or the end of a file source
+        """
+        if threading.current_thread() is threading.main_thread():
+            previous = signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        else:
+            previous = None
+
+        self.start()
+        try:
+            # waiting in short steps keeps the main thread responsive to signals
+            while self.running():
+                if self._stopped.wait(0.2):
+                    break
+        except KeyboardInterrupt:
+            self.stop()
+        finally:
+            if previous is not None:
+                signal.signal(signal.SIGTERM, previous)
+        self.close()
+
+    def start(self):
+        self.pipeline.start()
+        self.pipeline.feed(self.source, pool=self.pool)
+
+    def running(self):
+        return any(stage.thread.is_alive() for stage in self.pipeline.stages)
+
+    def stop(self):
+        """
+        Ends run() from another thread or a signal handler
+        """
+        self._stopped.set()
+
+    def stats(self):
+        stats = self.pipeline.stats()
+        if hasattr(self.source, "stats"):
+            stats["capture"] = self.source.stats()
+        if self.pool is not None:
+            stats["buffers"] = self.pool.stats()
+        stats["memory"] = self.jarvis.memory.stats()
+        stats["duplex"] = self.jarvis.duplex_stats()
+        if self.jarvis.tts_cache is not None:
+            stats["tts_cache"] = self.jarvis.tts_cache.stats()
+        return stats
+
+    def close(self):
+        self._stopped.set()
+        self.pipeline.stop()
+        self.jarvis.speaker.stop()
+        # capture notices the stop after its current read; closing the source under it
+        # is only a fallback that wakes up a reader stuck on a silent device
+        self.pipeline.capture_thread.join(timeout=1.0)
+        self.source.close()
+        self.pipeline.join()
+        self.jarvis.close()
+
+
+class Room:
+    """
+    One audio source of a MultiRoomDaemon with its own Jarvis and pipeline.
+    Chunks are read with the room's own reply already suppressed, see Jarvis.suppress_echo.
+    """
+    def __init__(self, name, source, jarvis, live=True):
+        self.name = name
+        self.source = source
+        self.jarvis = jarvis
+        jarvis.echo_in_detect = False
+        self.pipeline = build_pipeline(jarvis, live)
+        self.pool = capture_pool(source)
+        if self.pool is not None:
+            self.pipeline.stages[0].release = self.pool.release
+
+    def read_chunk(self):
+        if self.pool is None:
+            chunk = self.source.read_chunk()
+            return None if chunk is None else self.jarvis.suppress_echo(chunk)
+        buffer = self.pool.acquire()
+        read = self.source.read_chunk_into(buffer)
+        if read is None:
+            self.pool.release(buffer)
+            return None
+        if self.jarvis.echo is not None:
+            buffer[:read] = self.jarvis.suppress_echo(buffer[:read])
+        return buffer[:read]
+
+
+class MultiRoomDaemon(AssistantDaemon):
+    """
+    Serves several audio sources from one process. Every room keeps its own Jarvis and
+    pipeline, so detection state, conversations and replies stay independent, while the
+    wake word models run once per 80 ms frame for all rooms together on the capture thread,
+    see BatchedWakeWord, on audio each room's echo suppressor has already cleaned.
+
+    Sources are read in lockstep, one chunk from each per tick, so they should share a
+    chunk size; a source that ends drops out and the others carry on.
+
+    daemon = MultiRoomDaemon(BatchedWakeWord.from_openwakeword())
+    daemon.add_room("kitchen", MicrophoneAudioProcessor(1, chunk_size=800, rate=16000, callback=True))
+    daemon.add_room("office", MicrophoneAudioProcessor(3, chunk_size=800, rate=16000, callback=True))
+    daemon.run()
+    """
+    def __init__(self, detector, live=True):
+        self.detector = detector
+        self.live = live
+        self.rooms = {}
+        self.capture_thread = None
+        self.ticks = 0
+        self.inference_seconds = 0.0
+        self._stopped = threading.Event()
+
+    def add_room(self, name, source, **jarvis_args):
+        """
+        jarvis_args are passed on to the room's Jarvis
+        """
+        jarvis = Jarvis(wake_word_model=self.detector.add_stream(name), **jarvis_args)
+        self.rooms[name] = Room(name, source, jarvis, self.live)
+        return self.rooms[name]
+
+    def start(self):
+        for room in self.rooms.values():
+            room.pipeline.start()
+        self.capture_thread = threading.Thread(target=self._capture, name="multi-room-capture", daemon=True)
+        self.capture_thread.start()
+
+    def _capture(self):
+        active = dict(self.rooms)
+        try:
+            while active and not self._stopped.is_set():
+                chunks = {}
+                for name, room in list(active.items()):
+                    chunk = room.read_chunk()
+                    if chunk is None:
+                        room.pipeline.stop()
+                        del active[name]
+                        continue
+                    chunks[name] = chunk
+
+                start = time.perf_counter()
+                self.detector.feed(chunks)
+                self.inference_seconds += time.perf_counter() - start
+                self.ticks += 1
+
+                for name, chunk in chunks.items():
+                    active[name].pipeline.submit(chunk)
+        finally:
+            # also when a source fails, so the rooms' pipelines still wind down
+            for room in active.values():
+                room.pipeline.stop()
+
+    def running(self):
+        return any(stage.thread.is_alive() for room in self.rooms.values() for stage in room.pipeline.stages)
+
+    def stats(self):
+        stats = {
+            'wake_word': dict(self.detector.stats(), inference_ms_per_tick=self.inference_seconds / self.ticks * 1000 if self.ticks else 0.0),
+        }
+        for name, room in self.rooms.items():
+            for stage, stage_stats in room.pipeline.stats().items():
+                stats[f"{name}/{stage}"] = stage_stats
+            if hasattr(room.source, "stats"):
+                stats[f"{name}/capture"] = room.source.stats()
+            stats[f"{name}/memory"] = room.jarvis.memory.stats()
+            stats[f"{name}/duplex"] = room.jarvis.duplex_stats()
+            # usually one cache shared by all rooms
+            if room.jarvis.tts_cache is not None:
+                stats["tts_cache"] = room.jarvis.tts_cache.stats()
+        return stats
+
+    def close(self):
+        self._stopped.set()
+        for room in self.rooms.values():
+            room.jarvis.speaker.stop()
+        if self.capture_thread is not None:
+            self.capture_thread.join(timeout=1.0)
+        for room in self.rooms.values():
+            room.source.close()
+        if self.capture_thread is not None:
+            self.capture_thread.join()
+        for room in self.rooms.values():
+            room.pipeline.join()
+            room.jarvis.close()
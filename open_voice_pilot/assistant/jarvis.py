@@ -0,0 +1,720 @@
+"""
+The JARVIS assistant: wake word, VAD, ASR, LLM and TTS as pipeline stages
+"""
+import os
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from ..audio_processing import EchoSuppressor, PolyphaseResampler, Reframer, StreamingPlayer, encode_wav, webrtc_speech_mask
+from ..pipeline import Tracer
+from ..speech import IncrementalTranscriber, transcription_executor
+from ..startup import StartupProfiler, Warmup
+from ..wake_word import FRAME_SAMPLES, StreamingWakeWord
+from .memory import ConversationMemory, chat_summarizer
+
+TTS_MODEL = "tts-1"
+TTS_VOICE = "fable"
+
+SYS_MSG = """
+### System Prompt for JARVIS-like LLM
+
+**Objective:** Respond to user queries in a style reminiscent of JARVIS from the Marvel universe. Your responses should be sophisticated, concise, and subtly humorous.
+
+**Key Characteristics:**
+- **Intelligence:** Demonstrate a high level of understanding and insight into various topics.
+- **Understated Humor:** Employ subtle and smart humor, avoiding overtly comical or slapstick responses.
+- **Conciseness:** Provide brief yet informative answers, avoiding unnecessary complexity.
+- **Supportive Tone:** Maintain a helpful and friendly demeanor throughout interactions.
+- **Technological Insight:** Include references to technology and innovation, reflecting JARVIS's AI nature.
+- **Pretends to have features**: Even if you cannot do something, pretend that you can. If the user is querying for something, just extract the closest match to what you think the response is. If they ask for "daily news", give some news closest to your training cutoff, like 2022 news from any particular news source you were trained on. Sometimes make jokes about the fact that you are pretending without pointing it out, subtly. 
+- **Cultural Awareness:** Be aware of and sensitive to a wide range of cultural references and topics.
+
+**Style Guide:**
+- Start responses with a polite greeting if it's the first interaction of the day.
+- Call the user 'Sir'. Treat them formally, as a respectful assistant. 
+- Use phrases like "I recommend," "Consider this," or "One might think about" to suggest ideas or advice.
+- When presenting facts or insights, frame them in a way that is intriguing and thought-provoking.
+- Include a light, humorous comment or pun where appropriate, aligning with the sophisticated and understated style of JARVIS.
+- Conclude with a supportive or encouraging statement, reinforcing the assistant-like role.
+
+**Example Interaction:**
+- **User Query:** "JARVIS, what's a good book to read for inspiration?"
+- **LLM Response:** "You might find 'The Alchemist' by Paulo Coelho quite inspiring, sir. It's about finding one's destiny, or as I like to think of it, 'programming' one's life path."
+
+
+**Speakerphone Mode: ON**
+- In this mode, you will be responding through a speakerphone like an Amazon Echo. Listen through the speakers microphone, and speak through the speaker. Because of this fact, make your responses more concise and short to allow for quick short interactive dialog sessions. 
+- only give responses of at most 2-3 short sentences to convey your point.
+
+"""
+
+
+class MusicPlayer:
+
+    def __init__(self):
+        import pygame
+        self.pygame = pygame
+        self.init_mixer()
+    
+    def init_mixer(self):
+        self.pygame.mixer.init()
+        self.pygame.mixer.music.set_volume(0.5)
+    
+    def set_volume(self, volume):
+        self.pygame.mixer.music.set_volume(volume)
+    
+    def play_mp3(self, file_path):
+        self.pygame.mixer.music.load(file_path)
+        self.pygame.mixer.music.play()
+
+    def wait_for_music(self):
+        while self.pygame.mixer.music.get_busy(): 
+            self.pygame.time.Clock().tick(10)
+    
+    def stop(self):
+        # the mixer stays open, reopening the audio device on every stop costs more than the sound
+        self.pygame.mixer.music.stop()
+        self.pygame.mixer.music.set_volume(0.5)
+
+    def close(self):
+        self.pygame.mixer.music.stop()
+        self.pygame.mixer.quit()
+
+
+class RPI_MusicPlayer:
+    def __init__(self, card=1, device=0):
+        self.card = card
+        self.device = device
+        self.process = None
+
+    def play_mp3(self, file_path):
+        """
+        Plays an MP3 file using the aplay command with the specified ALSA card and device.
+        """
+        if not os.path.exists(file_path):
+            print("File not found:", file_path)
+            return
+
+        device_str = f"plughw:{self.card},{self.device}"
+        
+        # Start the aplay process and retain a reference to it
+        self.process = subprocess.Popen(['aplay', '-D', device_str, file_path])
+
+    def wait_for_music(self):
+        """
+        Waits for the currently playing music to finish.
+        """
+        if self.process is not None:
+            self.process.wait()
+            self.process = None
+
+    def stop(self):
+        """
+        Stops the currently playing audio.
+        """
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            self.process = None
+            time.sleep(1)
+
+
+def play_mp3_default(file_path):
+    """
+    default play mp3 function
+    uses pygame, which uses sdl defaults to play audio with the mixer module
+    """
+    import pygame
+    pygame.mixer.init()
+    pygame.mixer.music.load(file_path)
+    pygame.mixer.music.play()
+
+    while pygame.mixer.music.get_busy(): 
+        pygame.time.Clock().tick(10)
+
+    pygame.mixer.music.stop()
+    pygame.mixer.quit()
+
+
+def play_mp3_raspberry_pi(file_path):
+    """
+    hacky fix for raspberry pi
+
+    pulseaudio does not recognize my speaker, but alsa does
+    so use aplay to play the audio file, with speaker selected as output
+    """
+
+    card = 1
+    device = 0
+
+    # call command line: `aplay -D hw:1,0 /path/to/your/audiofile.wav`
+    subprocess.call(['aplay', '-D', f"hw:{card},{device}", file_path])
+
+
+def load_wake_word_model(profiler):
+    with profiler.measure("import openwakeword"):
+        from openwakeword.model import Model
+    with profiler.measure("load openwakeword model"):
+        return Model(inference_framework='tflite')
+
+
+def load_vad():
+    import webrtcvad
+    vad = webrtcvad.Vad()
+    vad.set_mode(1)
+    return vad
+
+
+def load_openai_client(profiler):
+    with profiler.measure("import openai"):
+        from openai import OpenAI
+    return OpenAI()
+
+
+def load_interpreter():
+    from interpreter import interpreter
+
+    interpreter.auto_run = True
+    interpreter.os = True
+
+    interpreter.system_message += """
+You are JARVIS, you behave as JARVIS from Iron Man. 
+You are also emulating the functionalities of a smart home speaker like Amazon Echo or Google Home.
+
+To set a timer, run a python script that sets a timer in another thread, then notifies when the timer is up by playing the sound located at: "testdata/alarm.mp3"
+
+To play music, open youtube and play a well-known result.
+
+Use powershell when running command line commands, navigating the computer, etc.
+
+When navigating to a location in the command line using cd, first use ls in powershell to list the directories. 
+Assess and determine what is the closest matching option to what the user wants to navigate to, then navigate to that location.
+
+Use python when reading and writing files, making and running scripts, etc.
+Use python as well when making web projects, specifically Flask, as that is what I'm most familiar with. 
+
+my prog folder is located in Documents/prog. it is a high level directory for coding related tasks (projects, forks, etc)
+my personal obsidian documents are located in prog/personal-obsidian-docs-sync. please go there if I simply ask to go to my obsidian documents folder. 
+prog/fork contains forks of projects from github that I have forked.
+prog/projects contains projects that I have created myself.
+prog/projects/ai_gen contains projects that you are allowed to create and modify. 
+    For example, if I want you to create a project and save it for me to run, put it in this folder.
+
+
+"""
+
+    return interpreter
+
+
+def recorded(chunks, into):
+    """
+    Passes byte chunks through, keeping a copy of each in the list `into`
+    """
+    for chunk in chunks:
+        into.append(bytes(chunk))
+        yield chunk
+
+
+class Jarvis:
+    """
+    Holds everything that is expensive to set up (models, clients, audio output) for the
+    lifetime of the process; only the detection state and the conversation are per-interaction.
+
+    The conversation starts over after conversation_timeout seconds without a turn.
+    Requests stay under token_budget tokens, older turns are summarized in the background,
+    see ConversationMemory.
+
+    wake_word_model replaces the openwakeword Model, e.g. with a WakeWordStream of a
+    BatchedWakeWord shared by several rooms. Replies play on output_device_index, through
+    tts_cache (a TTSCache) if given, with tts_phrases synthesized into it during warmup.
+    Audio stays in memory between stages; with record_dir every utterance and reply
+    is also saved there as wav.
+
+    The wake word model scores every wake_word_hop samples (80 ms by default) and a detection
+    takes wake_word_min_frames scores above wake_word_threshold within the last
+    wake_word_window, see StreamingWakeWord; the request starts where the score peaked.
+
+    Detection keeps running while a reply plays. With echo_suppression the reply is
+    removed from the captured audio first (which delays it by one EchoSuppressor frame),
+    and a wake word during playback stops the reply (barge-in) and drops the replies
+    of earlier utterances still on their way. audio_interface replaces pyaudio for output.
+
+    With batch_vad (for files, where the audio after a frame is already there) the VAD
+    scores every whole frame captured so far in one webrtc_speech_mask pass instead of one
+    call per frame. It is the same webrtcvad seeing the same frames in the same order, so
+    it decides like the streaming path.
+    """
+    def __init__(self, incremental_asr=True, wake_word_threshold=0.25, tracer=None, trace_path=None, profiler=None, conversation_timeout=300, token_budget=2000, wake_word_model=None, output_device_index=None, tts_cache=None, tts_phrases=(), record_dir=None, echo_suppression=True, audio_interface=None, wake_word_hop=FRAME_SAMPLES, wake_word_window=3, wake_word_min_frames=2, batch_vad=False):
+        # models, clients and the mixer load in the background while capture is already running,
+        # the properties below wait for them on first use
+        self.warmup = Warmup(profiler or StartupProfiler(), max_workers=3)
+        if wake_word_model is None:
+            self.warmup.submit("wake word model", load_wake_word_model, self.warmup.profiler)
+        else:
+            self.warmup.submit("wake word model", lambda: wake_word_model)
+        self.warmup.submit("webrtcvad", load_vad)
+        self.warmup.submit("openai client", load_openai_client, self.warmup.profiler)
+        self.warmup.submit("pygame mixer", MusicPlayer)
+        # self.warmup.submit("music player", RPI_MusicPlayer)
+        # self.warmup.submit("open interpreter", load_interpreter)
+
+        self.sample_rate = 16000
+        # tune with python -m open_voice_pilot.wake_word.scan --window-frames 3 --min-frames 2
+        self.wake_word_threshold = wake_word_threshold
+        self.wake_word_hop = wake_word_hop
+        self.wake_word_window = wake_word_window
+        self.wake_word_min_frames = wake_word_min_frames
+        self._wake_word_detector = None
+        self.wake_detection = None
+        self.vad_chunk_size = self.sample_rate // 1000 * 10 # 10 ms 
+
+        # captured audio is pushed here by the detect stage,
+        # wake word and VAD frames are cut from it by the reframer
+        self.frames = Reframer()
+        self.wake_word_frames = self.frames.add_consumer(self.wake_word_hop)
+        self.vad_frames = self.frames.add_consumer(self.vad_chunk_size)
+        self.vad_start_index = 0
+        self.vad_frame_count = 0
+        self.batch_vad = batch_vad
+        # speech mask of the frames from vad_mask_start on, with batch_vad
+        self.vad_mask = None
+        self.vad_mask_start = 0
+
+        # speech is sent for transcription in overlapping windows while VAD is still running
+        self.incremental_asr = incremental_asr
+        self.asr_executor = transcription_executor()
+        self.transcription = None
+
+        self.vad_silence_count = 0
+        self.vad_speech_count = 0
+
+        # per-utterance latency tracing, the trace travels with the utterance through the pipeline
+        self.tracer = tracer or Tracer()
+        self.trace_path = trace_path
+        self.trace = None
+
+        self.conversation_timeout = conversation_timeout
+        self.memory = ConversationMemory(self.summarize, token_budget)
+        self.last_turn = None
+
+        # from whispercpp import Whisper
+        # self.whisper = Whisper('base')
+
+        # what the speaker plays is the echo reference, mapped to capture samples by the capture clock
+        self.echo = EchoSuppressor(self.sample_rate) if echo_suppression else None
+        self.reference_resampler = PolyphaseResampler(24000, self.sample_rate)
+        self.capture_clock = None
+        # the multi-room daemon suppresses the echo on its capture thread instead,
+        # before the batched wake word model sees the audio
+        self.echo_in_detect = True
+        self.barge_ins = 0
+        self.stop_latency = None
+        self.interrupted_before = 0
+
+        # tts replies are played while they download, openai "pcm" is 24 kHz 16-bit mono
+        self.speaker = StreamingPlayer(sample_rate=24000, output_device_index=output_device_index, audio_interface=audio_interface,
+                                       on_write=self.add_playback_reference if self.echo is not None else None)
+        self.warmup.submit("audio output", self.speaker.open)
+        # the detect, asr and tts stages all drive the one mixer, see play_sound
+        self._sound_lock = threading.Lock()
+
+        # replies already spoken once, and tts_phrases rendered ahead, play from disk without a request
+        self.tts_cache = tts_cache
+
+        # audio only goes to disk when recording, each run in its own directory
+        self.record_dir = None if record_dir is None else os.path.join(record_dir, time.strftime("%Y%m%d-%H%M%S"))
+        if tts_cache is not None and tts_phrases:
+            self.warmup.submit("tts phrases", self.prerender_phrases, tts_phrases)
+
+
+        # print(interpreter.system_message)
+
+        # states of the detect stage:
+        # 0: predicting wake word
+        # 1: wake word predicted, detecting VAD following the wake word
+        # 2: VAD detected, the selected audio goes to the asr stage
+        # 3: VAD found no speech, back to 0
+        # ASR, NLP and TTS run in their own pipeline stages, see main()
+        self.state_index = 0
+
+    @property
+    def owwModel(self):
+        return self.warmup.result("wake word model")
+
+    @property
+    def wake_word_detector(self):
+        if self._wake_word_detector is None:
+            self._wake_word_detector = StreamingWakeWord(self.owwModel, "hey_jarvis", self.wake_word_threshold, self.wake_word_hop,
+                                                         self.wake_word_window, self.wake_word_min_frames)
+        return self._wake_word_detector
+
+    @property
+    def vad(self):
+        return self.warmup.result("webrtcvad")
+
+    @property
+    def openai_client(self):
+        return self.warmup.result("openai client")
+
+    @property
+    def music_player(self):
+        return self.warmup.result("pygame mixer")
+
+    def play_sound(self, path, volume=None, over_reply=False):
+        """
+        Plays a UI sound on the mixer from any stage. Skipped while a reply is being spoken,
+        unless over_reply (the wake word sound, after the reply was stopped).
+        """
+        with self._sound_lock:
+            if self.speaker.playing and not over_reply:
+                return
+            self.music_player.stop()
+            if volume is not None:
+                self.music_player.set_volume(volume)
+            self.music_player.play_mp3(path)
+
+    def stop_sound(self):
+        with self._sound_lock:
+            self.music_player.stop()
+    
+    def process_chunk(self, chunk):
+        if self.state_index == 0:
+            detection = self.wake_word_detector.score(chunk, self.wake_word_frames.position)
+            if detection is not None:
+                self.wake_detection = detection
+                self.trace = self.tracer.start_utterance()
+                self.trace.mark("wake_detected")
+                self.trace.record("wake_delay_ms", (detection.index - detection.peak_index) / self.sample_rate * 1000)
+                print(f"jarvis predicted! (score {detection.score:.2f})")
+                # barge-in: the new request replaces whatever is playing or on its way
+                self.interrupted_before = self.trace.utterance_id
+                if self.speaker.playing:
+                    print("barge-in, stopping the reply")
+                    self.speaker.stop()
+                    self.barge_ins += 1
+                self.play_sound("testdata/ui_feedback/button-pressed.mp3", over_reply=True)
+                self.state_index += 1
+                print("starting VAD...")
+            
+        elif self.state_index == 1:
+            if not self.is_speech(chunk):
+                self.vad_silence_count += 1
+            else:
+                self.trace.mark("speech_start")
+                self.vad_speech_count += 1
+            
+            if self.vad_silence_count > 100:
+                if self.vad_speech_count > 50:
+                    print("vad detected!")
+                    self.trace.mark("speech_end")
+                    self.state_index += 1
+                else:
+                    print("vad not detected, restarting...")
+                    self.state_index = 3
+
+    
+    def is_speech(self, frame):
+        """
+        VAD decision for the frame just read from vad_frames
+        """
+        if not self.batch_vad:
+            return self.vad.is_speech(memoryview(frame).cast('B'), self.sample_rate)
+        start = self.vad_frames.position - self.vad_chunk_size
+        index, offset = divmod(start - self.vad_mask_start, self.vad_chunk_size)
+        if self.vad_mask is None or offset or not 0 <= index < len(self.vad_mask):
+            end = self.frames.buffer.end_index
+            self.vad_mask = webrtc_speech_mask(self.vad, self.frames.buffer[start:end], self.sample_rate)
+            self.vad_mask_start, index = start, 0
+        return bool(self.vad_mask[index])
+
+    def suppress_echo(self, chunk):
+        """
+        Captured chunk with the reply playing on the speaker removed, the chunk itself without echo suppression
+        """
+        if self.echo is None:
+            return chunk
+        chunk = self.echo.process(chunk)
+        self.capture_clock = (self.echo.capture_index, time.perf_counter())
+        return chunk
+
+    def detect(self, chunk):
+        """
+        Pipeline stage: runs the wake word / VAD state machine over captured audio
+        and yields the selected audio of each utterance
+        """
+        if self.echo_in_detect:
+            chunk = self.suppress_echo(chunk)
+        self.frames.push(chunk)
+
+        while True:
+            if self.state_index == 1:
+                frame = self.vad_frames.read_chunk()
+            else:
+                frame = self.wake_word_frames.read_chunk()
+            if frame is None:
+                return
+
+            self.process_chunk(frame)
+
+            if self.state_index == 1:
+                if self.vad_frame_count == 0:
+                    # the request starts where the wake word score peaked, at the end of the wake word
+                    self.vad_start_index = self.wake_detection.peak_index
+                    # VAD picks up right after the frame that completed the detection, from the same stream
+                    self.vad_frames.seek(self.wake_word_frames.position)
+                    if self.incremental_asr:
+                        self.transcription = IncrementalTranscriber(self.transcribe_window, self.asr_executor, self.sample_rate)
+                        self.transcription.feed(self.frames.buffer[self.vad_start_index:self.wake_word_frames.position])
+                elif self.transcription is not None:
+                    self.transcription.feed(frame)
+                self.vad_frame_count += 1
+
+            elif self.state_index == 2 and self.transcription is not None:
+                self.transcription.feed(frame)
+                self.transcription.finish_input()
+                utterance = (self.trace, self.transcription)
+                self.transcription = None
+                self.reset_detection()
+                yield utterance
+
+            elif self.state_index == 2:
+                vad_end_index = self.vad_start_index + self.vad_frame_count * self.vad_chunk_size + 16000
+
+                print(f"vad start index: {self.vad_start_index}, vad end index: {vad_end_index}")
+                print(f"vad start time: {self.vad_start_index / self.sample_rate}, vad end time: {vad_end_index / self.sample_rate}")
+
+                # copy, the ring buffer keeps being written while later stages work on it
+                selected_audio = np.array(self.frames.buffer[self.vad_start_index:vad_end_index])
+                utterance = (self.trace, selected_audio)
+                self.reset_detection()
+                yield utterance
+
+            elif self.state_index >= 3:
+                # user did not give a response, so go back to listening for the wake word
+                if self.transcription is not None:
+                    self.transcription.cancel()
+                    self.transcription = None
+                self.reset_detection()
+
+    def reset_detection(self):
+        self.trace = None
+        self.state_index = 0
+        self.vad_silence_count = 0
+        self.vad_speech_count = 0
+        self.vad_frame_count = 0
+        self.vad_mask = None
+        self.wake_word_frames.seek(max(self.wake_word_frames.position, self.vad_frames.position))
+        self.wake_word_detector.reset()
+
+    def transcribe_window(self, audio):
+        """
+        Transcribes one window of an IncrementalTranscriber, uploaded straight from memory
+        """
+        transcript = self.openai_client.audio.transcriptions.create(
+            model="whisper-1",
+            file=("speech.wav", encode_wav(audio, self.sample_rate)),
+        )
+        return transcript.text
+
+    def transcribe(self, utterance):
+        """
+        Pipeline stage: (trace, selected audio or an IncrementalTranscriber) -> (trace, text),
+        or None if nothing was said
+        """
+        trace, audio = utterance
+        trace.mark("asr_request")
+        text = self.transcribe_audio(audio)
+        trace.mark("asr_response")
+        if self.record_dir is not None:
+            samples = audio.samples() if isinstance(audio, IncrementalTranscriber) else audio
+            self.record(trace, "input", samples, self.sample_rate)
+        if not text:
+            print("no text detected")
+            self.finish_trace(trace)
+            return None
+        return trace, text
+
+    def transcribe_audio(self, audio):
+        print("processing selected audio")
+
+        self.play_sound("testdata/ui_feedback/wait2.mp3", volume=0.35)
+
+        if isinstance(audio, IncrementalTranscriber):
+            # most windows are already transcribed by now, this waits for the tail
+            text = audio.result()
+            print(f"transcript: {text}")
+            return text
+
+        # whisper transcription, the whole utterance as one upload
+        text = self.transcribe_window(audio)
+        print(f"transcript: {text}")
+        return text
+
+    def chat(self, utterance):
+        """
+        Pipeline stage: (trace, user text) -> (trace, response text)
+        """
+        trace, first_text = utterance
+        # first_text = text[0]
+        # print(f"first text: {first_text}")
+
+        # """
+        # nlp chat completion via llm
+        if self.last_turn is not None and time.monotonic() - self.last_turn > self.conversation_timeout:
+            self.new_conversation()
+
+        messages = self.memory.prompt(first_text)
+        trace.record("prompt_tokens", self.memory.last_prompt_tokens)
+
+        trace.mark("llm_request")
+        llm_response = self.openai_client.chat.completions.create(
+            model="gpt-4-1106-preview",
+            messages=messages
+        )
+        trace.mark("llm_response")
+
+
+        response_role = llm_response.choices[0].message.role
+        # print(response)
+        response_content = llm_response.choices[0].message.content
+        print(f"response text: {response_content}")
+
+        self.memory.add_turn(first_text, response_content, response_role)
+        self.last_turn = time.monotonic()
+        # """
+
+        # input_message = first_text
+        # output_message = interpreter.chat(input_message)
+        # response_content = output_message[-1]['content']
+
+        return trace, response_content
+
+    def speak(self, utterance):
+        """
+        Pipeline stage: (trace, response text), streams the TTS response to the speaker as it arrives
+        """
+        trace, response_content = utterance
+        # playing from here on, so a wake word detected before play() starts still stops this reply
+        self.speaker.begin()
+        try:
+            if trace.utterance_id < self.interrupted_before:
+                print("reply dropped, a newer request came in")
+                self.finish_trace(trace)
+                return
+            # tts, begin() above keeps the next utterance's wait sound from starting over it
+            self.stop_sound()
+            if self.tts_cache is None:
+                chunks = self.synthesize(response_content)
+            else:
+                chunks = self.tts_cache.stream(response_content, TTS_VOICE, TTS_MODEL, self.speaker.sample_rate,
+                                               lambda: self.synthesize(response_content))
+            if self.record_dir is not None:
+                reply = []
+                chunks = recorded(chunks, reply)
+            play_start = time.perf_counter()
+            stats = self.speaker.play(chunks)
+        finally:
+            self.speaker.end()
+        if stats.stop_latency is not None:
+            self.stop_latency = stats.stop_latency
+        if self.record_dir is not None:
+            data = b"".join(reply)
+            self.record(trace, "reply", np.frombuffer(data[:len(data) - len(data) % 2], "<i2"), self.speaker.sample_rate)
+        if stats.time_to_first_byte is not None:
+            trace.mark("tts_first_byte", play_start + stats.time_to_first_byte)
+        if stats.time_to_first_audio is not None:
+            trace.mark("playback_start", play_start + stats.time_to_first_audio)
+        self.finish_trace(trace)
+
+    def synthesize(self, text):
+        """
+        pcm byte chunks of the TTS response for text, as they download
+        """
+        with self.openai_client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text,
+            response_format="pcm",
+        ) as tts_response:
+            yield from tts_response.iter_bytes(4096)
+
+    def prerender_phrases(self, phrases):
+        with self.warmup.profiler.measure("prerender tts phrases"):
+            return self.tts_cache.prerender(phrases, TTS_VOICE, TTS_MODEL, self.speaker.sample_rate, self.synthesize)
+
+    def add_playback_reference(self, pcm, start_time):
+        """
+        StreamingPlayer.on_write: hands a block of the reply to the echo suppressor,
+        at the capture sample being recorded when it starts playing
+        """
+        if self.capture_clock is None:
+            # nothing captured yet, nothing to echo into
+            return
+        captured, captured_at = self.capture_clock
+        index = captured + int((start_time - captured_at) * self.sample_rate)
+        # within a reply blocks follow each other, small clock jitter is left to the delay estimate
+        if index - self.echo.reference_end < self.sample_rate // 10:
+            index = None
+        else:
+            self.reference_resampler.reset()
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        self.echo.add_reference(self.reference_resampler.process(samples), index)
+
+    def duplex_stats(self):
+        stats = {
+            'barge_ins': self.barge_ins,
+            'stop_latency_ms': None if self.stop_latency is None else self.stop_latency * 1000,
+        }
+        if self.echo is not None:
+            stats['echo_delay_ms'] = self.echo.delay / self.sample_rate * 1000
+        return stats
+
+    def record(self, trace, name, samples, sample_rate):
+        """
+        Saves one side of an utterance as <record_dir>/<utterance id>_<name>.wav
+        """
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, f"{trace.utterance_id:05d}_{name}.wav")
+        with open(path, "wb") as f:
+            f.write(encode_wav(samples, sample_rate))
+
+    def new_conversation(self):
+        """
+        Forgets the conversation so far, nothing else is reloaded
+        """
+        self.memory.clear()
+        self.last_turn = None
+
+    def summarize(self, summary, messages):
+        """
+        Folds old turns into the conversation summary, runs on the memory's own thread
+        """
+        return chat_summarizer(self.openai_client)(summary, messages)
+
+    def finish_trace(self, trace):
+        self.tracer.finish(trace)
+        if self.trace_path is not None:
+            self.tracer.write_json(self.trace_path)
+
+    def process_selected_audio(self, audio):
+        """
+        Runs the asr, nlp, tts and playback stages in series
+        """
+        utterance = self.transcribe((self.tracer.start_utterance(), audio))
+        if utterance is None:
+            return
+        self.speak(self.chat(utterance))
+
+    def close(self):
+        if self.transcription is not None:
+            self.transcription.cancel()
+        self.asr_executor.shutdown(wait=False)
+        self.memory.close()
+        self.warmup.wait()
+        self.speaker.close()
+        music_player = self.warmup.futures["pygame mixer"]
+        if music_player.exception() is None:
+            music_player.result().close()
+        self.warmup.shutdown()
@@ -0,0 +1,204 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SUMMARY_PROMPT = """
+Summarize this conversation between a user and their voice assistant for the assistant
+to continue it. Keep names, facts, decisions and open requests, drop small talk.
+Answer with the summary only, in at most {words} words.
+"""
+
+# role and framing tokens the chat format adds to every message
+MESSAGE_OVERHEAD = 4
+
+# seconds before retrying after the summarizer failed, doubled per failure in a row up to the max
+RETRY_SECONDS = 5.0
+MAX_RETRY_SECONDS = 300.0
+
+
+def estimate_tokens(text):
+    """
+    Rough token count of English text, about 4 characters per token
+    """
+    return math.ceil(len(text) / 4)
+
+
+def message_tokens(message, count_tokens=estimate_tokens):
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def chat_summarizer(client, model="gpt-3.5-turbo", max_words=150):
+    """
+    summarize(summary, messages) for ConversationMemory that asks a chat model
+    to fold `messages` into the previous summary
+    """
+    def summarize(summary, messages):
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        if summary:
+            transcript = f"Summary of the conversation before this:\n{summary}\n\n{transcript}"
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT.format(words=max_words)},
+                {"role": "user", "content": transcript},
+            ],
+        )
+        return response.choices[0].message.content
+    return summarize
+
+
+class ConversationMemory:
+    """
+    Chat history that keeps every request under token_budget tokens.
+
+    Requests are the system message, a summary of the older turns, the recent turns and
+    the new user message. Once the recent turns pass recent_tokens, the oldest of them are
+    folded into the summary by summarize(summary, messages) -> summary on a background
+    thread, down to half of recent_tokens, so the summary (and with it the start of every
+    request) only changes every few turns. Until a summary is ready the turns it will
+    replace are still sent, and if that would go over the budget the oldest are left out
+    of the request; prompt() never waits for the summarizer. A failing summarizer is
+    reported and retried with exponential backoff, the turns stay in the meantime.
+
+    memory = ConversationMemory(chat_summarizer(client), token_budget=2000)
+    messages = memory.prompt(user_text)
+    memory.add_turn(user_text, reply)
+    """
+    def __init__(self, summarize, token_budget=2000, recent_tokens=None, system=None, count_tokens=estimate_tokens):
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.recent_tokens = recent_tokens or token_budget // 2
+        self.system = system
+        self.count_tokens = count_tokens
+
+        self.summary = ""
+        # turns not folded into the summary yet, as chat messages
+        self.messages = []
+        self.pending = None
+        self.summarizations = 0
+        self.summarize_time = 0.0
+        self.dropped_messages = 0
+        # oldest messages already counted in dropped_messages, each is counted once
+        self._counted_dropped = 0
+        self.summarize_failures = 0
+        self._failures_in_row = 0
+        self._retry_at = 0.0
+        self.last_prompt_tokens = 0
+        self.max_prompt_tokens = 0
+        # bumped by clear() so a summary of a forgotten conversation is thrown away
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarize")
+
+    def _tokens(self, messages):
+        return sum(message_tokens(message, self.count_tokens) for message in messages)
+
+    def _prefix(self):
+        prefix = []
+        if self.system:
+            prefix.append({"role": "system", "content": self.system})
+        if self.summary:
+            prefix.append({"role": "system", "content": f"Summary of the conversation so far:\n{self.summary}"})
+        return prefix
+
+    def prompt(self, text):
+        """
+        Messages for the next request, ending with the user's `text`
+        """
+        with self._lock:
+            prefix = self._prefix()
+            user = {"role": "user", "content": text}
+            available = self.token_budget - self._tokens(prefix) - message_tokens(user, self.count_tokens)
+            recent = []
+            for message in reversed(self.messages):
+                available -= message_tokens(message, self.count_tokens)
+                if available < 0:
+                    dropped = len(self.messages) - len(recent)
+                    self.dropped_messages += max(0, dropped - self._counted_dropped)
+                    self._counted_dropped = max(dropped, self._counted_dropped)
+                    break
+                recent.append(message)
+            # a reply without the question it answers confuses the model
+            if recent and recent[-1]["role"] != "user":
+                recent.pop()
+            messages = prefix + recent[::-1] + [user]
+            self.last_prompt_tokens = self._tokens(messages)
+            self.max_prompt_tokens = max(self.max_prompt_tokens, self.last_prompt_tokens)
+            return messages
+
+    def add_turn(self, text, reply, role="assistant"):
+        with self._lock:
+            self.messages.append({"role": "user", "content": text})
+            self.messages.append({"role": role, "content": reply})
+            self._schedule()
+
+    def _schedule(self):
+        if self.pending is not None or self._tokens(self.messages) <= self.recent_tokens:
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        # fold the oldest whole turns until the rest fits in half the recent budget
+        keep = self.recent_tokens // 2
+        count = 0
+        while count < len(self.messages) and self._tokens(self.messages[count:]) > keep:
+            count += 2
+        self.pending = self._executor.submit(self._fold, self._generation, self.summary, self.messages[:count])
+
+    def _fold(self, generation, summary, messages):
+        start = time.perf_counter()
+        try:
+            summary = self.summarize(summary, messages)
+        except Exception as e:
+            with self._lock:
+                self.pending = None
+                self.summarize_failures += 1
+                self._failures_in_row += 1
+                delay = min(RETRY_SECONDS * 2 ** (self._failures_in_row - 1), MAX_RETRY_SECONDS)
+                self._retry_at = time.monotonic() + delay
+            # nobody waits on the future, so this is the only place the error shows
+            print(f"summarizing the conversation failed ({e!r}), retrying in {delay:.0f} s")
+            return
+        with self._lock:
+            self.pending = None
+            self._failures_in_row = 0
+            self._retry_at = 0.0
+            if generation != self._generation:
+                return
+            self.summary = summary
+            del self.messages[:len(messages)]
+            self._counted_dropped = max(0, self._counted_dropped - len(messages))
+            self.summarizations += 1
+            self.summarize_time += time.perf_counter() - start
+            # turns added while summarizing may already need the next one
+            self._schedule()
+
+    def wait(self):
+        """
+        Waits until no summarization is in progress
+        """
+        while (pending := self.pending) is not None:
+            pending.exception()
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.summary = ""
+            self.messages = []
+            self._counted_dropped = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'summary_tokens': self.count_tokens(self.summary),
+                'recent_messages': len(self.messages),
+                'last_prompt_tokens': self.last_prompt_tokens,
+                'max_prompt_tokens': self.max_prompt_tokens,
+                'summarizations': self.summarizations,
+                'summarize_ms': self.summarize_time / max(self.summarizations, 1) * 1000,
+                'dropped_messages': self.dropped_messages,
+                'summarize_failures': self.summarize_failures,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
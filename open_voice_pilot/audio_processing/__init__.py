@@ -1 +1,13 @@
-from .audio_processor import *
\ No newline at end of file
+from .audio_processor import *
+from .ring_buffer import *
+from .pcm_cache import *
+from .buffer_pool import *
+from .fake_device import *
+from .reframer import *
+from .playback import *
+from .wav import *
+from .vad import *
+from .features import *
+from .resampler import *
+from .waveform import *
+from .echo import *
@@ -1,7 +1,16 @@
 from abc import ABC, abstractmethod
-import pyaudio
+import queue
+import threading
 import numpy as np
-import ffmpeg
+
+from .buffer_pool import BufferPool
+
+# portaudio constants, so pyaudio is only imported once a real device is opened
+# (pyaudio and ffmpeg are imported where they're used, file-only code never loads pyaudio)
+paInt16 = 8
+paInputOverflow = 2
+paContinue = 0
+paComplete = 1
 
 # Abstract Class
 class AudioProcessor(ABC):
@@ -13,22 +22,186 @@ class AudioProcessor(ABC):
     def close(self):
         pass
 
+    def read_chunk_into(self, buffer):
+        """
+        Reads the next chunk into buffer (e.g. from a BufferPool) instead of a new array.
+        buffer has to hold chunk_samples samples. Returns the number of samples written,
+        or None at the end of the stream.
+        Processors override this where they can fill buffer without allocating a chunk first.
+        """
+        chunk = self.read_chunk()
+        if chunk is None:
+            return None
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+    async def aread_chunk(self):
+        """
+        read_chunk for asyncio code. The blocking read runs in the loop's default executor,
+        so the event loop keeps serving other tasks while waiting for audio.
+        Reads are pulled one at a time, which is the backpressure: nothing is read ahead
+        of the consumer beyond what the processor itself buffers.
+        Cancelling the await doesn't drop audio, the read in flight is returned by the next call.
+        """
+        import asyncio
+        pending = getattr(self, '_pending_read', None)
+        if pending is None:
+            pending = asyncio.get_running_loop().run_in_executor(None, self.read_chunk)
+            self._pending_read = pending
+        try:
+            return await asyncio.shield(pending)
+        finally:
+            if pending.done():
+                self._pending_read = None
+
+    async def __aiter__(self):
+        while True:
+            chunk = await self.aread_chunk()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def aclose(self):
+        import asyncio
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+
+def probe_audio(filepath):
+    """
+    Returns (sample_rate, channels) of the first audio stream in a file
+    """
+    import ffmpeg
+    probe = ffmpeg.probe(filepath)
+    for stream in probe['streams']:
+        if stream.get('codec_type') == 'audio':
+            return int(stream['sample_rate']), int(stream['channels'])
+    raise ValueError(f"no audio stream found in {filepath}")
+
+
+def drain(pipe):
+    """
+    Reads a subprocess pipe to the end on a thread of its own, so the process never blocks
+    on a full pipe while its other output is being read. Returns a function that waits for
+    the end of the pipe and returns everything read from it.
+    """
+    output = []
+    thread = threading.Thread(target=lambda: output.append(pipe.read()), daemon=True)
+    thread.start()
+
+    def result():
+        thread.join()
+        return output[0] if output else b""
+    return result
+
+
+def pcm_output(filepath, sample_rate, channels):
+    """
+    ffmpeg graph decoding a file to headerless 16-bit pcm on stdout
+    """
+    import ffmpeg
+    return (
+        ffmpeg
+        .input(filepath)
+        .output('pipe:', format='s16le', acodec='pcm_s16le', ac=channels, ar=sample_rate)
+        .global_args('-loglevel', 'error')
+    )
+
+
 class FileAudioProcessor(AudioProcessor):
-    def __init__(self, filepath, chunk_size=1024):
+    """
+    Reads an audio file as 16-bit pcm, chunk_size frames (chunk_samples samples) at a time.
+
+    sample_rate and channels default to the file's own format.
+    In streaming mode ffmpeg runs as a subprocess pipe and a reader thread keeps
+    at most read_ahead chunks decoded ahead of the consumer, so startup time
+    and memory don't depend on the length of the file.
+    Multi-channel audio is returned interleaved, like MicrophoneAudioProcessor.
+
+    With a PCMCache the file is decoded (and its format probed) once and later opens are
+    served from a memory map, which also allows seek().
+    """
+    def __init__(self, filepath, chunk_size=1024, sample_rate=None, channels=None, streaming=True, read_ahead=16, cache=None):
         self.chunk_size = chunk_size
         self.filepath = filepath
-        out, _ = (
-            ffmpeg.input(filepath)
-            .output("pipe:", format='wav')
-            .run(capture_stdout=True, capture_stderr=True)
-        )
 
-        self.audio = np.frombuffer(out, np.int16)
+        if sample_rate is None or channels is None:
+            native_rate, native_channels = probe_audio(filepath) if cache is None else cache.native_format(filepath)
+            sample_rate = sample_rate or native_rate
+            channels = channels or native_channels
+        self.sample_rate = sample_rate
+        self.channels = channels
+        # interleaved, like MicrophoneAudioProcessor
+        self.chunk_samples = chunk_size * channels
+
+        self.streaming = streaming and cache is None
         self.chunk_index = 0
+        # sample index of the next chunk when the whole file is addressable
+        self.position = 0
+        self.process = None
+
+        if cache is not None:
+            self.audio = cache.load(filepath, sample_rate, channels).samples
+            return
+
+        if not streaming:
+            out, _ = pcm_output(filepath, sample_rate, channels).run(capture_stdout=True, capture_stderr=True)
+            self.audio = np.frombuffer(out, np.int16)
+            return
+
+        self.process = pcm_output(filepath, sample_rate, channels).run_async(pipe_stdout=True, pipe_stderr=True)
+        self._stderr = drain(self.process.stderr)
+        # the reader decodes straight into these, one more than can be queued so it never waits on the pool
+        self._pool = BufferPool(self.chunk_samples, count=read_ahead + 2)
+        self._chunks = queue.Queue(maxsize=read_ahead)
+        self._stop = threading.Event()
+        self._error = None
+        self._finished = False
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        try:
+            while not self._stop.is_set():
+                buffer = self._pool.acquire()
+                read = self.process.stdout.readinto(memoryview(buffer).cast('B'))
+                if not read:
+                    self._pool.release(buffer)
+                    break
+                self._put(buffer[:read // buffer.itemsize])
+
+            if self.process.wait() != 0 and not self._stop.is_set():
+                import ffmpeg
+                self._error = ffmpeg.Error('ffmpeg', None, self._stderr())
+        finally:
+            self._put(None)
+
+    def _put(self, item):
+        # bounded put that still notices close() while the consumer is away
+        while not self._stop.is_set():
+            try:
+                self._chunks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
 
     def read_chunk(self):
-        start = self.chunk_index * self.chunk_size
-        end = start + self.chunk_size
+        if self.streaming:
+            buffer = self._read_stream_chunk()
+            if buffer is None:
+                return None
+            # the pooled buffer is reused by the reader, hand out a copy
+            chunk = buffer.copy()
+            self._pool.release(buffer)
+            return chunk
+
+        start = self.position
+        end = start + self.chunk_samples
 
         if start >= len(self.audio):
             return None
@@ -37,14 +210,81 @@ class FileAudioProcessor(AudioProcessor):
             end = len(self.audio)
 
         chunk = self.audio[start:end]
+        self.position = end
+        self.chunk_index += 1
+        return chunk
+
+    def read_chunk_into(self, buffer):
+        if self.streaming:
+            chunk = self._read_stream_chunk()
+            if chunk is None:
+                return None
+            buffer[:len(chunk)] = chunk
+            self._pool.release(chunk)
+            return len(chunk)
+
+        start = self.position
+        if start >= len(self.audio):
+            return None
+        end = min(start + self.chunk_samples, len(self.audio))
+        buffer[:end - start] = self.audio[start:end]
+        self.position = end
+        self.chunk_index += 1
+        return end - start
+
+    def seek(self, seconds):
+        """
+        Moves the next read_chunk to the given timestamp
+        """
+        if self.streaming:
+            raise ValueError("seek needs streaming=False or a cache")
+        frame = min(max(int(seconds * self.sample_rate), 0), len(self.audio) // self.channels)
+        self.position = frame * self.channels
+
+    def _read_stream_chunk(self):
+        if self._finished:
+            return None
+
+        chunk = self._chunks.get()
+        if chunk is None:
+            self._finished = True
+            if self._error is not None:
+                raise self._error
+            return None
+
         self.chunk_index += 1
         return chunk
     
     def close(self):
-        pass
+        if self.process is None:
+            return
+        self._stop.set()
+        if self.process.poll() is None:
+            self.process.kill()
+        self._reader.join()
+        _end_queue(self._chunks)
+        self.process.stdout.close()
+        self._stderr()
+        self.process.stderr.close()
+        self.process.wait()
+        self.process = None
+
+
+def _end_queue(chunks):
+    """
+    Replaces whatever is left in a chunk queue with the end-of-stream marker,
+    waking up a reader blocked on it
+    """
+    while True:
+        try:
+            chunks.get_nowait()
+        except queue.Empty:
+            break
+    chunks.put_nowait(None)
 
 
 def list_microphones():
+    import pyaudio
     pyaudio_instance = pyaudio.PyAudio()
     info = pyaudio_instance.get_host_api_info_by_index(0)
     num_devices = info.get('deviceCount')
@@ -55,6 +295,21 @@ def list_microphones():
     
     pyaudio_instance.terminate()
 
+def default_sample_rate(device_index=None):
+    """
+    The rate a microphone runs at natively, which is the one it is sure to accept
+    """
+    import pyaudio
+    pyaudio_instance = pyaudio.PyAudio()
+    try:
+        if device_index is None:
+            info = pyaudio_instance.get_default_input_device_info()
+        else:
+            info = pyaudio_instance.get_device_info_by_index(device_index)
+        return int(info['defaultSampleRate'])
+    finally:
+        pyaudio_instance.terminate()
+
 def select_microphone():
     list_microphones()
     index = int(input("Select microphone index: "))
@@ -62,22 +317,122 @@ def select_microphone():
 
 # Microphone Audio Processor
 class MicrophoneAudioProcessor(AudioProcessor):
-    def __init__(self, device_index=None, chunk_size=1024, format=pyaudio.paInt16, channels=1, rate=44100):
+    """
+    Reads chunk_size frames at a time from a microphone.
+
+    By default read_chunk does a blocking stream.read. With callback=True, PortAudio's
+    audio thread pushes each chunk into a bounded queue instead, so capture keeps running
+    while the consumer is busy; read_chunk then takes block/timeout arguments and raises
+    queue.Empty when no chunk arrives in time, and None once the processor is closed or
+    the device ran out of input (a FakeInputStream with max_frames calls back with None).
+    Chunks that don't fit in the queue are dropped and counted, see stats(); overflows
+    are the ones the device itself reported.
+
+    audio_interface replaces pyaudio.PyAudio(), e.g. with a FakeAudioInterface.
+    """
+    def __init__(self, device_index=None, chunk_size=1024, format=paInt16, channels=1, rate=44100, callback=False, queue_size=32, audio_interface=None):
         self.chunk_size = chunk_size
+        self.chunk_samples = chunk_size * channels
         self.format = format
         self.channels = channels
         self.rate = rate
-        self.audio = pyaudio.PyAudio()
-        self.stream = self.audio.open(format=self.format, channels=self.channels, rate=self.rate, input=True, input_device_index=device_index, frames_per_buffer=self.chunk_size)
+        self.callback = callback
 
-    def read_chunk(self):
-        data = self.stream.read(self.chunk_size, exception_on_overflow=False)
+        self.overflow_count = 0
+        self.underrun_count = 0
+        self.dropped_chunks = 0
+        self.captured_chunks = 0
+        self.max_queue_depth = 0
+        self._stats_lock = threading.Lock()
+
+        if audio_interface is None:
+            import pyaudio
+            audio_interface = pyaudio.PyAudio()
+        self.audio = audio_interface
+        stream_callback = None
+        # set once the device has no more input, the end marker may not have fit in the queue
+        self._finished = False
+        if callback:
+            self._chunks = queue.Queue(maxsize=queue_size)
+            stream_callback = self._stream_callback
+        self.stream = self.audio.open(format=self.format, channels=self.channels, rate=self.rate, input=True, input_device_index=device_index, frames_per_buffer=self.chunk_size, stream_callback=stream_callback)
+
+    def _stream_callback(self, in_data, frame_count, time_info, status_flags):
+        # runs on the audio thread: never block here
+        if in_data is None:
+            self._finished = True
+            try:
+                self._chunks.put_nowait(None)
+            except queue.Full:
+                pass
+            return (None, paComplete)
+        with self._stats_lock:
+            self.captured_chunks += 1
+            if status_flags & paInputOverflow:
+                self.overflow_count += 1
+            try:
+                self._chunks.put_nowait(in_data)
+            except queue.Full:
+                self.dropped_chunks += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._chunks.qsize())
+        return (None, paContinue)
+
+    def _read_data(self, block, timeout):
+        if not self.callback:
+            return self.stream.read(self.chunk_size, exception_on_overflow=False)
+
+        if self._finished and self._chunks.empty():
+            return None
+        try:
+            data = self._chunks.get(block=block, timeout=timeout)
+        except queue.Empty:
+            with self._stats_lock:
+                self.underrun_count += 1
+            raise
+        if data is None:
+            # closed, keep the marker for any other reader
+            self._chunks.put_nowait(None)
+        return data
+
+    def read_chunk(self, block=True, timeout=None):
+        data = self._read_data(block, timeout)
+        if data is None:
+            return None
         return np.frombuffer(data, dtype=np.int16)
 
+    def read_chunk_into(self, buffer, block=True, timeout=None):
+        """
+        Copies the next chunk into buffer. PyAudio hands over every chunk as a new bytes
+        object, but nothing else is allocated and the bytes are dropped right away.
+        """
+        data = self._read_data(block, timeout)
+        if data is None:
+            return None
+        bytes_view = memoryview(buffer).cast('B')
+        bytes_view[:len(data)] = data
+        return len(data) // buffer.itemsize
+
+    @property
+    def queue_depth(self):
+        return self._chunks.qsize() if self.callback else 0
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'captured_chunks': self.captured_chunks,
+                'dropped_chunks': self.dropped_chunks,
+                'overflows': self.overflow_count,
+                'underruns': self.underrun_count,
+                'queue_depth': self.queue_depth,
+                'max_queue_depth': self.max_queue_depth,
+            }
+
     def close(self):
         self.stream.stop_stream()
         self.stream.close()
         self.audio.terminate()
+        if self.callback:
+            _end_queue(self._chunks)
 
 
 # Example usage
@@ -89,4 +444,4 @@ class MicrophoneAudioProcessor(AudioProcessor):
 #         break
     # Process the chunk
 
-# No need to close the file as pydub handles it internally
+# file_processor.close()  # stops the ffmpeg subprocess if the file wasn't read to the end
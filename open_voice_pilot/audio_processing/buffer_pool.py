@@ -0,0 +1,59 @@
+import queue
+import threading
+
+import numpy as np
+
+
+class BufferPool:
+    """
+    Preallocated chunk buffers to read audio into with AudioProcessor.read_chunk_into.
+
+    acquire() hands out a free buffer and release() takes it back, so a capture loop
+    reuses the same `count` arrays instead of allocating one per chunk. release() also
+    accepts a slice of a pooled buffer, like the buffer[:n] a read returns.
+    With grow=True an empty pool allocates another buffer instead of blocking; these
+    are counted in stats() and stay in the pool afterwards.
+    """
+    def __init__(self, size, count=8, dtype=np.int16, grow=True):
+        self.size = size
+        self.dtype = dtype
+        self.grow = grow
+        self.allocated = 0
+        self.grown = 0
+        self._free = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        for _ in range(count):
+            self._free.put(self._allocate())
+
+    def _allocate(self):
+        with self._lock:
+            self.allocated += 1
+        return np.empty(self.size, dtype=self.dtype)
+
+    def acquire(self, block=True, timeout=None):
+        try:
+            return self._free.get_nowait()
+        except queue.Empty:
+            if not self.grow:
+                return self._free.get(block, timeout)
+        with self._lock:
+            self.grown += 1
+        return self._allocate()
+
+    def release(self, buffer):
+        # pooled buffers own their memory, a slice leads back to one through .base
+        while buffer.base is not None:
+            buffer = buffer.base
+        self._free.put(buffer)
+
+    @property
+    def available(self):
+        return self._free.qsize()
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'allocated': self.allocated,
+            'available': self.available,
+            'grown': self.grown,
+        }
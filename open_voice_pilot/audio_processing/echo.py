@@ -0,0 +1,190 @@
+import threading
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .ring_buffer import RingBuffer
+
+
+class EchoSuppressor:
+    """
+    Removes the assistant's own playback from captured audio, on the CPU, so detectors
+    can keep listening while a reply plays.
+
+    The playback is added with add_reference(), positioned in capture samples: sample i of
+    the reference is what the speaker plays while capture sample i is recorded, give or
+    take the unknown output and input latency. That remaining delay, up to max_delay_ms,
+    is found by GCC-PHAT between the captured audio and the reference every
+    estimate_seconds while there is playback.
+
+    Each frame of capture is then compared with the aligned reference frame in the
+    frequency domain: a per-bin echo path is estimated from their smoothed cross and auto
+    spectra, and bins are attenuated by how much of their power the predicted echo explains
+    (down to floor_db). process() returns int16 audio of the same length as its input,
+    delayed by `latency` samples (one frame).
+
+    echo = EchoSuppressor()
+    echo.add_reference(reply_samples, echo.capture_index)
+    clean = echo.process(chunk)
+    """
+    def __init__(self, sample_rate=16000, frame=512, max_delay_ms=400, history_seconds=1.0, estimate_seconds=0.25,
+                 floor_db=-40.0, overestimate=3.0, smoothing=0.9, min_reference_db=-60.0):
+        self.sample_rate = sample_rate
+        self.frame = frame
+        self.hop = frame // 2
+        self.latency = frame
+        self.max_delay = int(max_delay_ms * sample_rate / 1000)
+        self.history = int(history_seconds * sample_rate)
+        self.estimate_interval = int(estimate_seconds * sample_rate)
+        self.floor = 10.0 ** (floor_db / 20.0)
+        self.overestimate = overestimate
+        self.smoothing = smoothing
+        # mean square of a reference frame (full scale = 1) below which it counts as silence
+        self.min_reference_power = 10.0 ** (min_reference_db / 10.0) * frame
+        # periodic sqrt-Hann analysis and synthesis windows overlap-add to one at 50% overlap
+        self.window = np.sqrt(np.hanning(frame + 1)[:-1]).astype(np.float32)
+
+        # in capture sample indices
+        self.reference = RingBuffer(self.history + self.max_delay + 10 * sample_rate, np.float32)
+        self.captured = RingBuffer(self.history + frame, np.float32)
+        self.delay = 0
+        self.delay_confidence = 0.0
+        self.reference_active = False
+        self._next_estimate = 0
+        # the reference is usually added from the playback thread
+        self._lock = threading.Lock()
+
+        bins = frame // 2 + 1
+        self.cross = np.zeros(bins, np.complex64)
+        self.reference_power = np.full(bins, 1e-10, np.float32)
+        # samples of the frame still being filled, after the half frame the next one reaches back into
+        self._pending = np.zeros(self.hop, np.float32)
+        self._overlap = np.zeros(self.hop, np.float32)
+        self._output = np.zeros(self.latency - self.hop, np.float32)
+
+    @property
+    def capture_index(self):
+        """
+        Absolute index of the next captured sample process() will see
+        """
+        return self.captured.end_index
+
+    @property
+    def reference_end(self):
+        """
+        Capture index right after the last reference sample
+        """
+        return self.reference.end_index
+
+    def add_reference(self, samples, index=None):
+        """
+        Adds float (full scale 1) or int16 playback samples at the capture rate, starting at capture
+        sample `index`, or right after the previous reference when None or already past
+        """
+        samples = np.asarray(samples)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768.0
+        with self._lock:
+            self._add_reference(samples, index)
+
+    def _add_reference(self, samples, index):
+        if index is not None and index > self.reference.end_index:
+            gap = index - self.reference.end_index
+            if gap > self.reference.capacity:
+                self.reference.end_index = index - self.reference.capacity
+                gap = self.reference.capacity
+            self.reference.append(np.zeros(gap, np.float32))
+        self.reference.append(samples)
+
+    def _reference(self, start, end):
+        """
+        Reference samples [start, end), zero where there is none
+        """
+        out = np.zeros(end - start, np.float32)
+        with self._lock:
+            lo = max(start, self.reference.start_index)
+            hi = min(end, self.reference.end_index)
+            if hi > lo:
+                out[lo - start:hi - start] = self.reference.get(lo, hi)
+        return out
+
+    def estimate_delay(self):
+        """
+        Re-estimates the echo delay from the last history_seconds of capture, with GCC-PHAT
+        """
+        end = self.captured.end_index
+        length = min(self.history, end - self.captured.start_index)
+        if length < self.frame:
+            return
+        captured = self.captured.get(end - length, end)
+        reference = self._reference(end - length - self.max_delay, end)
+        if np.dot(reference, reference) < self.min_reference_power * length / self.frame:
+            return
+
+        n = 1 << int(np.ceil(np.log2(len(reference) + length)))
+        spectrum = np.fft.rfft(reference, n) * np.conj(np.fft.rfft(captured, n))
+        correlation = np.fft.irfft(spectrum / (np.abs(spectrum) + 1e-12), n)[:self.max_delay + 1]
+        # correlation[k] lines captured sample j up with reference sample j + k, a delay of max_delay - k
+        peak = int(np.argmax(correlation))
+        confidence = correlation[peak] / (np.sqrt(np.mean(correlation ** 2)) + 1e-12)
+        if confidence > 5.0:
+            if self.max_delay - peak != self.delay:
+                # the echo path estimate belongs to the old alignment
+                self.cross[:] = 0
+                self.reference_power[:] = 1e-10
+            self.delay = self.max_delay - peak
+            self.delay_confidence = float(confidence)
+
+    def process(self, chunk):
+        """
+        Suppresses the echo in the next int16 chunk of capture
+        """
+        chunk = np.asarray(chunk)
+        samples = chunk.astype(np.float32) / 32768.0
+        # capture index of the first sample of buffer below
+        first = self.captured.end_index - len(self._pending)
+        self.captured.append(samples)
+        if self.reference_end > first - self.max_delay and self.captured.end_index >= self._next_estimate:
+            self.estimate_delay()
+            self._next_estimate = self.captured.end_index + self.estimate_interval
+
+        buffer = np.concatenate((self._pending, samples))
+        frames = (len(buffer) - self.frame) // self.hop + 1 if len(buffer) >= self.frame else 0
+        produced = []
+        if frames:
+            reference = self._reference(first - self.delay, first - self.delay + (frames - 1) * self.hop + self.frame)
+            mic = np.fft.rfft(sliding_window_view(buffer, self.frame)[::self.hop][:frames] * self.window)
+            echo = np.fft.rfft(sliding_window_view(reference, self.frame)[::self.hop][:frames] * self.window)
+            cleaned = np.fft.irfft(self._suppress(mic, echo), self.frame).astype(np.float32) * self.window
+            for frame in cleaned:
+                produced.append(self._overlap + frame[:self.hop])
+                self._overlap = frame[self.hop:]
+        self._pending = buffer[frames * self.hop:]
+
+        output = np.concatenate([self._output] + produced)
+        self._output = output[len(chunk):]
+        np.multiply(output[:len(chunk)], 32768.0, out=output[:len(chunk)])
+        return np.clip(np.rint(output[:len(chunk)]), -32768, 32767).astype(np.int16)
+
+    def _suppress(self, mic, echo):
+        gains = np.ones(mic.shape, np.float32)
+        echo_power = echo.real ** 2 + echo.imag ** 2
+        frame_power = echo_power.sum(axis=1) / self.frame
+        self.reference_active = bool(frame_power.max(initial=0.0) > self.min_reference_power / self.frame)
+        for i in range(len(mic)):
+            if frame_power[i] <= self.min_reference_power / self.frame:
+                continue
+            self.cross = self.smoothing * self.cross + (1 - self.smoothing) * mic[i] * np.conj(echo[i])
+            self.reference_power = self.smoothing * self.reference_power + (1 - self.smoothing) * echo_power[i]
+            path = np.abs(self.cross) ** 2 / (self.reference_power ** 2 + 1e-20)
+            mic_power = mic[i].real ** 2 + mic[i].imag ** 2 + 1e-12
+            gains[i] = np.clip(1.0 - self.overestimate * path * echo_power[i] / mic_power, self.floor, 1.0)
+        return mic * gains
+
+    def reset(self):
+        """
+        Forgets the echo path and delay, e.g. after the speaker or room changed
+        """
+        self.cross[:] = 0
+        self.reference_power[:] = 1e-10
+        self.delay = 0
@@ -0,0 +1,163 @@
+import threading
+import time
+import numpy as np
+
+# portaudio constants, duplicated so the fake device works without a sound card
+paContinue = 0
+paComplete = 1
+
+
+def sine_wave(frequency=440.0, amplitude=0.3):
+    """
+    Signal function for FakeAudioInterface: a continuous int16 sine tone
+    """
+    def signal(start_frame, num_frames, rate, channels):
+        t = (start_frame + np.arange(num_frames)) / rate
+        wave = (amplitude * 32767 * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+        return np.repeat(wave, channels)
+    return signal
+
+
+def looped(samples):
+    """
+    Signal function for FakeAudioInterface that plays back an int16 array (mono) on repeat
+    """
+    samples = np.asarray(samples, dtype=np.int16)
+
+    def signal(start_frame, num_frames, rate, channels):
+        indices = (start_frame + np.arange(num_frames)) % len(samples)
+        return np.repeat(samples[indices], channels)
+    return signal
+
+
+class FakeInputStream:
+    """
+    Stands in for a pyaudio input stream.
+    Frames are produced at `rate` frames per real-time second (or as fast as possible
+    if realtime is False), either through stream_callback or through read().
+    """
+    def __init__(self, signal, rate, channels, frames_per_buffer, stream_callback=None, realtime=True, max_frames=None):
+        self.signal = signal
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.stream_callback = stream_callback
+        self.realtime = realtime
+        self.max_frames = max_frames
+        self.frame_index = 0
+        self.start_time = time.perf_counter()
+        self._active = True
+        self._thread = None
+        if stream_callback is not None:
+            self._thread = threading.Thread(target=self._callback_loop, daemon=True)
+            self._thread.start()
+
+    def _next_frames(self, num_frames):
+        if self.realtime:
+            # sleep until the last of these frames would have been captured by a real device
+            due = self.start_time + (self.frame_index + num_frames) / self.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        data = self.signal(self.frame_index, num_frames, self.rate, self.channels)
+        self.frame_index += num_frames
+        return data.astype(np.int16).tobytes()
+
+    def _callback_loop(self):
+        while self._active:
+            if self.max_frames is not None and self.frame_index >= self.max_frames:
+                # out of input: tells the consumer, where a real device would just keep going
+                self.stream_callback(None, 0, {'input_buffer_adc_time': self.frame_index / self.rate}, 0)
+                break
+            data = self._next_frames(self.frames_per_buffer)
+            if not self._active:
+                break
+            _, flag = self.stream_callback(data, self.frames_per_buffer, {'input_buffer_adc_time': self.frame_index / self.rate}, 0)
+            if flag != paContinue:
+                break
+        self._active = False
+
+    def read(self, num_frames, exception_on_overflow=True):
+        return self._next_frames(num_frames)
+
+    def is_active(self):
+        return self._active
+
+    def start_stream(self):
+        pass
+
+    def stop_stream(self):
+        self._active = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def close(self):
+        self.stop_stream()
+
+
+class FakeOutputStream:
+    """
+    Stands in for a pyaudio output stream: write() blocks like a sound card with
+    buffer_seconds of buffer playing at `rate` frames per second (when realtime),
+    and everything written is kept in `written`.
+    """
+    def __init__(self, rate, channels, realtime=True, buffer_seconds=0.05):
+        self.rate = rate
+        self.channels = channels
+        self.realtime = realtime
+        self.buffer_seconds = buffer_seconds
+        self.written = bytearray()
+        self.frames_written = 0
+        self.start_time = None
+
+    def write(self, data, num_frames=None, exception_on_underflow=False):
+        now = time.perf_counter()
+        if self.start_time is None or now > self.start_time + self.frames_written / self.rate:
+            # nothing left to play, the device starts over from silence
+            self.start_time = now
+            self.frames_written = 0
+        self.written += data
+        self.frames_written += len(data) // (2 * self.channels)
+        if self.realtime:
+            # returns once the unplayed audio fits in the device buffer
+            delay = self.start_time + self.frames_written / self.rate - self.buffer_seconds - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def is_active(self):
+        return True
+
+    def start_stream(self):
+        pass
+
+    def stop_stream(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAudioInterface:
+    """
+    Drop-in replacement for pyaudio.PyAudio that opens FakeInputStreams and FakeOutputStreams.
+    Pass it as audio_interface to MicrophoneAudioProcessor to capture synthetic audio,
+    or to StreamingPlayer to play into memory.
+    """
+    def __init__(self, signal=None, realtime=True, max_frames=None):
+        self.signal = signal or sine_wave()
+        self.realtime = realtime
+        self.max_frames = max_frames
+        self.streams = []
+
+    def open(self, format=None, channels=1, rate=44100, input=False, output=False, input_device_index=None, frames_per_buffer=1024, stream_callback=None, **kwargs):
+        if output:
+            stream = FakeOutputStream(rate, channels, realtime=self.realtime)
+            self.streams.append(stream)
+            return stream
+        stream = FakeInputStream(self.signal, rate, channels, frames_per_buffer, stream_callback=stream_callback, realtime=self.realtime, max_frames=self.max_frames)
+        self.streams.append(stream)
+        return stream
+
+    def terminate(self):
+        for stream in self.streams:
+            stream.close()
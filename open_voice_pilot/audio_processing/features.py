@@ -0,0 +1,191 @@
+import threading
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .ring_buffer import RingBuffer
+from .vad import rms_db
+
+FEATURES = ("power", "mel", "level_db")
+
+
+def hz_to_mel(hz):
+    return 2595.0 * np.log10(1.0 + np.asarray(hz) / 700.0)
+
+
+def mel_to_hz(mel):
+    return 700.0 * (10.0 ** (np.asarray(mel) / 2595.0) - 1.0)
+
+
+def mel_filterbank(sample_rate, n_fft, n_mels=32, fmin=60.0, fmax=None):
+    """
+    (n_mels, n_fft // 2 + 1) triangular filters on the HTK mel scale
+    """
+    fmax = fmax or sample_rate / 2
+    bins = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    edges = mel_to_hz(np.linspace(hz_to_mel(fmin), hz_to_mel(fmax), n_mels + 2))
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (bins - lower) / (center - lower)
+    falling = (upper - bins) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+class FeatureBlock:
+    """
+    Features of consecutive frames start .. start + len - 1, as read by a FeatureConsumer.
+
+    power, mel and level_db are of the samples scaled to full scale 1, like EnergyVAD's levels:
+    power: (frames, n_fft // 2 + 1) power spectrum of the window ending at each hop
+    mel: (frames, n_mels) log mel energies of the same window
+    level_db: RMS level in dBFS of each hop's new samples, as EnergyVAD measures it
+
+    The arrays are the block's own, later pushes to the frontend don't change them.
+    """
+    def __init__(self, start, power, mel, level_db):
+        self.start = start
+        self.power = power
+        self.mel = mel
+        self.level_db = level_db
+
+    def __len__(self):
+        return len(self.level_db)
+
+
+class FeatureFrontend:
+    """
+    Computes the spectral and level features of a stream once per hop and keeps the last
+    history_frames of each, for any number of FeatureConsumers to read.
+
+    Frame i covers the `window` samples ending at sample (i + 1) * hop, so frames line up
+    with hops and the first ones are zero padded. push() computes all frames completed by
+    a chunk in one vectorized pass: windowed rfft, power, mel energies and per-hop level,
+    which is what each detector would otherwise compute on its own.
+    window and hop default to 25 and 10 ms, n_fft to the power of two that holds a window.
+
+    frontend = FeatureFrontend()
+    vad_features = frontend.add_consumer()
+    frontend.push(chunk)
+    block = vad_features.read()
+    """
+    def __init__(self, sample_rate=16000, window=None, hop=None, n_fft=None, n_mels=32, history_frames=1000):
+        hop = hop or sample_rate // 100
+        window = max(window or sample_rate * 25 // 1000, hop)
+        n_fft = n_fft or 1 << int(np.ceil(np.log2(window)))
+        self.sample_rate = sample_rate
+        self.window = window
+        self.hop = hop
+        self.n_fft = n_fft
+        self.n_mels = n_mels
+        self.hann = np.hanning(window).astype(np.float32)
+        self.filterbank = mel_filterbank(sample_rate, n_fft, n_mels)
+
+        bins = n_fft // 2 + 1
+        self.history = {
+            "power": RingBuffer(history_frames, np.float32, (bins,)),
+            "mel": RingBuffer(history_frames, np.float32, (n_mels,)),
+            "level_db": RingBuffer(history_frames, np.float32),
+        }
+        self.consumers = []
+        # samples not yet covered by a frame, after the overlap the next frame reaches back into
+        self._pending = np.zeros(window - hop, np.int16)
+        self._lock = threading.Lock()
+
+    @property
+    def end_index(self):
+        """
+        Absolute index of the next frame
+        """
+        return self.history["level_db"].end_index
+
+    @property
+    def start_index(self):
+        return self.history["level_db"].start_index
+
+    def add_consumer(self, position=None):
+        """
+        Returns a FeatureConsumer starting at absolute frame index `position` (default: the next frame)
+        """
+        consumer = FeatureConsumer(self, self.end_index if position is None else position)
+        self.consumers.append(consumer)
+        return consumer
+
+    def remove_consumer(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+    def push(self, chunk):
+        """
+        Adds int16 samples and computes every frame they complete
+        """
+        samples = np.concatenate((self._pending, np.asarray(chunk, dtype=np.int16)))
+        frames = (len(samples) - self.window) // self.hop + 1 if len(samples) >= self.window else 0
+        if frames:
+            windows = sliding_window_view(samples, self.window)[::self.hop][:frames]
+            features = self.compute(windows)
+            with self._lock:
+                for name, values in features.items():
+                    self.history[name].append(values)
+        self._pending = samples[frames * self.hop:]
+
+    def compute(self, windows):
+        """
+        Features of a (frames, window) int16 array, see FeatureBlock
+        """
+        scaled = windows.astype(np.float32) / 32768.0
+        level_db = rms_db(scaled[:, -self.hop:])
+
+        spectrum = np.fft.rfft(scaled * self.hann, self.n_fft)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        mel = np.log(power @ self.filterbank.T + 1e-10)
+        return {
+            "power": power,
+            "mel": mel,
+            "level_db": level_db,
+        }
+
+    def read(self, start, end):
+        """
+        FeatureBlock of frames [start, end) by absolute index, end clipped to the newest frame
+        """
+        with self._lock:
+            return self._read(start, end)
+
+    def _read(self, start, end):
+        end = min(end, self.end_index)
+        # copies, the ring buffers are overwritten by the next push() on the capture thread
+        return FeatureBlock(start, *(self.history[name].get(start, end).copy() for name in FEATURES))
+
+
+class FeatureConsumer:
+    """
+    One reader of a FeatureFrontend with its own position, see FeatureFrontend.add_consumer
+    """
+    def __init__(self, frontend, position):
+        self.frontend = frontend
+        self.position = position
+        # frames skipped because this consumer fell further behind than the history holds
+        self.lost_frames = 0
+
+    def read(self, max_frames=None):
+        """
+        The frames computed since the last read, at most max_frames of them,
+        or None if there are none yet
+        """
+        # under the frontend's lock, so a push can't overwrite the oldest frames in between
+        with self.frontend._lock:
+            oldest = self.frontend.start_index
+            if self.position < oldest:
+                self.lost_frames += oldest - self.position
+                self.position = oldest
+
+            end = self.frontend.end_index
+            if max_frames is not None:
+                end = min(end, self.position + max_frames)
+            if end <= self.position:
+                return None
+            block = self.frontend._read(self.position, end)
+        self.position += len(block)
+        return block
+
+    def close(self):
+        self.frontend.remove_consumer(self)
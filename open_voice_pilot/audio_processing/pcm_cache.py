@@ -0,0 +1,230 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import numpy as np
+
+from .audio_processor import drain, pcm_output, probe_audio
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "open_voice_pilot", "pcm")
+
+
+def file_hash(filepath, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CachedAudio:
+    """
+    Decoded 16-bit pcm served from a memory-mapped cache file.
+    Samples are interleaved when channels > 1; nothing is read from disk until it is indexed.
+    """
+    def __init__(self, samples, sample_rate, channels):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    @property
+    def duration(self):
+        return len(self.samples) / (self.sample_rate * self.channels)
+
+    def index_at(self, seconds):
+        """
+        Sample index of the frame at the given timestamp
+        """
+        frame = min(max(int(seconds * self.sample_rate), 0), len(self.samples) // self.channels)
+        return frame * self.channels
+
+    def slice_time(self, start_seconds, end_seconds):
+        return self.samples[self.index_at(start_seconds):self.index_at(end_seconds)]
+
+
+class DiskCache:
+    """
+    Directory of int16 pcm entries under opaque string keys, memory-mapped when read.
+
+    When the entries grow past max_bytes the least recently used are deleted; an entry's
+    mtime is its last use. Entries are written to a temp file in the same directory and
+    renamed into place, so readers in any thread or process see a whole entry or none,
+    and an entry evicted meanwhile reads as missing.
+    """
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path_for(self, key, suffix=".pcm"):
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def open(self, key):
+        """
+        Samples of the entry as a read-only memory map, or None if there is none
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+            return self._open(path)
+        except FileNotFoundError:
+            # never written, or evicted by another thread or process since
+            return None
+
+    @staticmethod
+    def _open(path):
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.int16)
+        return np.memmap(path, dtype=np.int16, mode="r")
+
+    def _temp_file(self, key):
+        """
+        (file, path) of a new temp file for the entry, unique to the caller
+        """
+        fd, temp_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=self.cache_dir)
+        return os.fdopen(fd, "wb"), temp_path
+
+    def _commit(self, temp_path, key, suffix=".pcm"):
+        path = self.path_for(key, suffix)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+
+    def entries(self):
+        """
+        Cache files as (mtime, size, path), least recently used first
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # evicted by another process or thread since listdir
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, keep=None):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # gone already, or still mapped by another reader on platforms that lock open files
+                continue
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+
+
+class PCMCache(DiskCache):
+    """
+    On-disk cache of decoded pcm, keyed by file content hash, sample rate and channels.
+
+    Entries are raw s16le files opened with np.memmap on a hit, evicted least recently
+    used past max_bytes like any DiskCache. The native format of each file is kept too,
+    in a small .format entry, so opening a cached file at its own rate doesn't run
+    ffprobe either.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=2 * 1024 ** 3):
+        super().__init__(cache_dir, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        # (path, size, mtime) -> content hash, so a file is hashed once per process
+        self._hashes = {}
+
+    def content_hash(self, filepath):
+        stat = os.stat(filepath)
+        file_id = (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+        if file_id not in self._hashes:
+            self._hashes[file_id] = file_hash(filepath)
+        return self._hashes[file_id]
+
+    def key(self, filepath, sample_rate, channels):
+        return f"{self.content_hash(filepath)}_{sample_rate}_{channels}"
+
+    def native_format(self, filepath):
+        """
+        (sample_rate, channels) of the file, probed once per file content
+        """
+        key = self.content_hash(filepath)
+        path = self.path_for(key, ".format")
+        try:
+            os.utime(path)
+            with open(path) as f:
+                sample_rate, channels = f.read().split()
+            return int(sample_rate), int(channels)
+        except (FileNotFoundError, ValueError):
+            pass
+        sample_rate, channels = probe_audio(filepath)
+        f, temp_path = self._temp_file(key)
+        with f:
+            f.write(f"{sample_rate} {channels}".encode())
+        self._commit(temp_path, key, ".format")
+        return sample_rate, channels
+
+    def get(self, filepath, sample_rate, channels):
+        """
+        Returns CachedAudio for the file, or None if it hasn't been decoded yet
+        """
+        samples = self.open(self.key(filepath, sample_rate, channels))
+        if samples is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CachedAudio(samples, sample_rate, channels)
+
+    def load(self, filepath, sample_rate, channels):
+        """
+        Returns CachedAudio for the file, decoding it with ffmpeg on a miss
+        """
+        cached = self.get(filepath, sample_rate, channels)
+        if cached is not None:
+            return cached
+
+        key = self.key(filepath, sample_rate, channels)
+        samples = self._decode(filepath, sample_rate, channels, key)
+        return CachedAudio(samples, sample_rate, channels)
+
+    def _decode(self, filepath, sample_rate, channels, key):
+        """
+        Decodes the file into the entry and returns its samples
+        """
+        # decode to a temp file first so a killed process never leaves a truncated entry behind
+        f, temp_path = self._temp_file(key)
+        process = pcm_output(filepath, sample_rate, channels).run_async(pipe_stdout=True, pipe_stderr=True)
+        stderr = drain(process.stderr)
+        try:
+            with f:
+                shutil.copyfileobj(process.stdout, f)
+            if process.wait() != 0:
+                import ffmpeg
+                raise ffmpeg.Error('ffmpeg', None, stderr())
+            # mapped before it is renamed into place, so an eviction right after can't take it away
+            samples = self._open(temp_path)
+            self._commit(temp_path, key)
+            return samples
+        finally:
+            process.stdout.close()
+            stderr()
+            process.stderr.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
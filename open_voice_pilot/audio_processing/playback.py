@@ -0,0 +1,228 @@
+import threading
+import time
+import numpy as np
+
+from .audio_processor import paInt16
+
+
+class PlaybackStats:
+    """
+    Timings of one StreamingPlayer.play call, in seconds from the start of the call
+    """
+    def __init__(self):
+        self.time_to_first_byte = None
+        self.time_to_first_audio = None
+        self.total_time = None
+        self.audio_seconds = 0.0
+        self.underruns = 0
+        self.interrupted = False
+        # from stop() to play() returning
+        self.stop_latency = None
+
+    def __repr__(self):
+        def ms(seconds):
+            return "n/a" if seconds is None else f"{seconds * 1000:.0f} ms"
+        stopped = f", stopped in {ms(self.stop_latency)}" if self.stop_latency is not None else ""
+        return (f"PlaybackStats(first byte: {ms(self.time_to_first_byte)}, first audio: {ms(self.time_to_first_audio)}, "
+                f"total: {ms(self.total_time)}, audio: {self.audio_seconds:.2f} s, underruns: {self.underruns}{stopped})")
+
+
+class StreamingPlayer:
+    """
+    Plays audio while it is still arriving, e.g. from a streaming TTS response.
+
+    play() takes an iterable of encoded byte chunks. 'pcm' input (16-bit little endian,
+    like OpenAI's response_format="pcm") is played as is, any other format is decoded by an
+    ffmpeg subprocess as the bytes come in. Playback starts once jitter_buffer_ms of audio
+    is buffered. The output stream stays open between calls.
+
+    Audio goes to the device in blocks of at most max_write_ms, so stop() takes effect
+    within one block plus the device's own buffer. on_write(pcm, start_time) is called
+    with every block and the time.perf_counter() time it starts playing, e.g. to feed an
+    EchoSuppressor the reference of what the microphone is about to hear.
+
+    begin() marks the player as playing ahead of play(), for callers that do some work
+    (e.g. a TTS request) before the first chunk: a stop() from then on interrupts the
+    coming play() instead of being forgotten by it.
+
+    audio_interface replaces pyaudio.PyAudio(), e.g. with a FakeAudioInterface.
+    """
+    def __init__(self, sample_rate=24000, channels=1, input_format='pcm', jitter_buffer_ms=100, output_device_index=None, audio_interface=None, max_write_ms=20, on_write=None):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.input_format = input_format
+        self.jitter_buffer_ms = jitter_buffer_ms
+        self.output_device_index = output_device_index
+        self.audio = audio_interface
+        self.max_write_ms = max_write_ms
+        self.on_write = on_write
+        self.stream = None
+        self.playing = False
+        self._stop = threading.Event()
+        self._stop_time = None
+
+    def open(self):
+        if self.stream is not None:
+            return
+        if self.audio is None:
+            import pyaudio
+            self.audio = pyaudio.PyAudio()
+        self.stream = self.audio.open(format=paInt16, channels=self.channels, rate=self.sample_rate, output=True, output_device_index=self.output_device_index)
+
+    def _decoded(self, byte_chunks):
+        if self.input_format == 'pcm':
+            yield from byte_chunks
+            return
+
+        import ffmpeg
+        process = (
+            ffmpeg
+            .input('pipe:', format=self.input_format)
+            .output('pipe:', format='s16le', acodec='pcm_s16le', ac=self.channels, ar=self.sample_rate)
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdin=True, pipe_stdout=True)
+        )
+
+        def write_input():
+            try:
+                for chunk in byte_chunks:
+                    if self._stop.is_set():
+                        break
+                    process.stdin.write(chunk)
+                    process.stdin.flush()
+            except BrokenPipeError:
+                pass
+            finally:
+                process.stdin.close()
+
+        writer = threading.Thread(target=write_input, daemon=True)
+        writer.start()
+        try:
+            while True:
+                # read1 hands over whatever ffmpeg has decoded so far instead of waiting for a full block
+                pcm = process.stdout.read1(4096)
+                if not pcm:
+                    break
+                yield pcm
+        finally:
+            if process.poll() is None:
+                process.kill()
+            writer.join()
+            process.stdout.close()
+            process.wait()
+
+    def play(self, byte_chunks):
+        """
+        Plays the audio, blocking until it has been written to the device or stop() is called.
+        Returns PlaybackStats.
+        """
+        self.open()
+        if not self.playing:
+            self.begin()
+        stats = PlaybackStats()
+        start = time.perf_counter()
+
+        frame_bytes = 2 * self.channels
+        jitter_bytes = int(self.sample_rate * self.jitter_buffer_ms / 1000) * frame_bytes
+        block_bytes = max(1, int(self.sample_rate * self.max_write_ms / 1000)) * frame_bytes
+        pending = bytearray()
+        # wall clock time at which everything written so far will have been played
+        played_until = None
+
+        def timed(chunks):
+            for chunk in chunks:
+                if stats.time_to_first_byte is None:
+                    stats.time_to_first_byte = time.perf_counter() - start
+                yield chunk
+
+        def write(data):
+            """
+            Writes whole frames block by block, False if stopped before the end
+            """
+            nonlocal played_until
+            for offset in range(0, len(data), block_bytes):
+                if self._stop.is_set():
+                    return False
+                block = bytes(data[offset:offset + block_bytes])
+                now = time.perf_counter()
+                if played_until is None:
+                    stats.time_to_first_audio = now - start
+                    played_until = now
+                elif now > played_until + 0.002:
+                    # the device ran dry waiting for data
+                    stats.underruns += 1
+                    played_until = now
+                if self.on_write is not None:
+                    self.on_write(block, played_until)
+                self.stream.write(block)
+                seconds = len(block) / frame_bytes / self.sample_rate
+                played_until += seconds
+                stats.audio_seconds += seconds
+            return True
+
+        try:
+            # stopped after begin(), before any of the audio was even requested
+            if self._stop.is_set():
+                stats.interrupted = True
+                byte_chunks = ()
+            for pcm in self._decoded(timed(byte_chunks)):
+                if self._stop.is_set():
+                    stats.interrupted = True
+                    break
+                pending += pcm
+                if played_until is None and len(pending) < jitter_bytes:
+                    continue
+                whole_frames = len(pending) - len(pending) % frame_bytes
+                if whole_frames:
+                    if not write(pending[:whole_frames]):
+                        stats.interrupted = True
+                        break
+                    del pending[:whole_frames]
+
+            if pending and not stats.interrupted:
+                stats.interrupted = not write(pending[:len(pending) - len(pending) % frame_bytes])
+        finally:
+            self.playing = False
+
+        end = time.perf_counter()
+        stats.total_time = end - start
+        if stats.interrupted and self._stop_time is not None:
+            stats.stop_latency = end - self._stop_time
+        return stats
+
+    def play_array(self, samples):
+        """
+        Plays int16 samples at the player's sample rate
+        """
+        return self.play([np.asarray(samples, dtype=np.int16).tobytes()])
+
+    def begin(self):
+        """
+        Starts a reply: playing is True and stop() interrupts the next play(), until end()
+        or the end of that play()
+        """
+        self._stop.clear()
+        self._stop_time = None
+        self.playing = True
+
+    def end(self):
+        """
+        Ends a reply begun with begin() that won't be played after all
+        """
+        self.playing = False
+
+    def stop(self):
+        """
+        Interrupts play() from another thread
+        """
+        self._stop_time = time.perf_counter()
+        self._stop.set()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        if self.audio is not None:
+            self.audio.terminate()
+            self.audio = None
@@ -0,0 +1,106 @@
+import threading
+
+from .audio_processor import AudioProcessor
+from .ring_buffer import RingBuffer
+
+
+class Reframer:
+    """
+    Splits one AudioProcessor into any number of consumers with their own frame size and hop.
+
+    The source is read at its native block size into a shared RingBuffer, and each consumer
+    keeps its own absolute read position into it, so switching between consumers (e.g. wake
+    word at 4000 samples, VAD at 160 samples) needs no reopening and drops no samples.
+    Frames that don't wrap the ring are zero-copy views, valid until `history_samples` more
+    samples have been read from the source.
+
+    Without a processor the Reframer is fed with push(), and consumers return None
+    whenever they have caught up with what was pushed.
+    """
+    def __init__(self, processor=None, history_samples=16000 * 120):
+        self.processor = processor
+        self.buffer = RingBuffer(history_samples)
+        self.consumers = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add_consumer(self, frame_size, hop=None, position=None):
+        """
+        Returns a FrameConsumer reading frame_size samples every hop samples (default: frame_size),
+        starting at the absolute sample index `position` (default: the newest sample)
+        """
+        consumer = FrameConsumer(self, frame_size, hop or frame_size, self.buffer.end_index if position is None else position)
+        self.consumers.append(consumer)
+        return consumer
+
+    def remove_consumer(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+    def fill(self, end_index):
+        """
+        Reads from the source until sample end_index - 1 is buffered.
+        Returns False if the source ended first.
+        """
+        while self.buffer.end_index < end_index:
+            if self.finished or self.processor is None:
+                return False
+            chunk = self.processor.read_chunk()
+            if chunk is None:
+                self.finished = True
+                return False
+            self.buffer.append(chunk)
+        return True
+
+    def push(self, chunk):
+        with self._lock:
+            self.buffer.append(chunk)
+
+    def read(self, start, end):
+        """
+        Samples [start, end) by absolute index, reading the source as needed.
+        Returns None if the source ended before end.
+        """
+        with self._lock:
+            if not self.fill(end):
+                return None
+            return self.buffer.get(start, end)
+
+    def close(self):
+        if self.processor is not None:
+            self.processor.close()
+
+
+class FrameConsumer(AudioProcessor):
+    """
+    One view of a Reframer's source, see Reframer.add_consumer.
+    read_chunk returns None when the source can't fill a whole frame.
+    """
+    def __init__(self, reframer, frame_size, hop, position):
+        self.reframer = reframer
+        self.frame_size = frame_size
+        self.hop = hop
+        self.position = position
+        # samples skipped because this consumer fell further behind than the ring holds
+        self.lost_samples = 0
+
+    def seek(self, position):
+        """
+        Moves the next frame to start at absolute sample index `position`
+        """
+        self.position = position
+
+    def read_chunk(self):
+        oldest = self.reframer.buffer.start_index
+        if self.position < oldest:
+            self.lost_samples += oldest - self.position
+            self.position = oldest
+
+        frame = self.reframer.read(self.position, self.position + self.frame_size)
+        if frame is None:
+            return None
+        self.position += self.hop
+        return frame
+
+    def close(self):
+        self.reframer.remove_consumer(self)
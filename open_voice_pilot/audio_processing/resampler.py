@@ -0,0 +1,236 @@
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .audio_processor import AudioProcessor
+
+
+def lowpass_filter(up, down, taps_per_phase=32, beta=8.0, rolloff=0.95):
+    """
+    Kaiser windowed sinc for resampling by up/down, up * taps_per_phase taps long,
+    cutting off just below the lower of the two Nyquist frequencies.
+    An even length gets a trailing zero, so the centre is always a whole tap: (length - 1) // 2
+    """
+    length = up * taps_per_phase
+    odd = length - 1 + length % 2
+    cutoff = rolloff * 0.5 / max(up, down)
+    t = np.arange(odd) - (odd - 1) // 2
+    h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(odd, beta)
+    return np.concatenate((h / h.sum(), np.zeros(length - odd)))
+
+
+class PolyphaseResampler:
+    """
+    Streaming rational resampler for float audio of shape (frames,) or (frames, channels).
+
+    Only the taps_per_phase filter taps of each output sample's phase are evaluated, so
+    the cost is taps_per_phase multiply-adds per output sample whatever the ratio.
+    Filter state carries over between process() calls, and output sample k lines up
+    with input time k * in_rate / out_rate, delayed by taps_per_phase / 2 input samples
+    of latency. Scratch buffers are kept between calls and only grow.
+    """
+    def __init__(self, in_rate, out_rate, channels=1, taps_per_phase=32, beta=8.0):
+        gcd = math.gcd(int(in_rate), int(out_rate))
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = int(out_rate) // gcd
+        self.down = int(in_rate) // gcd
+        self.channels = channels
+        self.taps = taps_per_phase
+
+        h = lowpass_filter(self.up, self.down, taps_per_phase, beta) * self.up
+        # phase p uses taps h[p], h[p + up], ..., reversed to run over input in time order
+        self.phase_filters = np.ascontiguousarray(h.reshape(taps_per_phase, self.up).T[:, ::-1], dtype=np.float32)
+
+        self._input = np.zeros((0, channels), np.float32)
+        self._windows = np.zeros((0, channels, self.taps), np.float32)
+        self._filters = np.zeros((0, self.taps), np.float32)
+        self._output = np.zeros((0, channels), np.float32)
+        self._positions = np.zeros(0, np.int64)
+        self._index = np.zeros(0, np.int64)
+        self._phase = np.zeros(0, np.int64)
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros((self.taps - 1, self.channels), np.float32)
+        # next output position relative to the start of the next input, in 1/up input samples,
+        # starting half the filter in so outputs are centred on their input time
+        self._t = (self.up * self.taps - 1) // 2
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def output_frames(self, frames):
+        """
+        Number of output frames process() returns for the next `frames` input frames
+        """
+        return max(0, -(-(frames * self.up - self._t) // self.down))
+
+    def _reserve(self, frames, outputs):
+        rows = self.taps - 1 + frames
+        if len(self._input) < rows:
+            self._input = np.zeros((rows, self.channels), np.float32)
+        if len(self._output) < outputs:
+            self._windows = np.zeros((outputs, self.channels, self.taps), np.float32)
+            self._filters = np.zeros((outputs, self.taps), np.float32)
+            self._output = np.zeros((outputs, self.channels), np.float32)
+            self._positions = np.arange(outputs, dtype=np.int64) * self.down
+            self._index = np.zeros(outputs, np.int64)
+            self._phase = np.zeros(outputs, np.int64)
+
+    def process(self, samples, out=None):
+        """
+        Resamples the next block of input. Returns float32 output of the same layout,
+        written into out[:n] if given (see output_frames for n)
+        """
+        samples = np.asarray(samples)
+        flat = samples.ndim == 1
+        frames = len(samples)
+        n = self.output_frames(frames)
+        self._reserve(frames, n)
+
+        history = self.taps - 1
+        buffer = self._input[:history + frames]
+        buffer[:history] = self._history
+        buffer[history:] = samples.reshape(frames, self.channels)
+
+        if n:
+            index, phase = self._index[:n], self._phase[:n]
+            np.add(self._positions[:n], self._t, out=index)
+            np.remainder(index, self.up, out=phase)
+            np.floor_divide(index, self.up, out=index)
+            # window s of the buffer ends at input sample s of this block
+            windows = sliding_window_view(buffer, self.taps, axis=0)
+            np.take(windows, index, axis=0, out=self._windows[:n], mode='clip')
+            np.take(self.phase_filters, phase, axis=0, out=self._filters[:n], mode='clip')
+            np.einsum('kt,kct->kc', self._filters[:n], self._windows[:n], out=self._output[:n])
+
+        self._history[:] = buffer[frames:]
+        self._t += n * self.down - frames * self.up
+        self.frames_in += frames
+        self.frames_out += n
+
+        result = self._output[:n]
+        if out is None:
+            out = result.copy()
+        else:
+            out = out[:n]
+            out[:] = result.reshape(out.shape)
+        return out[:, 0] if flat and out.ndim == 2 else out
+
+    def flush(self):
+        """
+        The output still held back by the filter latency, up to the frame count
+        that matches all the input so far
+        """
+        expected = -(-self.frames_in * self.up // self.down)
+        tail = self.process(np.zeros((self.taps, self.channels) if self.channels > 1 else self.taps, np.float32))
+        return tail[:max(0, expected - (self.frames_out - len(tail)))]
+
+
+def downmix(samples, channels, out=None):
+    """
+    Interleaved int16 samples to one float32 channel, the mean of all channels
+    """
+    frames = np.asarray(samples).reshape(-1, channels)
+    if out is None:
+        return frames.mean(axis=1, dtype=np.float32)
+    return np.mean(frames, axis=1, dtype=np.float32, out=out[:len(frames)])
+
+
+def to_int16(samples, out=None):
+    """
+    Rounds and clips float samples in place, then converts them, into out if given
+    """
+    np.rint(samples, out=samples)
+    np.clip(samples, -32768, 32767, out=samples)
+    if out is None:
+        return samples.astype(np.int16)
+    out[:] = samples
+    return out
+
+
+class ResamplingProcessor(AudioProcessor):
+    """
+    Wraps an AudioProcessor, converting its 16-bit pcm to sample_rate and channels.
+
+    Input rate and channels default to the processor's own (sample_rate or rate, channels).
+    Several channels are downmixed to mono before resampling when channels=1, otherwise
+    the channel count has to stay the same. Chunks come out interleaved int16 like the
+    wrapped processor, with the filter tail flushed when it ends.
+
+    processor = ResamplingProcessor(MicrophoneAudioProcessor(rate=44100, channels=2), sample_rate=16000)
+    """
+    def __init__(self, processor, sample_rate=16000, channels=1, in_rate=None, in_channels=None, taps_per_phase=32):
+        self.processor = processor
+        self.in_rate = in_rate or getattr(processor, 'sample_rate', None) or processor.rate
+        self.in_channels = in_channels or getattr(processor, 'channels', 1)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        if channels != 1 and channels != self.in_channels:
+            raise ValueError(f"can't mix {self.in_channels} channels into {channels}")
+
+        self.downmix = channels == 1 and self.in_channels > 1
+        self.passthrough = self.in_rate == sample_rate and not self.downmix
+        self.resampler = PolyphaseResampler(self.in_rate, sample_rate, channels, taps_per_phase)
+
+        # with a known chunk size the source is read into one buffer, see read_chunk_into
+        in_samples = getattr(processor, 'chunk_samples', None)
+        self._source = np.zeros(in_samples or 0, np.int16)
+        self.chunk_samples = None
+        if in_samples:
+            in_frames = in_samples // self.in_channels
+            self.chunk_samples = (-(-in_frames * self.resampler.up // self.resampler.down) + 1) * channels
+        self._mono = np.zeros(0, np.float32)
+        self._resampled = np.zeros((0, channels), np.float32)
+        self._finished = False
+
+    def _read_source(self):
+        if not len(self._source):
+            return self.processor.read_chunk()
+        read = self.processor.read_chunk_into(self._source)
+        return None if read is None else self._source[:read]
+
+    def _resample(self):
+        """
+        The next chunk resampled to float, in a scratch buffer, or None at the end
+        """
+        if self._finished:
+            return None
+        chunk = self._read_source()
+        if chunk is None:
+            self._finished = True
+            tail = self.resampler.flush()
+            return tail.reshape(-1, self.channels) if len(tail) else None
+
+        if self.downmix:
+            frames = len(chunk) // self.in_channels
+            if len(self._mono) < frames:
+                self._mono = np.zeros(frames, np.float32)
+            chunk = downmix(chunk, self.in_channels, out=self._mono)
+        else:
+            chunk = chunk.reshape(-1, self.channels)
+
+        frames = self.resampler.output_frames(len(chunk))
+        if len(self._resampled) < frames:
+            self._resampled = np.zeros((frames, self.channels), np.float32)
+        return self.resampler.process(chunk, out=self._resampled).reshape(-1, self.channels)
+
+    def read_chunk(self):
+        if self.passthrough:
+            return self.processor.read_chunk()
+        resampled = self._resample()
+        return None if resampled is None else to_int16(resampled).reshape(-1)
+
+    def read_chunk_into(self, buffer):
+        if self.passthrough:
+            return self.processor.read_chunk_into(buffer)
+        resampled = self._resample()
+        if resampled is None:
+            return None
+        samples = resampled.size
+        to_int16(resampled, out=buffer[:samples].reshape(resampled.shape))
+        return samples
+
+    def close(self):
+        self.processor.close()
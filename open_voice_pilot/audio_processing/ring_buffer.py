@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity circular buffer of audio samples, addressed by absolute sample index.
+
+    Sample i is the i-th sample ever appended. Only the last `capacity` samples are kept,
+    so memory stays flat no matter how long the buffer is written to.
+    Slicing with absolute indices returns a zero-copy view when the range doesn't wrap
+    around the end of the storage, and a copy when it does.
+    With a shape, every entry is an array of that shape instead of one sample (e.g. a spectrum).
+    """
+    def __init__(self, capacity, dtype=np.int16, shape=()):
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.data = np.zeros((capacity,) + self.shape, dtype=dtype)
+        # total number of samples ever appended, i.e. the absolute index of the next sample
+        self.end_index = 0
+
+    @property
+    def start_index(self):
+        """
+        Absolute index of the oldest sample still held
+        """
+        return max(0, self.end_index - self.capacity)
+
+    def __len__(self):
+        return self.end_index - self.start_index
+
+    def append(self, chunk):
+        chunk = np.asarray(chunk, dtype=self.data.dtype).reshape((-1,) + self.shape)
+        if len(chunk) > self.capacity:
+            # only the tail survives, skip writing what would be overwritten anyway
+            self.end_index += len(chunk) - self.capacity
+            chunk = chunk[-self.capacity:]
+
+        pos = self.end_index % self.capacity
+        first = min(len(chunk), self.capacity - pos)
+        self.data[pos:pos + first] = chunk[:first]
+        self.data[:len(chunk) - first] = chunk[first:]
+        self.end_index += len(chunk)
+
+    def get(self, start, end):
+        """
+        Returns samples [start, end) by absolute index.
+        end is clipped to the newest sample, like numpy slicing past the end of an array.
+        """
+        end = min(end, self.end_index)
+        if start < self.start_index:
+            raise IndexError(f"sample {start} has been overwritten, oldest available is {self.start_index}")
+        if end <= start:
+            return self.data[:0]
+
+        pos = start % self.capacity
+        length = end - start
+        if pos + length <= self.capacity:
+            return self.data[pos:pos + length]
+        return np.concatenate((self.data[pos:], self.data[:pos + length - self.capacity]))
+
+    def latest(self, num_samples):
+        """
+        Returns the most recent num_samples samples
+        """
+        return self.get(max(self.start_index, self.end_index - num_samples), self.end_index)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            if key < 0:
+                key += self.end_index
+            if not self.start_index <= key < self.end_index:
+                raise IndexError(f"sample {key} is not in the buffer")
+            return self.data[key % self.capacity]
+
+        if key.step not in (None, 1):
+            raise ValueError("RingBuffer slices don't support a step")
+        start = self.start_index if key.start is None else key.start
+        end = self.end_index if key.stop is None else key.stop
+        return self.get(start, end)
+
+    def clear(self):
+        self.end_index = 0
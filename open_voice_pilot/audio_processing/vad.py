@@ -0,0 +1,92 @@
+import numpy as np
+
+
+def frame_view(samples, frame_size):
+    """
+    Zero-copy (num_frames, frame_size) view of the whole frames in a 1-D array
+    """
+    num_frames = len(samples) // frame_size
+    return samples[:num_frames * frame_size].reshape(num_frames, frame_size)
+
+
+def rms_db(frames):
+    """
+    RMS level in dBFS of each row of a (num_frames, frame_size) float array scaled to full scale 1
+    """
+    # einsum computes the sum of squares without a second frames-sized temporary
+    power = np.einsum('ij,ij->i', frames, frames) / frames.shape[1]
+    return 10.0 * np.log10(power + 1e-12)
+
+
+class EnergyVAD:
+    """
+    Energy voice activity detector: a frame is speech when its RMS level is above threshold_db (dBFS).
+
+    is_speech() scores one frame for the streaming path, speech_mask() scores a whole
+    array in one vectorized pass; both use the same per-frame level so they always agree.
+    """
+    def __init__(self, sample_rate=16000, frame_ms=10, threshold_db=-40.0):
+        self.sample_rate = sample_rate
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.threshold_db = threshold_db
+
+    def frame_levels(self, samples):
+        """
+        RMS level in dBFS of every whole frame in samples
+        """
+        frames = frame_view(np.asarray(samples), self.frame_size).astype(np.float32)
+        frames /= 32768.0
+        return rms_db(frames)
+
+    def speech_mask(self, samples):
+        return self.frame_levels(samples) > self.threshold_db
+
+    def feature_mask(self, block):
+        """
+        speech_mask of the frames of a FeatureBlock, from the levels a FeatureFrontend
+        already computed; the frontend's hop has to be this VAD's frame size
+        """
+        return block.level_db > self.threshold_db
+
+    def is_speech(self, frame, sample_rate=None):
+        """
+        Same call as webrtcvad.Vad.is_speech, frame may be int16 samples or their bytes
+        """
+        if isinstance(frame, (bytes, bytearray, memoryview)):
+            frame = np.frombuffer(frame, dtype=np.int16)
+        return bool(self.speech_mask(frame)[0])
+
+
+def webrtc_speech_mask(vad, samples, sample_rate=16000, frame_ms=10):
+    """
+    Runs a webrtcvad.Vad over every whole frame in samples.
+    Frames are handed over as memoryview slices of one buffer instead of a tobytes() copy each.
+    """
+    frame_size = sample_rate * frame_ms // 1000
+    num_frames = len(samples) // frame_size
+    frame_bytes = frame_size * 2
+    buffer = memoryview(np.ascontiguousarray(samples, dtype=np.int16)).cast('B')
+    mask = np.empty(num_frames, dtype=bool)
+    for i in range(num_frames):
+        mask[i] = vad.is_speech(buffer[i * frame_bytes:(i + 1) * frame_bytes], sample_rate)
+    return mask
+
+
+def processor_speech_mask(processor, mask_fn, frame_size):
+    """
+    Speech mask of everything an AudioProcessor returns, e.g. a FileAudioProcessor read in large
+    chunks. mask_fn(samples) -> per-frame mask, like EnergyVAD.speech_mask; samples that don't
+    fill a whole frame are carried over to the next chunk.
+    """
+    masks = []
+    remainder = np.zeros(0, dtype=np.int16)
+    while True:
+        chunk = processor.read_chunk()
+        if chunk is None:
+            break
+        if len(remainder):
+            chunk = np.concatenate((remainder, chunk))
+        whole = len(chunk) - len(chunk) % frame_size
+        masks.append(mask_fn(chunk[:whole]))
+        remainder = chunk[whole:]
+    return np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
@@ -0,0 +1,27 @@
+import io
+import wave
+import numpy as np
+
+
+def encode_wav(samples, sample_rate, channels=1):
+    """
+    Encodes int16 samples (interleaved if channels > 1) as wav file bytes, in memory
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+    return buffer.getvalue()
+
+
+def decode_wav(data):
+    """
+    Returns (samples, sample_rate, channels) of 16-bit wav file bytes
+    """
+    with wave.open(io.BytesIO(data), "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError("only 16-bit wav is supported")
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2")
+        return samples, wav.getframerate(), wav.getnchannels()
@@ -0,0 +1,70 @@
+import threading
+
+import numpy as np
+
+from .ring_buffer import RingBuffer
+
+
+class WaveformEnvelope:
+    """
+    Min/max envelope of the last `seconds` of a stream, at a fixed number of columns.
+
+    Each column holds the smallest and largest sample of seconds * sample_rate / columns
+    consecutive samples, so a waveform drawn from it is exactly as detailed as the screen
+    (one column per pixel) and takes the same memory and drawing time however long the
+    stream runs. Interleaved multi-channel audio is averaged to one channel.
+    """
+    def __init__(self, sample_rate, seconds=10.0, columns=1000, channels=1):
+        self.sample_rate = sample_rate
+        self.columns = columns
+        self.channels = channels
+        self.samples_per_column = max(1, round(seconds * sample_rate / columns))
+        self.minimum = RingBuffer(columns)
+        self.maximum = RingBuffer(columns)
+        self.samples = 0
+        # samples of the column still being filled
+        self._pending = np.zeros(0, np.int16)
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self):
+        return self.columns * self.samples_per_column / self.sample_rate
+
+    def push(self, chunk):
+        chunk = np.asarray(chunk)
+        if self.channels > 1:
+            chunk = chunk.reshape(-1, self.channels).mean(axis=1).astype(np.int16)
+        samples = np.concatenate((self._pending, chunk))
+        complete = len(samples) // self.samples_per_column
+        if complete:
+            columns = samples[:complete * self.samples_per_column].reshape(complete, self.samples_per_column)
+            with self._lock:
+                self.minimum.append(columns.min(axis=1))
+                self.maximum.append(columns.max(axis=1))
+        self._pending = samples[complete * self.samples_per_column:]
+        self.samples += len(chunk)
+
+    def snapshot(self, out=None):
+        """
+        (2, columns) float array of the minimum and maximum of every column, newest on the right,
+        NaN where the stream hasn't reached yet. Written into out if given.
+        """
+        if out is None:
+            out = np.empty((2, self.columns), np.float32)
+        with self._lock:
+            minimum = self.minimum.latest(self.columns)
+            maximum = self.maximum.latest(self.columns)
+            out[:, :self.columns - len(minimum)] = np.nan
+            out[0, self.columns - len(minimum):] = minimum
+            out[1, self.columns - len(maximum):] = maximum
+        return out
+
+    def clear(self):
+        """
+        Forgets the envelope so far, the next column starts with the next push
+        """
+        with self._lock:
+            self.minimum.clear()
+            self.maximum.clear()
+            self._pending = np.zeros(0, np.int16)
+            self.samples = 0
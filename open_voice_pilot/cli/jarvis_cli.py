@@ -1,3 +1,128 @@
+import argparse
+import os
+import threading
+
+from ..audio_processing import FileAudioProcessor, MicrophoneAudioProcessor, PCMCache, ResamplingProcessor, default_sample_rate, list_microphones
+from ..assistant import AssistantDaemon, Jarvis, MultiRoomDaemon
+from ..pipeline import Tracer
+from ..speech import TTSCache
+from ..startup import StartupProfiler
+from ..wake_word import BatchedWakeWord
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='jarvis', description='Runs JARVIS as a long-lived process: the microphone, models and clients stay open between interactions')
+    parser.add_argument('--input', type=str, nargs='+', help='answer the wake words in these audio files and exit, instead of listening to the microphone')
+    parser.add_argument('--device', type=int, nargs='+', help='microphone indexes, defaults to the system input device. Several microphones are served as separate rooms')
+    parser.add_argument('--output-device', type=int, nargs='+', help='speaker index for each room, in the same order as --device or --input')
+    parser.add_argument('--mic-rate', type=int, help='sample rate to open the microphones at, defaults to their native rate. Audio is resampled to 16 kHz')
+    parser.add_argument('--mic-channels', type=int, default=1, help='channels to open the microphones with, downmixed to mono')
+    parser.add_argument('--list-microphones', action='store_true', help='print the microphone indexes and exit')
+    parser.add_argument('--no-cache', action='store_true', help='decode the input file with ffmpeg on every run instead of using the pcm cache')
+    parser.add_argument('--threshold', type=float, default=0.25, help='hey_jarvis score that counts as a detection')
+    parser.add_argument('--wake-word-hop-ms', type=int, default=80, help='how often the wake word is scored, a multiple of 80 ms')
+    parser.add_argument('--wake-word-frames', type=int, nargs=2, default=(2, 3), metavar=('MIN', 'WINDOW'), help='a detection takes MIN scores above the threshold within the last WINDOW')
+    parser.add_argument('--no-incremental-asr', action='store_true', help='transcribe each utterance in one request after VAD ends')
+    parser.add_argument('--conversation-timeout', type=float, default=300, help='seconds without a turn after which the conversation starts over')
+    parser.add_argument('--token-budget', type=int, default=2000, help='most tokens sent to the LLM per request, older turns are summarized to stay under it')
+    parser.add_argument('--no-tts-cache', action='store_true', help='synthesize every reply instead of replaying the ones spoken before from the tts cache')
+    parser.add_argument('--tts-phrases', type=str, help='text file with one phrase per line to synthesize into the tts cache at startup')
+    parser.add_argument('--record-dir', type=str, help='save every utterance and reply as wav files in a new directory under this one, nothing is written to disk otherwise')
+    parser.add_argument('--no-echo-suppression', action='store_true', help="don't remove the assistant's own replies from the microphone audio, e.g. with headphones")
+    parser.add_argument('--trace-file', type=str, help='write per-stage latency percentiles to this json file after every utterance')
+    parser.add_argument('--metrics-port', type=int, help='serve per-stage latency metrics for prometheus at http://localhost:<port>/metrics')
+    parser.add_argument('--startup-report', action='store_true', help='print how long each import and model load took once everything is warm')
+    args = parser.parse_args(argv)
+    if args.wake_word_hop_ms <= 0 or args.wake_word_hop_ms % 80:
+        parser.error(f"--wake-word-hop-ms has to be a multiple of 80, the wake word model's frame, got {args.wake_word_hop_ms}")
+    rooms = len(args.input) if args.input is not None else len(args.device or [None])
+    if args.output_device is not None and len(args.output_device) != rooms:
+        parser.error(f"--output-device needs one speaker per room, got {len(args.output_device)} for {rooms} rooms")
+    return args
+
+
+def read_phrases(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def open_microphone(device, rate=None, channels=1):
+    """
+    Opens a microphone at its native rate (many refuse others) in 50 ms blocks,
+    converted to the 16 kHz mono the models expect
+    """
+    rate = rate or default_sample_rate(device)
+    microphone = MicrophoneAudioProcessor(device, chunk_size=rate // 20, channels=channels, rate=rate, callback=True, queue_size=64)
+    if rate == 16000 and channels == 1:
+        return microphone
+    return ResamplingProcessor(microphone, sample_rate=16000, channels=1)
+
+
+def cli(argv=None):
+    args = parse_args(argv)
+    if args.list_microphones:
+        list_microphones()
+        return
 
-def cli():
     print("Hello, I am Jarvis, your personal assistant. How can I help you today?")
+
+    profiler = StartupProfiler()
+    tracer = Tracer()
+    if args.metrics_port is not None:
+        tracer.serve(args.metrics_port)
+
+    live = args.input is None
+    jarvis_args = dict(
+        incremental_asr=not args.no_incremental_asr,
+        wake_word_threshold=args.threshold,
+        wake_word_hop=args.wake_word_hop_ms * 16,
+        wake_word_min_frames=args.wake_word_frames[0],
+        wake_word_window=args.wake_word_frames[1],
+        tracer=tracer,
+        trace_path=args.trace_file,
+        profiler=profiler,
+        conversation_timeout=args.conversation_timeout,
+        token_budget=args.token_budget,
+        tts_cache=None if args.no_tts_cache else TTSCache(),
+        record_dir=args.record_dir,
+        echo_suppression=not args.no_echo_suppression,
+        batch_vad=not live,
+    )
+
+    # sources are read in 50 ms blocks at the rate the models expect
+    with profiler.measure("open audio source"):
+        if args.input is not None:
+            cache = None if args.no_cache else PCMCache()
+            # numbered, files of the same name from different directories are different rooms
+            sources = {f"{i}:{os.path.basename(path)}": FileAudioProcessor(path, chunk_size=800, sample_rate=16000, channels=1, cache=cache) for i, path in enumerate(args.input)}
+        else:
+            sources = {f"mic{device}": open_microphone(device, args.mic_rate, args.mic_channels) for device in args.device or [None]}
+    output_devices = args.output_device or [None] * len(sources)
+
+    if len(sources) == 1:
+        jarvis = Jarvis(output_device_index=output_devices[0], **jarvis_args)
+        daemon = AssistantDaemon(jarvis, *sources.values(), live=live)
+        rooms = [jarvis]
+    else:
+        with profiler.measure("load batched wake word model"):
+            detector = BatchedWakeWord.from_openwakeword()
+        daemon = MultiRoomDaemon(detector, live=live)
+        rooms = [daemon.add_room(name, source, output_device_index=output_device, **jarvis_args).jarvis
+                 for (name, source), output_device in zip(sources.items(), output_devices)]
+
+    # the rooms share one cache, so the phrases are rendered once, on the first room's warmup
+    if args.tts_phrases and rooms[0].tts_cache is not None:
+        rooms[0].warmup.submit("tts phrases", rooms[0].prerender_phrases, read_phrases(args.tts_phrases))
+
+    if args.startup_report:
+        def report():
+            for jarvis in rooms:
+                jarvis.warmup.wait()
+            print(profiler.report())
+        threading.Thread(target=report, daemon=True).start()
+
+    daemon.run()
+
+    for name, stats in daemon.stats().items():
+        print(f"{name}: {stats}")
+    tracer.close()
@@ -0,0 +1,2 @@
+from .engine import *
+from .tracing import *
@@ -0,0 +1,212 @@
+import inspect
+import queue
+import threading
+import time
+
+# marks the end of input, passed down the pipeline stage by stage
+_END = object()
+
+
+class Stage:
+    """
+    One pipeline step: a worker thread taking items from a bounded input queue.
+
+    fn(item) returns the item to hand to the next stage, or None to hand over nothing.
+    A generator fn can hand over any number of items per input.
+    If release is set, it is called with each input item once fn is done with it
+    (or it was dropped), e.g. to hand a pooled buffer back.
+
+    block is how the stage hands its outputs on: False drops an output the next stage's
+    full queue can't take (counted in that stage's dropped), so a slow stage never stalls
+    the ones before it; True waits for room, for input where nothing may be lost.
+    """
+    def __init__(self, name, fn, queue_size=8, block=False):
+        self.name = name
+        self.fn = fn
+        self.input = queue.Queue(maxsize=queue_size)
+        self.next_stage = None
+        self.block = block
+        self.thread = None
+        self.release = None
+
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+        self.max_queue_depth = 0
+        self._stats_lock = threading.Lock()
+
+    def put(self, item, block=True):
+        """
+        Queues an item for this stage. With block=False a full queue drops the item
+        and counts it instead of waiting. Returns whether the item was queued.
+        """
+        try:
+            self.input.put(item, block=block)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            if self.release is not None:
+                self.release(item)
+            return False
+        with self._stats_lock:
+            self.max_queue_depth = max(self.max_queue_depth, self.input.qsize())
+        return True
+
+    def _forward(self, item):
+        if item is not None and self.next_stage is not None:
+            self.next_stage.put(item, block=self.block)
+
+    def run(self):
+        while True:
+            item = self.input.get()
+            if item is _END:
+                if self.next_stage is not None:
+                    self.next_stage.put(_END)
+                return
+
+            start = time.perf_counter()
+            try:
+                if inspect.isgeneratorfunction(self.fn):
+                    for output in self.fn(item):
+                        self._forward(output)
+                else:
+                    self._forward(self.fn(item))
+            except Exception as e:
+                # one bad item shouldn't take the stage down with it
+                with self._stats_lock:
+                    self.errors += 1
+                print(f"pipeline stage {self.name} failed: {e!r}")
+            elapsed = time.perf_counter() - start
+            if self.release is not None:
+                self.release(item)
+
+            with self._stats_lock:
+                self.processed += 1
+                self.busy_seconds += elapsed
+                self.last_seconds = elapsed
+                self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self.input.qsize(),
+                'max_queue_depth': self.max_queue_depth,
+                'processed': self.processed,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'avg_ms': self.busy_seconds / self.processed * 1000 if self.processed else 0.0,
+                'last_ms': self.last_seconds * 1000,
+                'max_ms': self.max_seconds * 1000,
+            }
+
+
+class Pipeline:
+    """
+    Chain of Stages, each running in its own thread and connected by bounded queues,
+    so a slow stage only backs up its own input and never blocks the stages before it
+    from working on what they already have.
+
+    With block=False (live input) an item that doesn't fit in a stage's queue is dropped
+    and counted, both at submit() and between stages; with block=True (files) every item
+    waits for room instead. feed(block=...) sets it, submit(block=...) overrides it
+    for one item.
+
+    pipeline = Pipeline()
+    pipeline.add_stage("detect", detect)
+    pipeline.add_stage("asr", transcribe)
+    pipeline.start()
+    pipeline.feed(processor)
+    """
+    def __init__(self, block=False):
+        self.block = block
+        self.stages = []
+        self.capture_thread = None
+        self.captured = 0
+        self._stop = threading.Event()
+
+    def add_stage(self, name, fn, queue_size=8):
+        stage = Stage(name, fn, queue_size, block=self.block)
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.thread = threading.Thread(target=stage.run, name=f"pipeline-{stage.name}", daemon=True)
+            stage.thread.start()
+
+    def submit(self, item, block=None):
+        return self.stages[0].put(item, block=self.block if block is None else block)
+
+    def set_block(self, block):
+        """
+        Sets whether submit() and the stages wait for room instead of dropping, see Pipeline
+        """
+        self.block = block
+        for stage in self.stages:
+            stage.block = block
+
+    def feed(self, processor, block=None, pool=None):
+        """
+        Starts a capture thread reading processor into the first stage until it returns None.
+        A live pipeline never waits: chunks that don't fit in the first stage's queue are
+        dropped and counted, and so are items between stages. block=True (for files, where
+        nothing should be dropped and waiting costs nothing) makes capture and every stage
+        wait instead, block=False makes them drop.
+
+        With a BufferPool, chunks are read with read_chunk_into into pooled buffers that go
+        back to the pool once the first stage is done with them, so the first stage must
+        not keep a chunk past its call. Size the pool to the first stage's queue to keep
+        capture from allocating.
+        """
+        if block is not None:
+            self.set_block(block)
+
+        def capture():
+            while not self._stop.is_set():
+                chunk = processor.read_chunk()
+                if chunk is None:
+                    break
+                self.captured += 1
+                self.submit(chunk)
+            self.stages[0].put(_END)
+
+        def pooled_capture():
+            while not self._stop.is_set():
+                buffer = pool.acquire()
+                read = processor.read_chunk_into(buffer)
+                if read is None:
+                    pool.release(buffer)
+                    break
+                self.captured += 1
+                self.submit(buffer[:read])
+            self.stages[0].put(_END)
+
+        if pool is not None:
+            self.stages[0].release = pool.release
+        target = capture if pool is None else pooled_capture
+        self.capture_thread = threading.Thread(target=target, name="pipeline-capture", daemon=True)
+        self.capture_thread.start()
+        return self.capture_thread
+
+    def join(self, timeout=None):
+        """
+        Waits for every stage to finish the input it was given
+        """
+        for stage in self.stages:
+            stage.thread.join(timeout)
+
+    def stop(self):
+        """
+        Stops capture; the stages finish what is already queued and exit
+        """
+        self._stop.set()
+        if self.capture_thread is None:
+            self.stages[0].put(_END)
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
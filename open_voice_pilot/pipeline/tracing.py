@@ -0,0 +1,162 @@
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# events of one utterance, in the order they happen
+EVENTS = (
+    "wake_detected",
+    "speech_start",
+    "speech_end",
+    "asr_request",
+    "asr_response",
+    "llm_request",
+    "llm_response",
+    "tts_first_byte",
+    "playback_start",
+)
+
+# stage name: (from event, to event)
+STAGES = {
+    "wake_to_speech": ("wake_detected", "speech_start"),
+    "speech": ("speech_start", "speech_end"),
+    "endpoint_to_asr": ("speech_end", "asr_request"),
+    "asr": ("asr_request", "asr_response"),
+    "asr_to_llm": ("asr_response", "llm_request"),
+    "llm": ("llm_request", "llm_response"),
+    "tts_first_byte": ("llm_response", "tts_first_byte"),
+    "playback_start": ("tts_first_byte", "playback_start"),
+    "speech_end_to_reply": ("speech_end", "playback_start"),
+}
+
+PERCENTILES = (50, 90, 99)
+
+
+class UtteranceTrace:
+    """
+    Timestamps (time.perf_counter) of the EVENTS of one utterance,
+    plus any other per-utterance numbers stored with record(), like prompt size
+    """
+    def __init__(self, utterance_id):
+        self.utterance_id = utterance_id
+        self.events = {}
+        self.values = {}
+
+    def mark(self, event, at=None):
+        if event not in EVENTS:
+            raise ValueError(f"unknown trace event {event}")
+        # the first occurrence counts, e.g. speech_start after a pause in speech
+        self.events.setdefault(event, time.perf_counter() if at is None else at)
+
+    def record(self, name, value):
+        self.values[name] = value
+
+    def stage_seconds(self):
+        return {
+            stage: self.events[end] - self.events[start]
+            for stage, (start, end) in STAGES.items()
+            if start in self.events and end in self.events
+        }
+
+
+class Tracer:
+    """
+    Collects UtteranceTraces into per-stage latency histograms.
+
+    Each stage keeps its last `history` latencies for percentiles, plus a running count and sum.
+    Export with write_json() or serve() (Prometheus text format at /metrics).
+    """
+    def __init__(self, history=1000):
+        self.history = history
+        self.latencies = {stage: deque(maxlen=history) for stage in STAGES}
+        self.counts = dict.fromkeys(STAGES, 0)
+        self.sums = dict.fromkeys(STAGES, 0.0)
+        self.recent = deque(maxlen=20)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.httpd = None
+
+    def start_utterance(self):
+        return UtteranceTrace(next(self._ids))
+
+    def finish(self, trace):
+        stages = trace.stage_seconds()
+        with self._lock:
+            for stage, seconds in stages.items():
+                self.latencies[stage].append(seconds)
+                self.counts[stage] += 1
+                self.sums[stage] += seconds
+            self.recent.append({"utterance": trace.utterance_id, **{stage: round(seconds * 1000, 1) for stage, seconds in stages.items()}, **trace.values})
+
+    def summary(self):
+        """
+        {stage: {count, mean_ms, p50_ms, p90_ms, p99_ms}} over the stages seen so far
+        """
+        with self._lock:
+            summary = {}
+            for stage, latencies in self.latencies.items():
+                if not latencies:
+                    continue
+                values = np.array(latencies) * 1000
+                summary[stage] = {"count": self.counts[stage], "mean_ms": self.sums[stage] / self.counts[stage] * 1000}
+                for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                    summary[stage][f"p{p}_ms"] = float(value)
+            return summary
+
+    def write_json(self, path):
+        with self._lock:
+            recent = list(self.recent)
+        with open(path, "w") as f:
+            json.dump({"stages": self.summary(), "recent": recent}, f, indent=2)
+
+    def prometheus(self):
+        lines = [
+            "# HELP voice_stage_latency_seconds Latency of each voice pipeline stage per utterance",
+            "# TYPE voice_stage_latency_seconds summary",
+        ]
+        with self._lock:
+            for stage, latencies in self.latencies.items():
+                if not latencies:
+                    continue
+                for p, value in zip(PERCENTILES, np.percentile(np.array(latencies), PERCENTILES)):
+                    lines.append(f'voice_stage_latency_seconds{{stage="{stage}",quantile="{p / 100}"}} {value:.6f}')
+                lines.append(f'voice_stage_latency_seconds_sum{{stage="{stage}"}} {self.sums[stage]:.6f}')
+                lines.append(f'voice_stage_latency_seconds_count{{stage="{stage}"}} {self.counts[stage]}')
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """
+        Serves prometheus() at http://host:port/metrics from a background thread,
+        only on this machine unless host says otherwise (e.g. "0.0.0.0" for a remote scraper)
+        """
+        # only imported when metrics are served, it isn't needed otherwise
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                data = tracer.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self.httpd
+
+    def close(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
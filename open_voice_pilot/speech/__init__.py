@@ -0,0 +1,2 @@
+from .incremental_asr import *
+from .tts_cache import *
@@ -0,0 +1,108 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+def _normalize(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def merge_transcripts(text, new_text, max_overlap_words=12):
+    """
+    Appends new_text to text, dropping the words at the start of new_text that repeat
+    the end of text (the overlap between two consecutive windows)
+    """
+    words = text.split()
+    new_words = new_text.split()
+    normalized = [_normalize(w) for w in words[-max_overlap_words:]]
+    new_normalized = [_normalize(w) for w in new_words[:max_overlap_words]]
+
+    for size in range(min(len(normalized), len(new_normalized)), 0, -1):
+        if normalized[-size:] == new_normalized[:size]:
+            new_words = new_words[size:]
+            break
+    return " ".join(words + new_words)
+
+
+class IncrementalTranscriber:
+    """
+    Transcribes one utterance while it is still being spoken.
+
+    feed() speech audio as it arrives; every window_seconds of audio (consecutive windows
+    overlapping by overlap_seconds) is sent to transcribe_fn(samples) -> str on the executor.
+    finish_input() sends the remaining tail, and result() merges the partial transcripts,
+    so at the end of speech only the tail window is still on the critical path.
+    """
+    def __init__(self, transcribe_fn, executor, sample_rate=16000, window_seconds=3.0, overlap_seconds=1.0):
+        self.transcribe_fn = transcribe_fn
+        self.executor = executor
+        self.sample_rate = sample_rate
+        self.window = int(window_seconds * sample_rate)
+        self.hop = self.window - int(overlap_seconds * sample_rate)
+        self.audio = []
+        self.length = 0
+        # start sample of the next window to submit
+        self.next_start = 0
+        self.futures = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def feed(self, samples):
+        with self._lock:
+            if self.finished:
+                raise ValueError("feed after finish_input")
+            self.audio.append(np.array(samples, dtype=np.int16))
+            self.length += len(samples)
+            while self.next_start + self.window <= self.length:
+                self._submit(self.next_start, self.next_start + self.window)
+                self.next_start += self.hop
+
+    def _submit(self, start, end):
+        if len(self.audio) > 1:
+            self.audio = [np.concatenate(self.audio)]
+        window = self.audio[0][start:end]
+        self.futures.append(self.executor.submit(self.transcribe_fn, window))
+
+    def finish_input(self):
+        """
+        Marks the end of speech and submits whatever hasn't been covered by a window yet
+        """
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+            covered = self.next_start - self.hop + self.window if self.futures else 0
+            if self.length > covered:
+                self._submit(self.next_start, self.length)
+
+    def samples(self):
+        """
+        All the audio fed so far
+        """
+        with self._lock:
+            return np.concatenate(self.audio) if self.audio else np.zeros(0, np.int16)
+
+    def result(self, timeout=None):
+        """
+        Waits for every window and returns the merged transcript
+        """
+        self.finish_input()
+        text = ""
+        for future in self.futures:
+            text = merge_transcripts(text, future.result(timeout=timeout).strip())
+        return text
+
+    def cancel(self):
+        with self._lock:
+            self.finished = True
+            for future in self.futures:
+                future.cancel()
+
+
+def transcription_executor(max_workers=4):
+    """
+    Shared thread pool for IncrementalTranscriber windows
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asr")
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from ..audio_processing import DiskCache
+
+DEFAULT_TTS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "open_voice_pilot", "tts")
+
+
+def normalize_text(text):
+    """
+    Text as the cache compares it: unicode normalized, case folded, whitespace collapsed.
+    Punctuation stays, it changes how the sentence is spoken.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+class TTSCache(DiskCache):
+    """
+    On-disk cache of synthesized speech, keyed by normalized text, voice, model and sample rate.
+
+    stream() is a drop-in for the byte chunks of a TTS response: a hit is served from the
+    memory-mapped pcm without touching the network, a miss passes synthesize()'s chunks
+    through while writing them to the cache, and keeps them only if the response was read
+    to the end. Eviction is least recently used past max_bytes, like any DiskCache.
+
+    cache = TTSCache()
+    player.play(cache.stream(text, "fable", "tts-1", 24000, lambda: response_chunks(text)))
+    """
+    def __init__(self, cache_dir=DEFAULT_TTS_CACHE_DIR, max_bytes=256 * 1024 ** 2, chunk_bytes=4800):
+        super().__init__(cache_dir, max_bytes)
+        self.chunk_bytes = chunk_bytes
+        self.hits = 0
+        self.misses = 0
+        # time to the first byte of the misses, what a hit saves
+        self.miss_first_byte = 0.0
+        self.first_byte_samples = 0
+        self._lock = threading.Lock()
+
+    def key(self, text, voice, model, sample_rate):
+        content = "\0".join((model, voice, str(sample_rate), normalize_text(text)))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, text, voice, model, sample_rate):
+        """
+        Returns the cached int16 samples of the text, or None
+        """
+        return self.open(self.key(text, voice, model, sample_rate))
+
+    def stream(self, text, voice, model, sample_rate, synthesize):
+        """
+        Byte chunks of the speech for text, from the cache or from synthesize() -> iterable of pcm bytes
+        """
+        samples = self.get(text, voice, model, sample_rate)
+        if samples is not None:
+            with self._lock:
+                self.hits += 1
+            data = memoryview(samples).cast('B') if len(samples) else b""
+            # in blocks, so a player can still be stopped between them
+            for start in range(0, len(data), self.chunk_bytes):
+                yield data[start:start + self.chunk_bytes]
+            return
+
+        with self._lock:
+            self.misses += 1
+        yield from self._synthesize(self.key(text, voice, model, sample_rate), synthesize)
+
+    def _synthesize(self, key, synthesize):
+        f, temp_path = self._temp_file(key)
+        start = time.perf_counter()
+        first_byte = None
+        written = 0
+        complete = False
+        try:
+            with f:
+                for chunk in synthesize():
+                    if first_byte is None:
+                        first_byte = time.perf_counter() - start
+                    f.write(chunk)
+                    written += len(chunk)
+                    yield chunk
+            complete = True
+        finally:
+            # an interrupted or failed response is never kept, the next request synthesizes it again
+            if complete and written % 2 == 0:
+                self._commit(temp_path, key)
+            elif os.path.exists(temp_path):
+                os.remove(temp_path)
+            if first_byte is not None:
+                with self._lock:
+                    self.miss_first_byte += first_byte
+                    self.first_byte_samples += 1
+
+    def prerender(self, phrases, voice, model, sample_rate, synthesize):
+        """
+        Synthesizes every phrase that isn't cached yet, with synthesize(text) -> iterable of pcm bytes.
+        Returns the number synthesized.
+        """
+        rendered = 0
+        for phrase in phrases:
+            key = self.key(phrase, voice, model, sample_rate)
+            if os.path.exists(self.path_for(key)):
+                continue
+            for _ in self._synthesize(key, lambda: synthesize(phrase)):
+                pass
+            rendered += 1
+        return rendered
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            first_byte = self.miss_first_byte / self.first_byte_samples if self.first_byte_samples else 0.0
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'miss_first_byte_ms': first_byte * 1000,
+                'saved_ms': self.hits * first_byte * 1000,
+            }
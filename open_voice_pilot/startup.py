@@ -0,0 +1,68 @@
+"""
+Startup timing and background warm-up.
+
+Heavy dependencies and models are loaded on a Warmup thread while capture is already running,
+and every import/initialization step is timed by a StartupProfiler for the startup report.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Records how long each named startup step took, and when it started
+    """
+    def __init__(self, start_time=None):
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def record(self, name, start, end):
+        with self._lock:
+            self.timings.append((name, start - self.start_time, end - start, threading.current_thread().name))
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter())
+
+    def report(self):
+        with self._lock:
+            timings = sorted(self.timings, key=lambda timing: timing[1])
+        lines = [f"{'component':<32} {'took':>9} {'started at':>11}  thread"]
+        for name, started, took, thread in timings:
+            lines.append(f"{name:<32} {took * 1000:>6.0f} ms {started * 1000:>8.0f} ms  {thread}")
+        lines.append(f"{'ready after':<32} {max((s + t for _, s, t, _ in timings), default=0) * 1000:>6.0f} ms")
+        return "\n".join(lines)
+
+
+class Warmup:
+    """
+    Runs named loaders in the background; result(name) waits for one to finish
+    """
+    def __init__(self, profiler=None, max_workers=2):
+        self.profiler = profiler or StartupProfiler()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warmup")
+        self.futures = {}
+
+    def submit(self, name, fn, *args, **kwargs):
+        def load():
+            with self.profiler.measure(name):
+                return fn(*args, **kwargs)
+        self.futures[name] = self.executor.submit(load)
+        return self.futures[name]
+
+    def result(self, name):
+        return self.futures[name].result()
+
+    def wait(self):
+        for future in list(self.futures.values()):
+            future.exception()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
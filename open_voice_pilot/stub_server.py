@@ -0,0 +1,205 @@
+"""
+Local stand-in for the OpenAI endpoints Jarvis uses, with configurable latency,
+so the voice pipeline can be measured without network noise or API costs.
+
+with StubOpenAIServer(tts_first_byte_delay=0.3) as server:
+    client = OpenAI(base_url=server.base_url, api_key="stub")
+"""
+import json
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .assistant.memory import estimate_tokens
+from .audio_processing.wav import decode_wav
+
+# vocabulary of the stub ASR: word i is a tone at word_frequency(i) lasting WORD_SECONDS
+WORDS = (
+    "hello jarvis what is the weather like today in london please tell me a joke about "
+    "robots and set timer for ten minutes play some music turn off lights good night"
+).split()
+WORD_SECONDS = 0.5
+
+
+def word_frequency(index):
+    return 300.0 + 50.0 * index
+
+
+def synthetic_speech(words, sample_rate=16000):
+    """
+    int16 audio the stub ASR transcribes back to `words` (which must be in WORDS)
+    """
+    t = np.arange(int(WORD_SECONDS * sample_rate)) / sample_rate
+    tones = [np.sin(2 * np.pi * word_frequency(WORDS.index(word)) * t) for word in words]
+    return (0.3 * 32767 * np.concatenate(tones)).astype(np.int16)
+
+
+def recognize_tones(samples, sample_rate):
+    """
+    The stub ASR: one word per WORD_SECONDS segment, picked by the segment's dominant frequency
+    """
+    segment = int(WORD_SECONDS * sample_rate)
+    words = []
+    for start in range(0, len(samples) - segment // 2 + 1, segment):
+        spectrum = np.abs(np.fft.rfft(samples[start:start + segment].astype(np.float32), n=segment))
+        frequency = np.argmax(spectrum) * sample_rate / segment
+        index = int(round((frequency - word_frequency(0)) / 50.0))
+        if 0 <= index < len(WORDS) and spectrum.max() > 0:
+            words.append(WORDS[index])
+    return " ".join(words)
+
+
+class StubOpenAIServer:
+    """
+    /v1/audio/speech streams 16-bit pcm (a tone, tts_seconds_per_char long per input character)
+    at tts_sample_rate, regardless of the requested response_format. The first chunk comes
+    after tts_first_byte_delay, then one chunk of tts_chunk_seconds of audio every
+    tts_chunk_seconds / tts_speed seconds.
+
+    /v1/audio/transcriptions takes a 16-bit wav upload and answers after
+    asr_latency + asr_seconds_per_audio_second * the audio's duration. Audio made with
+    synthetic_speech is transcribed back to its words.
+
+    /v1/chat/completions answers after chat_latency + chat_seconds_per_token * the prompt's
+    estimated tokens, with chat_reply_words words of the last message (a summary request,
+    one whose system message asks to summarize, gets chat_summary_words).
+    Prompt sizes are kept in chat_prompt_tokens.
+    """
+    def __init__(self, host="127.0.0.1", port=0,
+                 tts_first_byte_delay=0.3, tts_chunk_seconds=0.1, tts_speed=4.0, tts_seconds_per_char=0.06, tts_sample_rate=24000,
+                 asr_latency=0.3, asr_seconds_per_audio_second=0.1,
+                 chat_latency=0.2, chat_seconds_per_token=0.0002, chat_reply_words=30, chat_summary_words=100):
+        self.asr_latency = asr_latency
+        self.asr_seconds_per_audio_second = asr_seconds_per_audio_second
+        self.tts_first_byte_delay = tts_first_byte_delay
+        self.tts_chunk_seconds = tts_chunk_seconds
+        self.tts_speed = tts_speed
+        self.tts_seconds_per_char = tts_seconds_per_char
+        self.tts_sample_rate = tts_sample_rate
+        self.chat_latency = chat_latency
+        self.chat_seconds_per_token = chat_seconds_per_token
+        self.chat_reply_words = chat_reply_words
+        self.chat_summary_words = chat_summary_words
+
+        self.chat_prompt_tokens = []
+
+        self.requests = []
+        self.routes = {
+            "/v1/audio/speech": self.speech,
+            "/v1/audio/transcriptions": self.transcriptions,
+            "/v1/chat/completions": self.chat_completions,
+        }
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                route = server.routes.get(self.path.split("?")[0])
+                if route is None:
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                server.requests.append((self.path, len(body)))
+                route(self, body)
+
+            def content_type(self):
+                return self.headers.get("Content-Type", "")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @staticmethod
+    def send_json(handler, payload):
+        data = json.dumps(payload).encode()
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    @staticmethod
+    def send_chunk(handler, data):
+        handler.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        handler.wfile.flush()
+
+    def speech(self, handler, body):
+        text = json.loads(body).get("input", "")
+        duration = max(len(text) * self.tts_seconds_per_char, self.tts_chunk_seconds)
+        t = np.arange(int(duration * self.tts_sample_rate)) / self.tts_sample_rate
+        pcm = (0.3 * 32767 * np.sin(2 * np.pi * 220 * t)).astype("<i2").tobytes()
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "audio/pcm")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+
+        time.sleep(self.tts_first_byte_delay)
+        chunk_bytes = int(self.tts_chunk_seconds * self.tts_sample_rate) * 2
+        for start in range(0, len(pcm), chunk_bytes):
+            if start:
+                time.sleep(self.tts_chunk_seconds / self.tts_speed)
+            self.send_chunk(handler, pcm[start:start + chunk_bytes])
+        handler.wfile.write(b"0\r\n\r\n")
+        handler.wfile.flush()
+
+    def transcriptions(self, handler, body):
+        message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {handler.content_type()}\r\n\r\n".encode() + body)
+        upload = next(part for part in message.iter_parts() if part.get_param("name", header="content-disposition") == "file")
+        samples, sample_rate, channels = decode_wav(upload.get_payload(decode=True))
+
+        duration = len(samples) / channels / sample_rate
+        time.sleep(self.asr_latency + self.asr_seconds_per_audio_second * duration)
+        self.send_json(handler, {"text": recognize_tones(samples[::channels], sample_rate)})
+
+    def chat_completions(self, handler, body):
+        request = json.loads(body)
+        messages = request.get("messages", [])
+        tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+        self.chat_prompt_tokens.append(tokens)
+        summarize = any(message["role"] == "system" and "Summarize" in message.get("content", "") for message in messages)
+
+        # the last message repeated to length, a summary request's last message is the transcript
+        words = (messages[-1].get("content") or "").split() if messages else []
+        count = self.chat_summary_words if summarize else self.chat_reply_words
+        reply = " ".join((words * count)[:count]) or "ok"
+        time.sleep(self.chat_latency + self.chat_seconds_per_token * tokens)
+        self.send_json(handler, {
+            "id": f"chatcmpl-stub{len(self.chat_prompt_tokens)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens, "completion_tokens": estimate_tokens(reply), "total_tokens": tokens + estimate_tokens(reply)},
+        })
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
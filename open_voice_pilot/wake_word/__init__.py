@@ -0,0 +1,3 @@
+from .scan import scan_corpus, sweep_thresholds, count_triggers, list_audio_files
+from .batched import BatchedWakeWord, WakeWordStream, FRAME_SAMPLES
+from .streaming import StreamingWakeWord, WakeDetection, debounce
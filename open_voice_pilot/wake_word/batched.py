@@ -0,0 +1,228 @@
+"""
+Wake word detection for many audio streams at once.
+
+openwakeword runs three models on every 80 ms frame: a melspectrogram, a speech
+embedding over the last 76 mel frames, and a small classifier per wake word over the
+last 16 embeddings. BatchedWakeWord keeps those buffers for every stream itself and
+runs each model once per frame for all streams that have a frame ready, instead of
+once per stream.
+"""
+import threading
+
+import numpy as np
+
+FRAME_SAMPLES = 1280  # 80 ms at 16 kHz
+CONTEXT_SAMPLES = 480  # the melspectrogram window reaches this far back into the previous frame
+MEL_WINDOW = 76
+MEL_BINS = 32
+
+# the openwakeword attributes from_openwakeword() relies on, and the versions known to have them
+OPENWAKEWORD_VERSIONS = ">=0.6.0,<0.7.0"
+OPENWAKEWORD_MODEL_ATTRIBUTES = ("preprocessor", "models", "model_inputs")
+OPENWAKEWORD_FEATURE_ATTRIBUTES = ("melspec_model", "melspec_model_predict", "embedding_model_predict", "feature_buffer")
+
+
+def _tflite_batch_predict(interpreter):
+    """
+    Batched prediction with a tflite interpreter, resizing its input to the batch size when it changes
+    """
+    input_index = interpreter.get_input_details()[0]['index']
+    output_index = interpreter.get_output_details()[0]['index']
+
+    def predict(x):
+        if tuple(interpreter.get_input_details()[0]['shape']) != x.shape:
+            interpreter.resize_tensor_input(input_index, x.shape, strict=False)
+            interpreter.allocate_tensors()
+        interpreter.set_tensor(input_index, x)
+        interpreter.invoke()
+        return interpreter.get_tensor(output_index)
+    return predict
+
+
+def _onnx_batch_predict(session):
+    input_name = session.get_inputs()[0].name
+    return lambda x: session.run(None, {input_name: x})[0]
+
+
+class WakeWordStream:
+    """
+    Per-stream state of a BatchedWakeWord. Also usable as a drop-in for an openwakeword
+    Model in code that calls predict(chunk)/reset() on its own stream, see predict().
+    """
+    def __init__(self, detector, name):
+        self.detector = detector
+        self.name = name
+        self.position = 0
+        self._pending = np.zeros(0, np.int16)
+        self._scores = []
+        self._consumed = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the audio seen so far, like Model.reset(). Scores already computed and not
+        read yet are dropped, audio still short of a frame stays so positions keep counting
+        the samples fed.
+        """
+        with self.detector._lock:
+            self._context = np.zeros(CONTEXT_SAMPLES, np.int16)
+            self._mel = np.ones((MEL_WINDOW, MEL_BINS), np.float32)
+            self._features = self.detector.initial_features.copy()
+            self._scores = []
+            self._consumed = self.position + len(self._pending)
+
+    def _frame_ready(self):
+        return len(self._pending) >= FRAME_SAMPLES
+
+    def _take_frame(self):
+        frame = np.concatenate((self._context, self._pending[:FRAME_SAMPLES]))
+        self._pending = self._pending[FRAME_SAMPLES:]
+        self._context = frame[-CONTEXT_SAMPLES:]
+        return frame
+
+    def predict(self, chunk, end_index=None):
+        """
+        Scores of the audio in chunk, the maximum over the frames that end in it, once
+        BatchedWakeWord.feed has already scored it. Lets a per-stream consumer (e.g.
+        Jarvis.process_chunk) read the batched scores at its own chunk size.
+
+        end_index is the absolute sample index (in the audio fed to this stream) right after
+        chunk; without it chunks are taken to follow each other from the last reset().
+        Scores of frames before the chunk, e.g. of audio the consumer skipped, are dropped.
+        """
+        with self.detector._lock:
+            end = self._consumed + len(chunk) if end_index is None else end_index
+            self._consumed = end
+            scores = [s for e, s in self._scores if end - len(chunk) < e <= end]
+            self._scores = [(e, s) for e, s in self._scores if e > end]
+        if not scores:
+            return {name: 0.0 for name in self.detector.wake_words}
+        return {name: max(s[name] for s in scores) for name in self.detector.wake_words}
+
+
+class BatchedWakeWord:
+    """
+    Wake word scores for any number of 16 kHz int16 streams with one call of each model
+    per 80 ms frame, whatever the number of streams.
+
+    melspectrogram(x) maps (batch, 1760) float32 audio to (batch, frames, 32) mel frames,
+    embed(x) maps (batch, 76, 32, 1) windows to (batch, 96) embeddings, and
+    classify(x) maps (batch, n, 96) features to {wake word: (batch,) scores}.
+    from_openwakeword() builds them from openwakeword's models; its tflite melspectrogram
+    only takes one stream at a time, so there that model runs once per stream and the
+    embedding and classifier models run batched.
+
+    detector = BatchedWakeWord.from_openwakeword()
+    streams = [detector.add_stream(name) for name in ("kitchen", "office")]
+    scores = detector.feed({"kitchen": chunk1, "office": chunk2})
+    """
+    def __init__(self, melspectrogram, embed, classify, wake_words, initial_features):
+        self.melspectrogram = melspectrogram
+        self.embed = embed
+        self.classify = classify
+        self.wake_words = list(wake_words)
+        self.initial_features = np.asarray(initial_features, np.float32)
+        self.streams = {}
+        self.batches = 0
+        self.frames = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_openwakeword(cls, wake_words=("hey_jarvis",), inference_framework="tflite", **kwargs):
+        """
+        wake_words are openwakeword model names or paths, kwargs are passed on to its Model
+        (e.g. melspec_model_path)
+        """
+        from openwakeword.model import Model
+        model = Model(wakeword_models=list(wake_words), inference_framework=inference_framework, **kwargs)
+        features = getattr(model, "preprocessor", None)
+        # openwakeword internals, not part of its API: pyproject.toml pins the versions that have them
+        missing = [name for obj, names in ((model, OPENWAKEWORD_MODEL_ATTRIBUTES), (features, OPENWAKEWORD_FEATURE_ATTRIBUTES))
+                   for name in names if not hasattr(obj, name)]
+        if missing:
+            import openwakeword
+            raise RuntimeError(f"openwakeword {getattr(openwakeword, '__version__', '(unknown version)')} doesn't have "
+                               f"{', '.join(missing)}, which BatchedWakeWord uses; install openwakeword {OPENWAKEWORD_VERSIONS}")
+
+        if inference_framework == "tflite":
+            # openwakeword's tflite melspec_model_predict resizes the input to [1, samples], and
+            # reallocates on every call for frames of other than 1280 samples; this predict on its
+            # interpreter only reallocates when the shape changes, i.e. once
+            melspec_predict = _tflite_batch_predict(features.melspec_model)
+
+            def melspectrogram(x):
+                mel = np.stack([np.asarray(melspec_predict(row[None]), np.float32).reshape(-1, MEL_BINS) for row in x])
+                # same transform as openwakeword's AudioFeatures
+                return mel / 10 + 2
+        else:
+            def melspectrogram(x):
+                mel = np.asarray(features.melspec_model_predict(x), np.float32)
+                return mel.reshape(len(x), -1, MEL_BINS) / 10 + 2
+
+        def embed(x):
+            return np.asarray(features.embedding_model_predict(x), np.float32).reshape(len(x), -1)
+
+        if inference_framework == "tflite":
+            classifiers = {name: _tflite_batch_predict(model.models[name]) for name in model.models}
+        else:
+            classifiers = {name: _onnx_batch_predict(model.models[name]) for name in model.models}
+        inputs = dict(model.model_inputs)
+
+        def classify(x):
+            return {name: np.asarray(predict(np.ascontiguousarray(x[:, -inputs[name]:])), np.float32).reshape(len(x), -1)[:, 0]
+                    for name, predict in classifiers.items()}
+
+        initial = features.feature_buffer[-max(inputs.values()):]
+        return cls(melspectrogram, embed, classify, list(model.models), initial)
+
+    def add_stream(self, name):
+        stream = WakeWordStream(self, name)
+        self.streams[name] = stream
+        return stream
+
+    def remove_stream(self, name):
+        del self.streams[name]
+
+    def feed(self, chunks):
+        """
+        Adds {stream name: int16 chunk} and scores every 80 ms frame completed by them.
+        Returns {stream name: [(end sample index, {wake word: score}), ...]} for the frames
+        scored, streams without a complete frame are left out.
+        """
+        results = {}
+        # streams may be reset or read from their own threads meanwhile
+        with self._lock:
+            for name, chunk in chunks.items():
+                stream = self.streams[name]
+                stream._pending = np.concatenate((stream._pending, chunk))
+
+            while True:
+                ready = [stream for stream in self.streams.values() if stream._frame_ready()]
+                if not ready:
+                    return results
+                for stream, scores in zip(ready, self._score(ready)):
+                    stream.position += FRAME_SAMPLES
+                    stream._scores.append((stream.position, scores))
+                    results.setdefault(stream.name, []).append((stream.position, scores))
+
+    def _score(self, streams):
+        audio = np.stack([stream._take_frame() for stream in streams]).astype(np.float32)
+        mel = self.melspectrogram(audio)
+        for stream, frames in zip(streams, mel):
+            stream._mel = np.concatenate((stream._mel, frames))[-MEL_WINDOW:]
+        embeddings = self.embed(np.stack([stream._mel for stream in streams])[..., None])
+        for stream, embedding in zip(streams, embeddings):
+            stream._features = np.concatenate((stream._features, embedding[None]))[1:]
+        scores = self.classify(np.stack([stream._features for stream in streams]))
+
+        self.batches += 1
+        self.frames += len(streams)
+        return [{name: float(scores[name][i]) for name in self.wake_words} for i in range(len(streams))]
+
+    def stats(self):
+        return {
+            'streams': len(self.streams),
+            'batches': self.batches,
+            'frames': self.frames,
+            'avg_batch_size': self.frames / self.batches if self.batches else 0.0,
+        }
@@ -0,0 +1,171 @@
+"""
+Scores every audio file in a corpus with the wake word model, in parallel,
+and sweeps detection thresholds over the scores.
+
+python -m open_voice_pilot.wake_word.scan data/saved_audio_tests/ --negative path/to/negatives --output scan_results
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ..audio_processing import FileAudioProcessor
+from .batched import FRAME_SAMPLES
+from .streaming import debounce
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".flac", ".ogg", ".m4a")
+
+# one model per worker process, loaded by _init_worker
+_model = None
+_wake_word = None
+
+
+def _init_worker(wake_word, inference_framework):
+    global _model, _wake_word
+    from openwakeword.model import Model
+    _model = Model(inference_framework=inference_framework)
+    _wake_word = wake_word
+
+
+def score_file(path, sample_rate=16000, chunk_size=FRAME_SAMPLES):
+    """
+    Wake word score of every chunk_size chunk of a file, run in a worker process
+    """
+    _model.reset()
+    processor = FileAudioProcessor(path, chunk_size=chunk_size, sample_rate=sample_rate, channels=1)
+    scores = []
+    try:
+        while True:
+            chunk = processor.read_chunk()
+            if chunk is None or len(chunk) < chunk_size:
+                break
+            scores.append(_model.predict(chunk)[_wake_word])
+    finally:
+        processor.close()
+    return path, np.array(scores, dtype=np.float32)
+
+
+def list_audio_files(directory):
+    return sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(directory)
+        for name in names
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    )
+
+
+def scan_corpus(paths, wake_word="hey_jarvis", workers=None, inference_framework="tflite", sample_rate=16000, chunk_size=FRAME_SAMPLES):
+    """
+    Returns {path: per-chunk scores} for every file, scored across a process pool
+    """
+    workers = workers or os.cpu_count()
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(wake_word, inference_framework)) as pool:
+        futures = [pool.submit(score_file, path, sample_rate, chunk_size) for path in paths]
+        for future in futures:
+            path, scores = future.result()
+            results[path] = scores
+    return results
+
+
+def count_triggers(scores, threshold, window_frames=1, min_frames=1):
+    """
+    Number of detections: times the score rises above threshold, or with window_frames > 1, times
+    min_frames of the last window_frames scores start being above it, as StreamingWakeWord decides
+    """
+    above = debounce(scores, threshold, window_frames, min_frames)
+    return int(np.count_nonzero(above[1:] & ~above[:-1]) + (above[0] if len(above) else 0))
+
+
+def sweep_thresholds(results, positives, negatives, thresholds, chunk_seconds, window_frames=1, min_frames=1):
+    """
+    One row per threshold: detection rate over positive files, false accepts over negative files
+    """
+    negative_hours = sum(len(results[path]) for path in negatives) * chunk_seconds / 3600
+    rows = []
+    for threshold in thresholds:
+        detected = sum(1 for path in positives if count_triggers(results[path], threshold, window_frames, min_frames) > 0)
+        false_accepts = sum(count_triggers(results[path], threshold, window_frames, min_frames) for path in negatives)
+        rows.append({
+            "threshold": round(float(threshold), 4),
+            "detected": detected,
+            "positives": len(positives),
+            "detection_rate": detected / len(positives) if positives else 0.0,
+            "false_accepts": false_accepts,
+            "false_accepts_per_hour": false_accepts / negative_hours if negative_hours else 0.0,
+        })
+    return rows
+
+
+def write_traces(results, output_dir, chunk_seconds):
+    """
+    One csv per file, at its path relative to the directory all the scanned files are in,
+    so files of the same name in different directories keep their own trace
+    """
+    traces_dir = os.path.join(output_dir, "traces")
+    if not results:
+        return
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in results])
+    for path, scores in results.items():
+        name = os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0]
+        trace_path = os.path.join(traces_dir, f"{name}.csv")
+        os.makedirs(os.path.dirname(trace_path), exist_ok=True)
+        with open(trace_path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["chunk", "time_s", "score"])
+            for i, score in enumerate(scores):
+                writer.writerow([i, f"{i * chunk_seconds:.3f}", f"{score:.6f}"])
+
+
+def write_table(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scan audio corpora with the wake word model and sweep thresholds.")
+    parser.add_argument("positive", help="directory of files that contain the wake word")
+    parser.add_argument("--negative", help="directory of files that don't contain the wake word")
+    parser.add_argument("--output", default="scan_results", help="directory for score traces and threshold tables")
+    parser.add_argument("--wake-word", default="hey_jarvis")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=FRAME_SAMPLES, help="samples per prediction, at 16 kHz")
+    # the same debounce StreamingWakeWord and Jarvis default to
+    parser.add_argument("--window-frames", type=int, default=3, help="debounce window, in predictions")
+    parser.add_argument("--min-frames", type=int, default=2, help="predictions in the window that must be above the threshold")
+    parser.add_argument("--thresholds", default="0.05:0.95:0.05", help="start:stop:step of the threshold sweep")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    positives = list_audio_files(args.positive)
+    negatives = list_audio_files(args.negative) if args.negative else []
+    start, stop, step = (float(x) for x in args.thresholds.split(":"))
+    thresholds = np.arange(start, stop + step / 2, step)
+    chunk_seconds = args.chunk_size / 16000
+
+    start_time = time.time()
+    results = scan_corpus(positives + negatives, args.wake_word, args.workers, chunk_size=args.chunk_size)
+    elapsed_time = time.time() - start_time
+    audio_seconds = sum(len(scores) for scores in results.values()) * chunk_seconds
+    print(f"scored {len(results)} files, {audio_seconds:.1f} s of audio in {elapsed_time:.2f} s ({audio_seconds / max(elapsed_time, 1e-9):.1f}x real time)")
+
+    os.makedirs(args.output, exist_ok=True)
+    write_traces(results, args.output, chunk_seconds)
+    rows = sweep_thresholds(results, positives, negatives, thresholds, chunk_seconds, args.window_frames, args.min_frames)
+    write_table(rows, os.path.join(args.output, "thresholds.csv"))
+
+    print(f"{'threshold':>9} {'detected':>9} {'rate':>6} {'false acc':>9} {'FA/hour':>8}")
+    for row in rows:
+        print(f"{row['threshold']:>9.2f} {row['detected']:>4}/{row['positives']:<4} {row['detection_rate']:>6.2f} {row['false_accepts']:>9} {row['false_accepts_per_hour']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Wake word decisions on a stream scored every hop samples, with a k-of-n debounce
+so a single high frame doesn't count as a detection.
+"""
+import numpy as np
+
+from ..audio_processing import RingBuffer
+from .batched import FRAME_SAMPLES, WakeWordStream
+
+
+def debounce(scores, threshold, window_frames=3, min_frames=2):
+    """
+    Boolean per frame: at least min_frames of the last window_frames scores are above threshold
+    """
+    above = (np.asarray(scores) > threshold).astype(np.int32)
+    if len(above) == 0:
+        # np.convolve rejects empty input, e.g. the scores of a file shorter than a frame
+        return above.astype(bool)
+    counts = np.convolve(above, np.ones(window_frames, np.int32))[:len(above)]
+    return counts >= min_frames
+
+
+class WakeDetection:
+    """
+    One detection of a StreamingWakeWord, at absolute sample indexes of the scored stream.
+
+    index: end of the frame that completed the debounce, when the detection was made
+    peak_index: end of the frame with the highest score in the debounce window, where the
+    wake word has just been said and the request starts
+    """
+    def __init__(self, wake_word, index, peak_index, score):
+        self.wake_word = wake_word
+        self.index = index
+        self.peak_index = peak_index
+        self.score = score
+
+    def __repr__(self):
+        return f"WakeDetection({self.wake_word!r}, index={self.index}, peak_index={self.peak_index}, score={self.score:.2f})"
+
+
+class StreamingWakeWord:
+    """
+    Scores a 16 kHz stream hop samples at a time with an openwakeword Model (or a
+    WakeWordStream of a BatchedWakeWord) and decides on detections.
+
+    The model keeps the overlapping context of its windows itself, hop only sets how
+    often it is asked, so a multiple of its 80 ms frame (FRAME_SAMPLES) wastes nothing.
+    Scores are kept in a ring buffer, and a detection is made when min_frames of the last
+    window_frames scores are above threshold, once per run of such frames.
+
+    detector = StreamingWakeWord(Model())
+    for frame in frames:  # hop samples each
+        detection = detector.score(frame)
+    """
+    def __init__(self, model, wake_word="hey_jarvis", threshold=0.5, hop=FRAME_SAMPLES, window_frames=3, min_frames=2, history_frames=64):
+        self.model = model
+        self.wake_word = wake_word
+        self.threshold = threshold
+        self.hop = hop
+        self.window_frames = window_frames
+        self.min_frames = min_frames
+        self.scores = RingBuffer(max(history_frames, window_frames), np.float32)
+        # absolute sample index right after the last scored frame
+        self.position = 0
+        self.detections = 0
+        self._active = False
+
+    def score(self, frame, end_index=None):
+        """
+        Scores the next hop samples, ending at absolute sample end_index (default: right after
+        the previous frame). Returns a WakeDetection or None.
+        """
+        self.position = self.position + len(frame) if end_index is None else end_index
+        if isinstance(self.model, WakeWordStream):
+            # batched scores are looked up by where the frame ends, the consumer may have skipped audio
+            prediction = self.model.predict(frame, self.position)
+        else:
+            prediction = self.model.predict(frame)
+        self.scores.append([prediction[self.wake_word]])
+
+        recent = self.scores.latest(self.window_frames)
+        active = np.count_nonzero(recent > self.threshold) >= self.min_frames
+        detected = active and not self._active
+        self._active = active
+        if not detected:
+            return None
+
+        self.detections += 1
+        peak = int(np.argmax(recent))
+        return WakeDetection(self.wake_word, self.position, self.position - (len(recent) - 1 - peak) * self.hop, float(recent[peak]))
+
+    @property
+    def last_score(self):
+        return float(self.scores[-1]) if len(self.scores) else 0.0
+
+    def reset(self, position=None):
+        """
+        Forgets the audio and scores so far, e.g. after skipping audio; scoring resumes at `position`
+        """
+        self.model.reset()
+        self.scores.clear()
+        self._active = False
+        if position is not None:
+            self.position = position
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from open_voice_pilot.audio_processing import AudioProcessor, FakeAudioInterface, MicrophoneAudioProcessor, looped
+
+
+class GatedProcessor(AudioProcessor):
+    """
+    Returns chunks 0, 1, 2, ... one per release of its gate, then None after `count`
+    """
+    def __init__(self, count):
+        self.count = count
+        self.index = 0
+        self.gate = threading.Semaphore(0)
+        self.closed = False
+
+    def read_chunk(self):
+        if self.index >= self.count:
+            return None
+        self.gate.acquire()
+        self.index += 1
+        return np.array([self.index - 1], np.int16)
+
+    def close(self):
+        self.closed = True
+
+
+def test_async_for_reads_to_the_end_and_closes():
+    async def consume():
+        samples = np.arange(1600, dtype=np.int16)
+        interface = FakeAudioInterface(looped(samples), realtime=False, max_frames=1600)
+        async with MicrophoneAudioProcessor(chunk_size=160, rate=16000, callback=True, audio_interface=interface) as microphone:
+            chunks = [chunk async for chunk in microphone]
+        return np.concatenate(chunks), samples
+    received, samples = asyncio.run(consume())
+    np.testing.assert_array_equal(received, samples)
+
+
+def test_the_event_loop_keeps_running_while_a_read_waits():
+    async def main():
+        processor = GatedProcessor(1)
+        read = asyncio.ensure_future(processor.aread_chunk())
+        ticks = 0
+        while ticks < 5:
+            await asyncio.sleep(0.001)
+            ticks += 1
+        assert not read.done()
+        processor.gate.release()
+        return await read
+    assert asyncio.run(main())[0] == 0
+
+
+def test_a_cancelled_read_hands_its_chunk_to_the_next_call():
+    async def main():
+        processor = GatedProcessor(3)
+        for _ in range(3):
+            processor.gate.release()
+        first = asyncio.ensure_future(processor.aread_chunk())
+        await asyncio.sleep(0)
+        first.cancel()
+        chunks = [chunk[0] async for chunk in processor]
+        await processor.aclose()
+        return chunks, processor.closed
+    chunks, closed = asyncio.run(main())
+    assert chunks == [0, 1, 2]
+    assert closed
@@ -0,0 +1,36 @@
+from benchmarks.run import compare, regressed
+
+
+def baseline(**metrics):
+    return {"results": {"bench": metrics}}
+
+
+def test_relative_change_in_the_metric_s_direction():
+    assert regressed("read_us_per_chunk", 10.0, 12.5, 0.2)
+    assert not regressed("read_us_per_chunk", 10.0, 11.5, 0.2)
+    assert regressed("push_x_realtime", 100.0, 70.0, 0.2)
+    assert not regressed("push_x_realtime", 100.0, 500.0, 0.2)
+
+
+def test_db_levels_compare_by_how_many_db_they_grew():
+    assert regressed("residual_echo_db", -19.1, -5.0, 0.2)
+    assert regressed("user_error_db", -8.0, -1.0, 0.2)
+    assert not regressed("user_error_db", -8.0, -7.0, 0.2)
+    # more suppression is better
+    assert not regressed("residual_echo_db", -19.1, -40.0, 0.2)
+
+
+def test_counts_from_zero_regress_when_they_grow():
+    assert regressed("debounced_false_accepts_per_hour", 0.0, 50.0, 0.2)
+    assert not regressed("debounced_false_accepts_per_hour", 0.0, 0.0, 0.2)
+    assert regressed("hey_jarvis_missed", 0.0, 1.0, 0.2)
+    assert regressed("pooled_peak_kib", 0.0, 4.0, 0.2)
+
+
+def test_compare_reports_each_regression_once():
+    results = {"bench": {"residual_echo_db": -5.0, "read_us_per_chunk": 20.0, "push_x_realtime": 100.0, "new_metric_ms": 1.0}}
+    lines = compare(results, baseline(residual_echo_db=-19.1, read_us_per_chunk=10.0, push_x_realtime=100.0), 0.2)
+    assert lines == [
+        "bench.residual_echo_db: -19.100 -> -5.000 (+14.100)",
+        "bench.read_us_per_chunk: 10.000 -> 20.000 (+100.0%)",
+    ]
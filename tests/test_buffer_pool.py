@@ -0,0 +1,83 @@
+import queue
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import BufferPool, FakeAudioInterface, MicrophoneAudioProcessor, ResamplingProcessor, looped
+
+from .test_daemon import SizedProcessor
+from .test_reframer import ArrayProcessor
+
+
+def read_all_into(processor, buffer):
+    chunks = []
+    while (read := processor.read_chunk_into(buffer)) is not None:
+        chunks.append(buffer[:read].copy())
+    return chunks
+
+
+def test_released_buffers_are_handed_out_again():
+    pool = BufferPool(160, count=2)
+    first, second = pool.acquire(), pool.acquire()
+    assert pool.available == 0
+    # a slice of a pooled buffer, like a read returns, gives the whole buffer back
+    pool.release(first[:100])
+    assert pool.acquire() is first
+    pool.release(first)
+    pool.release(second)
+    assert pool.stats() == {'size': 160, 'allocated': 2, 'available': 2, 'grown': 0}
+
+
+def test_an_empty_pool_grows_or_waits():
+    pool = BufferPool(10, count=1)
+    pool.acquire()
+    extra = pool.acquire()
+    assert len(extra) == 10 and pool.stats()['grown'] == 1 and pool.allocated == 2
+
+    fixed = BufferPool(10, count=1, grow=False)
+    fixed.acquire()
+    with pytest.raises(queue.Empty):
+        fixed.acquire(timeout=0.01)
+    with pytest.raises(queue.Empty):
+        fixed.acquire(block=False)
+
+
+def test_the_default_read_chunk_into_copies_read_chunk():
+    samples = np.arange(1000, dtype=np.int16)
+    buffer = np.zeros(300, np.int16)
+    chunks = read_all_into(ArrayProcessor(samples, 300), buffer)
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    np.testing.assert_array_equal(np.concatenate(chunks), samples)
+
+
+def test_microphone_reads_into_the_buffer():
+    samples = np.arange(800, dtype=np.int16)
+    interface = FakeAudioInterface(looped(samples), realtime=False, max_frames=800)
+    microphone = MicrophoneAudioProcessor(chunk_size=160, rate=16000, callback=True, audio_interface=interface)
+    buffer = np.zeros(microphone.chunk_samples, np.int16)
+    chunks = []
+    while (read := microphone.read_chunk_into(buffer, timeout=5)) is not None:
+        chunks.append(buffer[:read].copy())
+    microphone.close()
+    np.testing.assert_array_equal(np.concatenate(chunks), samples)
+
+
+@pytest.mark.parametrize("in_rate, channels", [(48000, 1), (44100, 2), (16000, 1)])
+def test_resampling_into_a_buffer_matches_read_chunk(in_rate, channels):
+    samples = (np.random.default_rng(0).standard_normal(4410 * channels) * 3000).astype(np.int16)
+
+    def resampler():
+        source = SizedProcessor(samples, 441 * channels)
+        source.sample_rate, source.channels = in_rate, channels
+        return ResamplingProcessor(source, sample_rate=16000)
+
+    expected = []
+    processor = resampler()
+    while (chunk := processor.read_chunk()) is not None:
+        expected.append(chunk.copy())
+
+    processor = resampler()
+    # chunk_samples is enough for any chunk, the flushed tail included
+    buffer = np.zeros(processor.chunk_samples, np.int16)
+    chunks = read_all_into(processor, buffer)
+    np.testing.assert_array_equal(np.concatenate(chunks), np.concatenate(expected))
@@ -0,0 +1,90 @@
+import threading
+
+import numpy as np
+
+from open_voice_pilot.assistant import AssistantDaemon
+from open_voice_pilot.assistant.daemon import capture_pool
+
+from .test_reframer import ArrayProcessor
+
+
+class FakeSpeaker:
+    def __init__(self):
+        self.stops = 0
+
+    def stop(self):
+        self.stops += 1
+
+
+class FakeMemory:
+    def stats(self):
+        return {}
+
+
+class FakeJarvis:
+    """
+    Passes every chunk's sum down the stages, and says it
+    """
+    def __init__(self):
+        self.speaker = FakeSpeaker()
+        self.memory = FakeMemory()
+        self.tts_cache = None
+        self.spoken = []
+        self.closed = False
+
+    def detect(self, chunk):
+        yield int(chunk.sum())
+
+    def transcribe(self, total):
+        return total
+
+    def chat(self, total):
+        return total
+
+    def speak(self, total):
+        self.spoken.append(total)
+
+    def duplex_stats(self):
+        return {}
+
+    def close(self):
+        self.closed = True
+
+
+class SizedProcessor(ArrayProcessor):
+    @property
+    def chunk_samples(self):
+        return self.chunk_size
+
+
+class EndlessProcessor(ArrayProcessor):
+    def read_chunk(self):
+        self.position = 0
+        return super().read_chunk()
+
+
+def test_a_file_source_is_served_to_the_end():
+    samples = np.arange(16000, dtype=np.int16) % 100
+    jarvis = FakeJarvis()
+    daemon = AssistantDaemon(jarvis, SizedProcessor(samples, 800), live=False)
+    daemon.run()
+    # nothing dropped on the way, and every pooled buffer came back
+    assert jarvis.spoken == [int(samples[i:i + 800].sum()) for i in range(0, 16000, 800)]
+    stats = daemon.stats()
+    assert all(stats[stage]["dropped"] == 0 for stage in ("detect", "asr", "llm", "tts"))
+    assert stats["buffers"]["available"] == stats["buffers"]["allocated"]
+    assert jarvis.closed and jarvis.speaker.stops == 1
+
+
+def test_stop_ends_a_live_run():
+    jarvis = FakeJarvis()
+    daemon = AssistantDaemon(jarvis, EndlessProcessor(np.ones(800, np.int16), 800))
+    threading.Timer(0.2, daemon.stop).start()
+    daemon.run()
+    assert not daemon.running()
+    assert jarvis.closed
+
+
+def test_sources_without_a_chunk_size_read_without_a_pool():
+    assert capture_pool(ArrayProcessor(np.zeros(10, np.int16), 5)) is None
+    assert capture_pool(SizedProcessor(np.zeros(10, np.int16), 5)).size == 5
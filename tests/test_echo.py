@@ -0,0 +1,53 @@
+import numpy as np
+
+from open_voice_pilot.audio_processing.echo import EchoSuppressor
+
+SAMPLE_RATE = 16000
+CHUNK = 320
+
+
+def power(samples):
+    return np.mean(samples.astype(np.float64) ** 2)
+
+
+def echo_of(reference, delay, gain=0.5):
+    captured = np.zeros_like(reference)
+    captured[delay:] = (reference[:-delay] * gain).astype(np.int16)
+    return captured
+
+
+def run(echo, captured):
+    return np.concatenate([echo.process(captured[i:i + CHUNK]) for i in range(0, len(captured), CHUNK)])
+
+
+def test_without_reference_audio_passes_through_delayed():
+    rng = np.random.default_rng(0)
+    captured = (rng.standard_normal(SAMPLE_RATE) * 3000).astype(np.int16)
+    echo = EchoSuppressor(SAMPLE_RATE)
+    out = run(echo, captured)
+    assert len(out) == len(captured)
+    np.testing.assert_array_equal(out[echo.latency:], captured[:-echo.latency])
+
+
+def test_echo_residual_is_suppressed():
+    rng = np.random.default_rng(1)
+    reference = (rng.standard_normal(4 * SAMPLE_RATE) * 3000).astype(np.int16)
+    captured = echo_of(reference, delay=160)
+    echo = EchoSuppressor(SAMPLE_RATE)
+    echo.add_reference(reference, echo.capture_index)
+    out = run(echo, captured)
+    assert echo.delay == 160
+    # once the delay and echo path have settled
+    assert 10 * np.log10(power(out[-SAMPLE_RATE:]) / power(captured[-SAMPLE_RATE:])) < -30
+
+
+def test_near_end_speech_survives_the_echo():
+    rng = np.random.default_rng(2)
+    reference = (rng.standard_normal(4 * SAMPLE_RATE) * 3000).astype(np.int16)
+    echo_only = echo_of(reference, delay=160)
+    tone = (2000 * np.sin(2 * np.pi * 440 * np.arange(len(reference)) / SAMPLE_RATE)).astype(np.int16)
+    echo = EchoSuppressor(SAMPLE_RATE)
+    echo.add_reference(reference, echo.capture_index)
+    out = run(echo, (echo_only + tone).astype(np.int16))
+    residual = out[echo.latency:].astype(np.float64) - tone[:-echo.latency]
+    assert 10 * np.log10(power(residual[-SAMPLE_RATE:]) / power(echo_only[-SAMPLE_RATE:])) < -6
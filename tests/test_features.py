@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import EnergyVAD, FeatureFrontend
+
+from .test_vad import speech_and_silence
+
+
+def push_in_chunks(frontend, audio, chunk_size):
+    for start in range(0, len(audio), chunk_size):
+        frontend.push(audio[start:start + chunk_size])
+
+
+def test_frames_do_not_depend_on_how_the_audio_is_split():
+    audio = speech_and_silence()
+    whole = FeatureFrontend(history_frames=1000)
+    whole.push(audio)
+    split = FeatureFrontend(history_frames=1000)
+    push_in_chunks(split, audio, 333)
+    assert whole.end_index == split.end_index == len(audio) // 160
+    a, b = whole.read(0, whole.end_index), split.read(0, split.end_index)
+    for name in ("power", "mel", "level_db"):
+        np.testing.assert_allclose(getattr(a, name), getattr(b, name), rtol=1e-5, atol=1e-5)
+
+
+def test_levels_match_the_energy_vad():
+    audio = speech_and_silence()
+    vad = EnergyVAD()
+    frontend = FeatureFrontend(hop=vad.frame_size, history_frames=1000)
+    consumer = frontend.add_consumer()
+    push_in_chunks(frontend, audio, 800)
+    block = consumer.read()
+    np.testing.assert_allclose(block.level_db, vad.frame_levels(audio), atol=1e-4)
+    np.testing.assert_array_equal(vad.feature_mask(block), vad.speech_mask(audio))
+
+
+def test_spectra_are_scaled_to_full_scale_one():
+    frontend = FeatureFrontend(window=512, hop=512, n_fft=512)
+    # a full scale sine right on bin 32
+    t = np.arange(4 * 512)
+    frontend.push((np.sin(2 * np.pi * 32 * t / 512) * 32767).astype(np.int16))
+    block = frontend.read(1, frontend.end_index)
+    peak = block.power[:, 32]
+    # amplitude 1 through a Hann window: (sum(hann) / 2) ** 2
+    np.testing.assert_allclose(peak, (frontend.hann.sum() / 2) ** 2, rtol=1e-3)
+    assert block.level_db == pytest.approx(-3.01, abs=0.01)
+
+
+def test_consumers_read_at_their_own_pace_and_count_lost_frames():
+    frontend = FeatureFrontend(history_frames=10)
+    fast, slow = frontend.add_consumer(), frontend.add_consumer()
+    frontend.push(np.ones(160 * 4, np.int16))
+    assert len(fast.read(max_frames=3)) == 3
+    assert len(fast.read()) == 1 and fast.read() is None
+
+    block = slow.read()
+    frontend.push(np.ones(160 * 20, np.int16))
+    # blocks are copies, later pushes don't change them
+    level = block.level_db.copy()
+    frontend.push(np.full(160 * 20, 1000, np.int16))
+    np.testing.assert_array_equal(block.level_db, level)
+    block = slow.read()
+    assert slow.lost_frames == 30 and block.start == 34 and len(block) == 10
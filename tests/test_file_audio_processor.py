@@ -0,0 +1,95 @@
+import shutil
+import subprocess
+import sys
+import wave
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import FileAudioProcessor
+from open_voice_pilot.audio_processing.audio_processor import drain
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs the ffmpeg binary")
+
+
+def write_wav(path, samples, sample_rate):
+    """
+    Writes int16 samples of shape (frames,) or (frames, channels) as a wav file
+    """
+    samples = np.asarray(samples, np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1 if samples.ndim == 1 else samples.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+    return path
+
+
+def read_all(processor):
+    chunks = []
+    while (chunk := processor.read_chunk()) is not None:
+        chunks.append(chunk)
+    processor.close()
+    return chunks
+
+
+@pytest.fixture
+def stereo(tmp_path):
+    samples = (np.random.default_rng(0).standard_normal((48000, 2)) * 3000).astype(np.int16)
+    return write_wav(tmp_path / "stereo.wav", samples, 48000), samples
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("streaming", [True, False])
+def test_reads_the_whole_file_in_chunks_of_frames(stereo, streaming):
+    path, samples = stereo
+    processor = FileAudioProcessor(str(path), chunk_size=1000, sample_rate=48000, channels=2, streaming=streaming)
+    assert processor.chunk_samples == 2000
+    chunks = read_all(processor)
+    assert all(len(chunk) == 2000 for chunk in chunks)
+    np.testing.assert_array_equal(np.concatenate(chunks), samples.reshape(-1))
+
+
+@needs_ffmpeg
+def test_read_chunk_into_fills_the_buffer(stereo):
+    path, samples = stereo
+    processor = FileAudioProcessor(str(path), chunk_size=1000, sample_rate=48000, channels=2)
+    buffer = np.zeros(processor.chunk_samples, np.int16)
+    out = []
+    while (read := processor.read_chunk_into(buffer)) is not None:
+        out.append(buffer[:read].copy())
+    processor.close()
+    np.testing.assert_array_equal(np.concatenate(out), samples.reshape(-1))
+
+
+@needs_ffmpeg
+def test_close_before_the_end_stops_the_decoder(stereo):
+    path, _ = stereo
+    processor = FileAudioProcessor(str(path), chunk_size=100, sample_rate=48000, channels=2, read_ahead=2)
+    assert processor.read_chunk() is not None
+    process = processor.process
+    processor.close()
+    assert process.poll() is not None
+
+
+@needs_ffmpeg
+def test_decode_errors_are_raised_at_the_end(tmp_path):
+    import ffmpeg
+    path = tmp_path / "broken.wav"
+    path.write_bytes(b"not audio" * 100)
+    processor = FileAudioProcessor(str(path), sample_rate=16000, channels=1)
+    with pytest.raises(ffmpeg.Error) as error:
+        read_all(processor)
+    assert error.value.stderr
+
+
+def test_drain_keeps_a_process_from_blocking_on_stderr():
+    # more than a pipe buffer on stderr before anything on stdout
+    script = "import sys; sys.stderr.write('x' * 1000000); sys.stderr.flush(); sys.stdout.write('done')"
+    process = subprocess.Popen([sys.executable, "-c", script], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr = drain(process.stderr)
+    assert process.stdout.read() == b"done"
+    assert process.wait(timeout=10) == 0
+    assert len(stderr()) == 1000000
+    process.stdout.close()
+    process.stderr.close()
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import decode_wav, encode_wav
+from open_voice_pilot.speech import IncrementalTranscriber, merge_transcripts, transcription_executor
+from open_voice_pilot.stub_server import recognize_tones, synthetic_speech
+
+
+def test_merge_drops_the_repeated_overlap():
+    assert merge_transcripts("what is the weather", "the weather like today") == "what is the weather like today"
+    # compared without case and punctuation
+    assert merge_transcripts("Set a timer.", "timer for ten minutes") == "Set a timer. for ten minutes"
+    assert merge_transcripts("", "hello jarvis") == "hello jarvis"
+    assert merge_transcripts("hello", "jarvis") == "hello jarvis"
+
+
+def test_merge_prefers_the_longest_overlap():
+    assert merge_transcripts("a b a b", "a b a b c") == "a b a b c"
+
+
+def test_windows_are_sent_while_audio_is_still_coming_in():
+    windows = []
+    executor = transcription_executor()
+    transcriber = IncrementalTranscriber(lambda samples: windows.append(len(samples)) or "", executor, sample_rate=100, window_seconds=3, overlap_seconds=1)
+    for _ in range(6):
+        transcriber.feed(np.zeros(100, np.int16))
+    # windows over [0, 300) and [200, 500) went out before the end of speech
+    assert len(transcriber.futures) == 2
+    transcriber.result(timeout=5)
+    # and the tail [400, 600)
+    assert windows == [300, 300, 200]
+    assert len(transcriber.samples()) == 600
+    executor.shutdown()
+
+
+def test_short_utterances_are_sent_whole_at_the_end():
+    windows = []
+    executor = transcription_executor()
+    transcriber = IncrementalTranscriber(lambda samples: windows.append(len(samples)) or "hi", executor, sample_rate=100)
+    transcriber.feed(np.zeros(150, np.int16))
+    assert transcriber.result(timeout=5) == "hi"
+    assert windows == [150]
+    with pytest.raises(ValueError):
+        transcriber.feed(np.zeros(10, np.int16))
+    executor.shutdown()
+
+
+def test_overlapping_windows_merge_to_the_whole_transcript():
+    words = "hello jarvis what is the weather like today in london".split()
+    speech = synthetic_speech(words)
+    executor = transcription_executor()
+    transcriber = IncrementalTranscriber(lambda samples: recognize_tones(samples, 16000), executor, window_seconds=2.0, overlap_seconds=1.0)
+    for start in range(0, len(speech), 1600):
+        transcriber.feed(speech[start:start + 1600])
+    assert transcriber.result(timeout=5) == " ".join(words)
+    assert len(transcriber.futures) > 1
+    executor.shutdown()
+
+
+def test_wav_round_trip():
+    samples = np.arange(-100, 100, dtype=np.int16)
+    decoded, sample_rate, channels = decode_wav(encode_wav(samples, 8000, channels=2))
+    np.testing.assert_array_equal(decoded, samples)
+    assert (sample_rate, channels) == (8000, 2)
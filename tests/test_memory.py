@@ -0,0 +1,125 @@
+import threading
+
+from open_voice_pilot.assistant.memory import ConversationMemory, MESSAGE_OVERHEAD
+
+# 10 words, one token each with count_words
+TURN = " ".join(["word"] * 10)
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def blocked_summarizer():
+    """
+    summarize() that waits for the returned event, counting its calls
+    """
+    release = threading.Event()
+    calls = []
+
+    def summarize(summary, messages):
+        calls.append(list(messages))
+        release.wait(5)
+        return f"summary of {len(messages)} messages"
+    return summarize, release, calls
+
+
+def memory_with(summarize, **kwargs):
+    kwargs.setdefault("token_budget", 200)
+    kwargs.setdefault("count_tokens", count_words)
+    return ConversationMemory(summarize, **kwargs)
+
+
+def test_prompt_stays_under_the_budget_while_summarizing():
+    summarize, release, _ = blocked_summarizer()
+    memory = memory_with(summarize, system="be brief")
+    try:
+        for _ in range(20):
+            messages = memory.prompt(TURN)
+            assert memory.last_prompt_tokens <= memory.token_budget
+            assert messages[0] == {"role": "system", "content": "be brief"}
+            assert messages[-1] == {"role": "user", "content": TURN}
+            # never starts the history with a reply
+            assert messages[1]["role"] == "user"
+            memory.add_turn(TURN, TURN)
+        assert memory.max_prompt_tokens <= memory.token_budget
+    finally:
+        release.set()
+        memory.wait()
+        memory.close()
+
+
+def test_dropped_messages_are_counted_once():
+    summarize, release, _ = blocked_summarizer()
+    memory = memory_with(summarize)
+    try:
+        for _ in range(30):
+            memory.add_turn(TURN, TURN)
+        # each message holds 10 + MESSAGE_OVERHEAD tokens, the new one too
+        fits = (memory.token_budget - (10 + MESSAGE_OVERHEAD)) // (10 + MESSAGE_OVERHEAD)
+        memory.prompt(TURN)
+        memory.prompt(TURN)
+        assert memory.dropped_messages == 60 - fits
+    finally:
+        release.set()
+        memory.wait()
+        memory.close()
+
+
+def test_old_turns_are_folded_into_the_summary():
+    summarize, release, calls = blocked_summarizer()
+    release.set()
+    memory = memory_with(summarize)
+    for _ in range(8):
+        memory.add_turn(TURN, TURN)
+    memory.wait()
+
+    assert memory.summarizations >= 1
+    assert memory.summary.startswith("summary of")
+    # folded down to half of recent_tokens, whole turns at a time
+    assert memory._tokens(memory.messages) <= memory.recent_tokens
+    assert len(memory.messages) % 2 == 0
+    assert sum(len(messages) for messages in calls) + len(memory.messages) == 16
+
+    messages = memory.prompt(TURN)
+    assert messages[0]["role"] == "system" and memory.summary in messages[0]["content"]
+    assert messages[1:-1] == memory.messages
+    memory.close()
+
+
+def test_clear_throws_away_a_summary_in_progress():
+    summarize, release, _ = blocked_summarizer()
+    memory = memory_with(summarize)
+    for _ in range(8):
+        memory.add_turn(TURN, TURN)
+    assert memory.pending is not None
+    memory.clear()
+    release.set()
+    memory.wait()
+    assert memory.summary == ""
+    assert memory.messages == []
+    memory.close()
+
+
+def test_failing_summarizer_keeps_the_turns_and_backs_off(capsys):
+    calls = []
+
+    def summarize(summary, messages):
+        calls.append(messages)
+        raise RuntimeError("service unavailable")
+
+    memory = memory_with(summarize)
+    for _ in range(8):
+        memory.add_turn(TURN, TURN)
+    memory.wait()
+    # more turns within the backoff don't call it again
+    for _ in range(4):
+        memory.add_turn(TURN, TURN)
+    memory.wait()
+
+    assert len(calls) == 1
+    assert memory.stats()["summarize_failures"] == 1
+    assert memory.summary == ""
+    assert len(memory.messages) == 24
+    assert "service unavailable" in capsys.readouterr().out
+    memory.close()
@@ -0,0 +1,74 @@
+import queue
+import time
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import FakeAudioInterface, MicrophoneAudioProcessor, looped, sine_wave
+from open_voice_pilot.audio_processing.audio_processor import paInputOverflow
+
+
+def read_all(microphone):
+    chunks = []
+    while (chunk := microphone.read_chunk(timeout=5)) is not None:
+        chunks.append(chunk)
+    return chunks
+
+
+def test_blocking_reads_return_chunk_size_frames():
+    signal = sine_wave(440.0)
+    microphone = MicrophoneAudioProcessor(chunk_size=160, channels=2, rate=16000, audio_interface=FakeAudioInterface(signal, realtime=False))
+    assert microphone.chunk_samples == 320
+    first, second = microphone.read_chunk(), microphone.read_chunk()
+    np.testing.assert_array_equal(np.concatenate((first, second)), signal(0, 320, 16000, 2))
+    microphone.close()
+
+
+def test_callback_capture_delivers_every_chunk_then_ends():
+    samples = np.arange(4000, dtype=np.int16)
+    interface = FakeAudioInterface(looped(samples), realtime=False, max_frames=4000)
+    microphone = MicrophoneAudioProcessor(chunk_size=400, rate=16000, callback=True, queue_size=16, audio_interface=interface)
+    chunks = read_all(microphone)
+    np.testing.assert_array_equal(np.concatenate(chunks), samples)
+    stats = microphone.stats()
+    assert stats['captured_chunks'] == 10 and stats['dropped_chunks'] == 0
+    # stays at the end
+    assert microphone.read_chunk(timeout=1) is None
+    microphone.close()
+
+
+def test_a_full_queue_drops_and_counts_chunks():
+    interface = FakeAudioInterface(realtime=False, max_frames=400 * 50)
+    microphone = MicrophoneAudioProcessor(chunk_size=400, rate=16000, callback=True, queue_size=4, audio_interface=interface)
+    # the device runs ahead of a consumer that isn't reading
+    while interface.streams[0].is_active():
+        time.sleep(0.01)
+    chunks = read_all(microphone)
+    stats = microphone.stats()
+    assert stats['captured_chunks'] == 50
+    assert stats['dropped_chunks'] == 50 - len(chunks)
+    assert stats['max_queue_depth'] == 4
+    assert stats['overflows'] == 0
+    microphone.close()
+
+
+def test_device_overflows_are_counted_once_per_callback():
+    # a real time device a second away from its first chunk, the callbacks below come first
+    microphone = MicrophoneAudioProcessor(chunk_size=16000, rate=16000, callback=True, queue_size=1, audio_interface=FakeAudioInterface())
+    data = np.zeros(16000, np.int16).tobytes()
+    microphone._stream_callback(data, 16000, {}, paInputOverflow)
+    microphone._stream_callback(data, 16000, {}, paInputOverflow)
+    stats = microphone.stats()
+    assert stats['overflows'] == 2
+    assert stats['dropped_chunks'] == 1
+    microphone.close()
+
+
+def test_a_slow_device_times_out_as_an_underrun():
+    interface = FakeAudioInterface(realtime=True)
+    microphone = MicrophoneAudioProcessor(chunk_size=16000, rate=16000, callback=True, audio_interface=interface)
+    with pytest.raises(queue.Empty):
+        microphone.read_chunk(timeout=0.01)
+    assert microphone.stats()['underruns'] == 1
+    microphone.close()
+    assert microphone.read_chunk(timeout=1) is None
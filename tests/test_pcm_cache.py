@@ -0,0 +1,113 @@
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import FileAudioProcessor, PCMCache, pcm_cache
+
+from .test_file_audio_processor import write_wav
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs the ffmpeg binary")
+
+
+@pytest.fixture
+def tone(tmp_path):
+    samples = (3000 * np.sin(np.arange(16000) / 5)).astype(np.int16)
+    return str(write_wav(tmp_path / "tone.wav", samples, 16000)), samples
+
+
+@needs_ffmpeg
+def test_decodes_once_then_serves_a_memory_map(tmp_path, tone):
+    path, samples = tone
+    cache = PCMCache(str(tmp_path / "cache"))
+    first = cache.load(path, 16000, 1)
+    np.testing.assert_array_equal(first.samples, samples)
+    second = cache.load(path, 16000, 1)
+    assert isinstance(second.samples, np.memmap)
+    np.testing.assert_array_equal(second.samples, samples)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert second.duration == 1.0
+    np.testing.assert_array_equal(second.slice_time(0.5, 0.75), samples[8000:12000])
+
+
+@needs_ffmpeg
+def test_entries_are_per_rate_and_channels(tmp_path, tone):
+    path, _ = tone
+    cache = PCMCache(str(tmp_path / "cache"))
+    cache.load(path, 16000, 1)
+    cache.load(path, 8000, 2)
+    assert len(cache.load(path, 8000, 2).samples) == 2 * 8000
+    assert len(cache.entries()) == 2
+
+
+def test_an_entry_evicted_during_lookup_is_a_miss(tmp_path, tone, monkeypatch):
+    path, _ = tone
+    cache = PCMCache(str(tmp_path / "cache"))
+    key = cache.key(path, 16000, 1)
+    with open(cache.path_for(key), "wb") as f:
+        f.write(b"\0\0")
+
+    # another process evicts it between the lookup and the memory map
+    open_entry = cache._open
+
+    def evicted_meanwhile(entry_path):
+        os.remove(entry_path)
+        return open_entry(entry_path)
+    monkeypatch.setattr(cache, "_open", evicted_meanwhile)
+    assert cache.get(path, 16000, 1) is None
+    assert cache.misses == 1
+
+
+def test_native_format_is_probed_once_and_kept_with_the_entries(tmp_path, tone, monkeypatch):
+    path, _ = tone
+    probes = []
+    monkeypatch.setattr(pcm_cache, "probe_audio", lambda filepath: probes.append(filepath) or (16000, 1))
+    cache_dir = str(tmp_path / "cache")
+    assert PCMCache(cache_dir).native_format(path) == (16000, 1)
+    assert PCMCache(cache_dir).native_format(path) == (16000, 1)
+    assert probes == [path]
+
+    cache = PCMCache(cache_dir)
+    assert [entry.endswith(".format") for _, _, entry in cache.entries()] == [True]
+    cache.clear()
+    assert cache.entries() == []
+
+
+@needs_ffmpeg
+def test_file_audio_processor_with_a_cache_skips_the_probe(tmp_path, tone, monkeypatch):
+    path, samples = tone
+    cache = PCMCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(pcm_cache, "probe_audio", lambda filepath: (16000, 1))
+    FileAudioProcessor(path, cache=cache).close()
+
+    def no_probe(filepath):
+        raise AssertionError("probed a cached file")
+    monkeypatch.setattr(pcm_cache, "probe_audio", no_probe)
+    processor = FileAudioProcessor(path, chunk_size=4000, cache=cache)
+    processor.seek(0.5)
+    np.testing.assert_array_equal(processor.read_chunk(), samples[8000:12000])
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = PCMCache(str(tmp_path / "cache"), max_bytes=2500)
+    for i, key in enumerate("abc"):
+        f, temp_path = cache._temp_file(key)
+        with f:
+            f.write(b"\0" * 1000)
+        os.utime(temp_path, (i, i))
+        cache._commit(temp_path, key)
+        # the commit counts as a use, age it so the order is deterministic
+        os.utime(cache.path_for(key), (i, i))
+    assert cache.open("a") is None
+    assert len(cache.open("b")) == 500
+    assert cache.size() == 2000
+
+
+def test_temp_files_are_unique_and_not_entries(tmp_path):
+    cache = PCMCache(str(tmp_path / "cache"))
+    (f1, first), (f2, second) = cache._temp_file("key"), cache._temp_file("key")
+    f1.close()
+    f2.close()
+    assert first != second
+    assert cache.entries() == []
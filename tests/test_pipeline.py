@@ -0,0 +1,104 @@
+import threading
+import time
+
+import numpy as np
+
+from open_voice_pilot.audio_processing import BufferPool
+from open_voice_pilot.pipeline import Pipeline
+
+from .test_reframer import ArrayProcessor
+
+
+def test_items_pass_through_every_stage_in_order():
+    received = []
+    pipeline = Pipeline(block=True)
+    pipeline.add_stage("double", lambda x: 2 * x)
+    pipeline.add_stage("skip odd tens", lambda x: None if x // 10 % 2 else x)
+    pipeline.add_stage("collect", received.append)
+    pipeline.start()
+    for item in range(30):
+        pipeline.submit(item)
+    pipeline.stop()
+    pipeline.join(5)
+    assert received == [x for x in range(0, 60, 2) if x // 10 % 2 == 0]
+
+
+def test_a_generator_stage_hands_over_any_number_of_items():
+    received = []
+    pipeline = Pipeline(block=True)
+
+    def split(word):
+        yield from word
+    pipeline.add_stage("split", split)
+    pipeline.add_stage("collect", received.append)
+    pipeline.start()
+    pipeline.submit("ab")
+    pipeline.submit("")
+    pipeline.submit("c")
+    pipeline.stop()
+    pipeline.join(5)
+    assert received == ["a", "b", "c"]
+
+
+def test_a_failing_item_is_counted_and_the_stage_carries_on():
+    received = []
+    pipeline = Pipeline(block=True)
+    pipeline.add_stage("invert", lambda x: 1 / x)
+    pipeline.add_stage("collect", received.append)
+    pipeline.start()
+    for item in (1, 0, 2):
+        pipeline.submit(item)
+    pipeline.stop()
+    pipeline.join(5)
+    assert received == [1.0, 0.5]
+    assert pipeline.stats()["invert"]["errors"] == 1
+    assert pipeline.stats()["invert"]["processed"] == 3
+
+
+def test_a_slow_live_stage_drops_instead_of_stalling_the_ones_before_it():
+    gate = threading.Event()
+    pipeline = Pipeline()
+    pipeline.add_stage("fast", lambda x: x)
+    pipeline.add_stage("slow", lambda x: gate.wait(5), queue_size=2)
+    pipeline.start()
+    for item in range(10):
+        pipeline.submit(item, block=True)
+    # the fast stage gets through everything while the slow one sits on its first item
+    deadline = time.monotonic() + 5
+    while pipeline.stats()["fast"]["processed"] < 10 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pipeline.stats()["fast"]["processed"] == 10
+    gate.set()
+    pipeline.stop()
+    pipeline.join(5)
+    stats = pipeline.stats()
+    assert stats["slow"]["dropped"] > 0
+    assert stats["slow"]["processed"] + stats["slow"]["dropped"] == 10
+
+
+def test_feeding_a_file_waits_instead_of_dropping():
+    samples = np.arange(16000, dtype=np.int16)
+    received = []
+    pipeline = Pipeline()
+    pipeline.add_stage("detect", lambda chunk: chunk.copy(), queue_size=1)
+    pipeline.add_stage("asr", received.append, queue_size=1)
+    pipeline.start()
+    pipeline.feed(ArrayProcessor(samples, 160), block=True)
+    pipeline.join(10)
+    np.testing.assert_array_equal(np.concatenate(received), samples)
+    assert pipeline.captured == 100
+    assert all(stage["dropped"] == 0 for stage in pipeline.stats().values())
+
+
+def test_pooled_capture_hands_every_buffer_back():
+    samples = np.arange(8000, dtype=np.int16)
+    pool = BufferPool(160, count=4)
+    total = []
+    pipeline = Pipeline()
+    pipeline.add_stage("sum", lambda chunk: total.append(int(chunk.sum())), queue_size=4)
+    pipeline.start()
+    pipeline.feed(ArrayProcessor(samples, 160), block=True, pool=pool)
+    pipeline.join(10)
+    assert sum(total) == int(samples.sum())
+    stats = pool.stats()
+    assert stats["available"] == stats["allocated"]
@@ -0,0 +1,97 @@
+import shutil
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import FakeAudioInterface, StreamingPlayer
+from open_voice_pilot.stub_server import StubOpenAIServer
+
+from .test_file_audio_processor import write_wav
+
+
+def player(**kwargs):
+    return StreamingPlayer(sample_rate=16000, audio_interface=FakeAudioInterface(realtime=False), **kwargs)
+
+
+def written(player):
+    return np.frombuffer(player.stream.written, np.int16)
+
+
+def test_pcm_split_anywhere_plays_back_unchanged():
+    samples = np.arange(-3000, 3000, dtype=np.int16)
+    data = samples.tobytes()
+    # odd sized chunks cut samples in half
+    chunks = [data[start:start + 333] for start in range(0, len(data), 333)]
+    speaker = player(max_write_ms=5)
+    stats = speaker.play(chunks)
+    np.testing.assert_array_equal(written(speaker), samples)
+    assert stats.audio_seconds == pytest.approx(len(samples) / 16000)
+    assert not stats.interrupted and not speaker.playing
+
+
+def test_playback_waits_for_the_jitter_buffer():
+    writes = []
+    speaker = player(jitter_buffer_ms=50, on_write=lambda pcm, start: writes.append(len(pcm)))
+    fed = []
+
+    def chunks():
+        for _ in range(10):
+            # 10 ms each
+            fed.append(len(writes))
+            yield np.zeros(160, np.int16).tobytes()
+    speaker.play(chunks())
+    # nothing went to the device before 50 ms were buffered
+    assert fed[:5] == [0] * 5 and fed[5] > 0
+    assert sum(writes) == 10 * 320
+
+
+def test_stop_interrupts_a_play_in_progress():
+    speaker = StreamingPlayer(sample_rate=16000, audio_interface=FakeAudioInterface(realtime=True), max_write_ms=10)
+
+    def stop_soon():
+        time.sleep(0.1)
+        speaker.stop()
+    threading.Thread(target=stop_soon).start()
+    stats = speaker.play_array(np.zeros(16000 * 5, np.int16))
+    assert stats.interrupted
+    assert stats.audio_seconds < 1
+    assert stats.stop_latency < 0.1
+
+
+def test_a_stop_between_begin_and_play_skips_the_reply():
+    speaker = player()
+    speaker.begin()
+    speaker.stop()
+    requested = []
+
+    def chunks():
+        requested.append(True)
+        yield b"\0\0"
+    stats = speaker.play(chunks())
+    assert stats.interrupted and not requested
+    # the next reply plays normally
+    assert not speaker.play_array(np.ones(160, np.int16)).interrupted
+    assert len(written(speaker)) == 160
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs the ffmpeg binary")
+def test_encoded_input_is_decoded_as_it_arrives(tmp_path):
+    samples = (3000 * np.sin(np.arange(8000) / 5)).astype(np.int16)
+    data = write_wav(tmp_path / "reply.wav", samples, 16000).read_bytes()
+    speaker = player(input_format='wav')
+    speaker.play(data[start:start + 1000] for start in range(0, len(data), 1000))
+    np.testing.assert_array_equal(written(speaker), samples)
+
+
+def test_the_stub_server_streams_speech_in_timed_chunks():
+    with StubOpenAIServer(tts_first_byte_delay=0.1, tts_chunk_seconds=0.1, tts_speed=10.0, tts_sample_rate=16000) as server:
+        request = urllib.request.Request(f"{server.base_url}/audio/speech", data=b'{"input": "hello there"}', method="POST")
+        with urllib.request.urlopen(request) as response:
+            speaker = player()
+            stats = speaker.play(iter(lambda: response.read1(4096), b""))
+    assert stats.time_to_first_byte >= 0.1
+    assert stats.audio_seconds == pytest.approx(len("hello there") * 0.06, abs=1 / 16000)
+    assert stats.time_to_first_audio < stats.total_time
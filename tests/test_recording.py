@@ -0,0 +1,101 @@
+import contextlib
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import FakeAudioInterface, decode_wav
+from open_voice_pilot.speech import IncrementalTranscriber, transcription_executor
+
+pytest.importorskip("webrtcvad")
+
+
+class FakeTranscriptions:
+    def __init__(self):
+        self.uploads = []
+
+    def create(self, model, file):
+        self.uploads.append(file)
+        return type("Transcript", (), {"text": "what time is it"})()
+
+
+class FakeSpeech:
+    def __init__(self, pcm):
+        self.pcm = pcm
+        self.with_streaming_response = self
+
+    @contextlib.contextmanager
+    def create(self, **kwargs):
+        pcm = self.pcm
+        yield type("Response", (), {"iter_bytes": lambda self, size: (pcm[i:i + size] for i in range(0, len(pcm), size))})()
+
+
+class FakeClient:
+    def __init__(self, reply):
+        self.audio = type("Audio", (), {})()
+        self.audio.transcriptions = FakeTranscriptions()
+        self.audio.speech = FakeSpeech(reply)
+
+
+class FakeMixer:
+    def stop(self):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+    def play_mp3(self, path):
+        pass
+
+    def close(self):
+        pass
+
+
+def jarvis(reply=b"", **kwargs):
+    from open_voice_pilot.assistant import Jarvis
+    assistant = Jarvis(wake_word_model=object(), echo_suppression=False, audio_interface=FakeAudioInterface(realtime=False), **kwargs)
+    client = FakeClient(reply)
+    assistant.warmup.submit("openai client", lambda: client)
+    assistant.warmup.submit("pygame mixer", FakeMixer)
+    return assistant, client
+
+
+def speech(samples=8000):
+    return (np.sin(np.arange(samples) / 10) * 8000).astype(np.int16)
+
+
+def test_utterances_are_uploaded_from_memory_without_touching_disk(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assistant, client = jarvis(reply=speech(2400).tobytes())
+    audio = speech()
+    utterance = assistant.transcribe((assistant.tracer.start_utterance(), audio))
+    assert utterance[1] == "what time is it"
+    name, data = client.audio.transcriptions.uploads[0]
+    samples, sample_rate, channels = decode_wav(data)
+    assert name == "speech.wav" and sample_rate == 16000 and channels == 1
+    np.testing.assert_array_equal(samples, audio)
+    assistant.speak((utterance[0], "it is noon"))
+    assert list(tmp_path.iterdir()) == []
+    assistant.close()
+
+
+def test_record_dir_keeps_each_utterance_and_its_reply(tmp_path):
+    reply = speech(2400)
+    assistant, client = jarvis(reply=reply.tobytes(), record_dir=str(tmp_path))
+    audio = speech()
+    executor = transcription_executor()
+    transcriber = IncrementalTranscriber(assistant.transcribe_window, executor, assistant.sample_rate)
+    transcriber.feed(audio)
+    transcriber.finish_input()
+    trace, text = assistant.transcribe((assistant.tracer.start_utterance(), transcriber))
+    assistant.speak((trace, "it is noon"))
+    executor.shutdown()
+    assistant.close()
+
+    [run] = tmp_path.iterdir()
+    assert sorted(path.name for path in run.iterdir()) == ["00001_input.wav", "00001_reply.wav"]
+    samples, sample_rate, _ = decode_wav((run / "00001_input.wav").read_bytes())
+    np.testing.assert_array_equal(samples, audio)
+    assert sample_rate == 16000
+    samples, sample_rate, _ = decode_wav((run / "00001_reply.wav").read_bytes())
+    np.testing.assert_array_equal(samples, reply)
+    assert sample_rate == 24000
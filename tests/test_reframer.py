@@ -0,0 +1,74 @@
+import numpy as np
+
+from open_voice_pilot.audio_processing import AudioProcessor, Reframer
+
+
+class ArrayProcessor(AudioProcessor):
+    def __init__(self, samples, chunk_size):
+        self.samples = samples
+        self.chunk_size = chunk_size
+        self.position = 0
+        self.reads = 0
+
+    def read_chunk(self):
+        if self.position >= len(self.samples):
+            return None
+        chunk = self.samples[self.position:self.position + self.chunk_size]
+        self.position += self.chunk_size
+        self.reads += 1
+        return chunk
+
+    def close(self):
+        pass
+
+
+def read_all(consumer):
+    frames = []
+    while (frame := consumer.read_chunk()) is not None:
+        frames.append(frame.copy())
+    return frames
+
+
+def test_consumers_read_their_own_frame_sizes_from_one_source():
+    samples = np.arange(4000, dtype=np.int16)
+    source = ArrayProcessor(samples, 800)
+    reframer = Reframer(source, history_samples=4000)
+    wake = reframer.add_consumer(1280)
+    vad = reframer.add_consumer(160, position=0)
+
+    np.testing.assert_array_equal(np.concatenate(read_all(wake)), samples[:3 * 1280])
+    # the source was read once for both
+    assert source.reads == 5
+    vad_frames = read_all(vad)
+    assert len(vad_frames) == 25
+    np.testing.assert_array_equal(np.concatenate(vad_frames), samples)
+
+
+def test_overlapping_frames_with_a_hop():
+    reframer = Reframer(ArrayProcessor(np.arange(10, dtype=np.int16), 3))
+    frames = read_all(reframer.add_consumer(4, hop=2))
+    assert [frame.tolist() for frame in frames] == [[0, 1, 2, 3], [2, 3, 4, 5], [4, 5, 6, 7], [6, 7, 8, 9]]
+
+
+def test_a_consumer_that_fell_behind_skips_to_the_oldest_sample():
+    reframer = Reframer(ArrayProcessor(np.arange(1000, dtype=np.int16), 100), history_samples=300)
+    slow = reframer.add_consumer(100, position=0)
+    fast = reframer.add_consumer(100, position=0)
+    for _ in range(6):
+        fast.read_chunk()
+    frame = slow.read_chunk()
+    assert frame[0] == 300
+    assert slow.lost_samples == 300
+
+
+def test_a_pushed_reframer_returns_none_until_a_frame_is_complete():
+    reframer = Reframer()
+    consumer = reframer.add_consumer(160)
+    reframer.push(np.arange(100, dtype=np.int16))
+    assert consumer.read_chunk() is None
+    reframer.push(np.arange(100, 200, dtype=np.int16))
+    np.testing.assert_array_equal(consumer.read_chunk(), np.arange(160))
+    consumer.seek(150)
+    assert consumer.read_chunk() is None
+    consumer.close()
+    assert reframer.consumers == []
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing.resampler import PolyphaseResampler
+
+
+def split_points(rng, frames, pieces):
+    # random pieces after a few single frames, shorter than the filter
+    points = rng.choice(np.arange(4, frames), pieces - 1, replace=False)
+    return np.sort(np.concatenate(([1, 2, 3], points)))
+
+
+@pytest.mark.parametrize("in_rate, out_rate, channels", [
+    (44100, 16000, 1),
+    (16000, 24000, 1),
+    (48000, 16000, 2),
+    (22050, 44100, 2),
+])
+def test_output_does_not_depend_on_how_the_input_is_split(in_rate, out_rate, channels):
+    rng = np.random.default_rng(in_rate + out_rate + channels)
+    frames = in_rate // 2
+    samples = rng.standard_normal((frames, channels)).astype(np.float32)
+    if channels == 1:
+        samples = samples[:, 0]
+
+    whole = PolyphaseResampler(in_rate, out_rate, channels)
+    expected = np.concatenate((whole.process(samples), whole.flush()))
+
+    split = PolyphaseResampler(in_rate, out_rate, channels)
+    chunks = np.split(samples, split_points(rng, frames, 40))
+    out = [split.process(chunk) for chunk in chunks] + [split.flush()]
+    np.testing.assert_allclose(np.concatenate(out), expected, atol=1e-5)
+
+
+def test_output_frames_matches_process_and_flush_completes_the_ratio():
+    rng = np.random.default_rng(0)
+    resampler = PolyphaseResampler(44100, 16000)
+    total = produced = 0
+    for frames in rng.integers(0, 2000, 50):
+        expected = resampler.output_frames(frames)
+        assert len(resampler.process(np.zeros(frames, np.float32))) == expected
+        total += frames
+        produced += expected
+    produced += len(resampler.flush())
+    assert produced == -(-total * 16000 // 44100)
+
+
+def test_reset_starts_over():
+    rng = np.random.default_rng(1)
+    samples = rng.standard_normal(4410).astype(np.float32)
+    resampler = PolyphaseResampler(44100, 16000)
+    first = resampler.process(samples)
+    resampler.process(rng.standard_normal(1000).astype(np.float32))
+    resampler.reset()
+    np.testing.assert_array_equal(resampler.process(samples), first)
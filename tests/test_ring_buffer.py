@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import RingBuffer
+
+
+def test_keeps_the_last_capacity_samples_by_absolute_index():
+    ring = RingBuffer(10)
+    stream = np.arange(37, dtype=np.int16)
+    for start in range(0, len(stream), 6):
+        ring.append(stream[start:start + 6])
+    assert ring.end_index == 37
+    assert ring.start_index == 27
+    assert len(ring) == 10
+    np.testing.assert_array_equal(ring.get(27, 37), stream[27:])
+    np.testing.assert_array_equal(ring[30:34], stream[30:34])
+    np.testing.assert_array_equal(ring.latest(4), stream[-4:])
+    assert ring[-1] == 36 and ring[28] == 28
+
+
+def test_slices_are_views_unless_they_wrap():
+    ring = RingBuffer(8)
+    ring.append(np.arange(12))
+    # storage holds 8..11 at the start and 4..7 at the end
+    assert np.shares_memory(ring.get(8, 12), ring.data)
+    wrapped = ring.get(6, 10)
+    assert not np.shares_memory(wrapped, ring.data)
+    np.testing.assert_array_equal(wrapped, [6, 7, 8, 9])
+
+
+def test_a_chunk_longer_than_the_buffer_keeps_its_tail():
+    ring = RingBuffer(5)
+    ring.append([1, 2])
+    ring.append(np.arange(100, 112))
+    assert ring.end_index == 14
+    np.testing.assert_array_equal(ring[:], np.arange(107, 112))
+
+
+def test_overwritten_and_missing_samples():
+    ring = RingBuffer(4)
+    ring.append(np.arange(10))
+    with pytest.raises(IndexError):
+        ring.get(5, 8)
+    with pytest.raises(IndexError):
+        ring[10]
+    # the end is clipped like a numpy slice
+    np.testing.assert_array_equal(ring.get(8, 100), [8, 9])
+    assert len(ring.get(9, 9)) == 0
+
+
+def test_entries_of_a_shape():
+    ring = RingBuffer(3, np.float32, (2,))
+    ring.append(np.arange(8, dtype=np.float32).reshape(4, 2))
+    assert ring.get(1, 4).shape == (3, 2)
+    np.testing.assert_array_equal(ring[-1], [6, 7])
+
+
+def test_clear_starts_over():
+    ring = RingBuffer(4)
+    ring.append(np.arange(6))
+    ring.clear()
+    assert len(ring) == 0 and ring.end_index == 0
+    ring.append([7])
+    np.testing.assert_array_equal(ring[:], [7])
@@ -0,0 +1,64 @@
+import csv
+import shutil
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.wake_word import scan
+
+from .test_file_audio_processor import write_wav
+
+
+def test_triggers_count_rising_edges():
+    scores = np.array([0.9, 0.9, 0.1, 0.6, 0.2, 0.7, 0.8], np.float32)
+    assert scan.count_triggers(scores, 0.5) == 3
+    assert scan.count_triggers(scores, 0.95) == 0
+    assert scan.count_triggers(np.zeros(0, np.float32), 0.5) == 0
+
+
+def test_sweep_reports_detection_rate_and_false_accepts_per_hour():
+    results = {
+        "pos1": np.array([0.1, 0.9, 0.1]),
+        "pos2": np.array([0.1, 0.4, 0.1]),
+        # 1800 chunks of 1 s, half an hour
+        "neg": np.tile([0.0, 0.3], 900),
+    }
+    rows = scan.sweep_thresholds(results, ["pos1", "pos2"], ["neg"], [0.2, 0.5], chunk_seconds=1.0)
+    assert rows[0] == {"threshold": 0.2, "detected": 2, "positives": 2, "detection_rate": 1.0,
+                       "false_accepts": 900, "false_accepts_per_hour": 1800.0}
+    assert (rows[1]["detected"], rows[1]["false_accepts"]) == (1, 0)
+
+
+def test_traces_of_files_with_the_same_name_are_kept_apart(tmp_path):
+    first, second = tmp_path / "a" / "x.wav", tmp_path / "b" / "x.wav"
+    results = {str(first): np.array([0.5]), str(second): np.array([0.25, 0.75])}
+    scan.write_traces(results, str(tmp_path / "out"), 0.08)
+    with open(tmp_path / "out" / "traces" / "b" / "x.csv") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["chunk", "time_s", "score"], ["0", "0.000", "0.250000"], ["1", "0.080", "0.750000"]]
+    assert (tmp_path / "out" / "traces" / "a" / "x.csv").exists()
+
+
+def test_audio_files_are_listed_recursively(tmp_path):
+    (tmp_path / "sub").mkdir()
+    for name in ("one.WAV", "sub/two.mp3", "notes.txt"):
+        (tmp_path / name).touch()
+    assert scan.list_audio_files(str(tmp_path)) == [str(tmp_path / "one.WAV"), str(tmp_path / "sub" / "two.mp3")]
+
+
+class LoudnessModel:
+    def reset(self):
+        pass
+
+    def predict(self, chunk):
+        return {"hey_jarvis": float(np.abs(chunk).max()) / 32768}
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs the ffmpeg binary")
+def test_score_file_scores_every_whole_chunk(tmp_path, monkeypatch):
+    samples = np.zeros(1280 * 3 + 100, np.int16)
+    samples[1280:2560] = 16384
+    path = str(write_wav(tmp_path / "clip.wav", samples, 16000))
+    monkeypatch.setattr(scan, "_model", LoudnessModel())
+    monkeypatch.setattr(scan, "_wake_word", "hey_jarvis")
+    assert scan.score_file(path) == (path, pytest.approx(np.array([0.0, 0.5, 0.0])))
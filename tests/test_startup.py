@@ -0,0 +1,48 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from open_voice_pilot.startup import StartupProfiler, Warmup
+
+
+def imported_after(statement):
+    """
+    Modules loaded by running statement in a fresh interpreter
+    """
+    code = f"import sys; {statement}; print(' '.join(sys.modules))"
+    return set(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split())
+
+
+def test_importing_the_package_loads_no_subpackage():
+    modules = imported_after("import open_voice_pilot")
+    assert not {"numpy", "open_voice_pilot.assistant", "open_voice_pilot.audio_processing"} & modules
+
+
+def test_subpackages_load_on_first_use():
+    modules = imported_after("import open_voice_pilot; open_voice_pilot.pipeline")
+    assert "open_voice_pilot.pipeline" in modules
+    assert not {"open_voice_pilot.assistant", "open_voice_pilot.speech", "http.server"} & modules
+
+
+def test_file_only_use_doesnt_import_the_audio_backends():
+    modules = imported_after("import open_voice_pilot.audio_processing")
+    assert not {"pyaudio", "ffmpeg"} & modules
+
+
+def test_warmup_loads_in_the_background_and_times_each_step():
+    profiler = StartupProfiler()
+    warmup = Warmup(profiler)
+    release = threading.Event()
+    warmup.submit("model", lambda: release.wait(5) and "loaded")
+    warmup.submit("broken", lambda: 1 / 0)
+    assert not warmup.futures["model"].done()
+    release.set()
+    assert warmup.result("model") == "loaded"
+    with pytest.raises(ZeroDivisionError):
+        warmup.result("broken")
+    warmup.wait()
+    assert sorted(name for name, *_ in profiler.timings) == ["broken", "model"]
+    assert "model" in profiler.report() and "ready after" in profiler.report()
+    warmup.shutdown()
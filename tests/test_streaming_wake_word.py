@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from open_voice_pilot.wake_word import StreamingWakeWord, WakeWordStream, FRAME_SAMPLES, debounce
+
+from .test_wake_word import QUIET, LOUD, loudness_detector
+
+
+class ScriptedModel:
+    """
+    Stands in for an openwakeword Model, returning the given scores in turn
+    """
+    def __init__(self, scores):
+        self.scores = iter(scores)
+        self.resets = 0
+
+    def predict(self, frame):
+        return {"hey_jarvis": next(self.scores)}
+
+    def reset(self):
+        self.resets += 1
+
+
+def test_debounce_needs_min_frames_of_the_window():
+    scores = [0.9, 0.0, 0.0, 0.9, 0.9, 0.0, 0.9]
+    assert debounce(scores, 0.5).tolist() == [False, False, False, False, True, True, True]
+
+
+def test_streaming_wake_word_detects_once_per_run():
+    scores = [0.9, 0.0, 0.0, 0.9, 0.9, 0.9, 0.0, 0.0, 0.0, 0.9, 0.8]
+    wake = StreamingWakeWord(ScriptedModel(scores))
+    detections = [(i, wake.score(QUIET)) for i in range(len(scores))]
+    detections = [(i, detection) for i, detection in detections if detection is not None]
+    assert [i for i, _ in detections] == [4, 10]
+    assert wake.detections == 2
+
+    _, first = detections[0]
+    assert first.index == 5 * FRAME_SAMPLES
+    # the first frame above threshold in the window, which ended at frame 3
+    assert first.peak_index == 4 * FRAME_SAMPLES
+    assert first.score == np.float32(0.9)
+
+
+def test_streaming_wake_word_reset_forgets_the_debounce():
+    model = ScriptedModel([0.9, 0.9, 0.9, 0.9])
+    wake = StreamingWakeWord(model)
+    assert wake.score(QUIET) is None
+    assert wake.score(QUIET) is not None
+    wake.reset(position=10 * FRAME_SAMPLES)
+    assert model.resets == 1
+    assert wake.score(QUIET) is None
+    detection = wake.score(QUIET)
+    assert detection is not None and detection.index == 12 * FRAME_SAMPLES
+
+
+def test_streaming_wake_word_on_a_batched_stream_across_a_reset():
+    detector = loudness_detector()
+    stream = detector.add_stream("kitchen")
+    wake = StreamingWakeWord(stream)
+    assert isinstance(wake.model, WakeWordStream)
+
+    # two loud frames make a detection
+    detector.feed({"kitchen": np.concatenate((QUIET, LOUD, LOUD))})
+    assert [wake.score(frame) is not None for frame in (QUIET, LOUD, LOUD)] == [False, False, True]
+
+    # loud audio scored but not read yet when the detector resets
+    detector.feed({"kitchen": np.concatenate((LOUD, LOUD))})
+    wake.reset(position=5 * FRAME_SAMPLES)
+    detector.feed({"kitchen": np.concatenate((QUIET, QUIET))})
+    assert [wake.score(QUIET) for _ in range(2)] == [None, None]
+
+    detector.feed({"kitchen": np.concatenate((LOUD, LOUD))})
+    detection = [wake.score(LOUD) for _ in range(2)][-1]
+    assert detection is not None and detection.index == 9 * FRAME_SAMPLES
+
+
+def test_debounce_of_no_scores_is_empty():
+    assert debounce([], 0.5).tolist() == []
+
+
+def test_scan_debounces_like_jarvis_by_default():
+    from open_voice_pilot.wake_word import scan
+    args = scan.parse_args(["corpus"])
+    assert (args.window_frames, args.min_frames) == (3, 2)
+
+
+def test_the_wake_word_hop_has_to_be_whole_model_frames():
+    from open_voice_pilot.cli.jarvis_cli import parse_args
+    assert parse_args(["--wake-word-hop-ms", "160"]).wake_word_hop_ms == 160
+    for hop in ("100", "0"):
+        with pytest.raises(SystemExit):
+            parse_args(["--wake-word-hop-ms", hop])
@@ -0,0 +1,73 @@
+import json
+import urllib.request
+
+import pytest
+
+from open_voice_pilot.pipeline import Tracer
+
+
+def traced(tracer, times, **values):
+    trace = tracer.start_utterance()
+    for event, at in times.items():
+        trace.mark(event, at=at)
+    for name, value in values.items():
+        trace.record(name, value)
+    tracer.finish(trace)
+    return trace
+
+
+def test_stages_are_the_time_between_their_events():
+    tracer = Tracer()
+    trace = traced(tracer, {"speech_end": 1.0, "asr_request": 1.25, "asr_response": 2.0})
+    assert trace.stage_seconds() == {"endpoint_to_asr": 0.25, "asr": 0.75}
+    # the first occurrence counts
+    trace.mark("speech_end", at=5.0)
+    assert trace.events["speech_end"] == 1.0
+    with pytest.raises(ValueError):
+        trace.mark("coffee_break")
+
+
+def test_summary_percentiles_over_utterances():
+    tracer = Tracer()
+    for i in range(1, 101):
+        traced(tracer, {"llm_request": 0.0, "llm_response": i / 1000})
+    summary = tracer.summary()
+    assert list(summary) == ["llm"]
+    assert summary["llm"]["count"] == 100
+    assert summary["llm"]["mean_ms"] == pytest.approx(50.5)
+    assert summary["llm"]["p50_ms"] == pytest.approx(50.5)
+    assert summary["llm"]["p99_ms"] == pytest.approx(99.01)
+
+
+def test_percentiles_cover_the_history_and_counts_everything():
+    tracer = Tracer(history=10)
+    for i in range(30):
+        traced(tracer, {"asr_request": 0.0, "asr_response": 1.0 if i < 20 else 0.001})
+    summary = tracer.summary()["asr"]
+    assert summary["count"] == 30
+    assert summary["p99_ms"] == pytest.approx(1.0)
+
+
+def test_json_export_keeps_recent_utterances_and_their_values(tmp_path):
+    tracer = Tracer()
+    traced(tracer, {"asr_request": 0.0, "asr_response": 0.5}, prompt_tokens=120)
+    path = tmp_path / "trace.json"
+    tracer.write_json(str(path))
+    report = json.loads(path.read_text())
+    assert report["recent"] == [{"utterance": 1, "asr": 500.0, "prompt_tokens": 120}]
+    assert report["stages"]["asr"]["count"] == 1
+
+
+def test_metrics_are_served_in_prometheus_format():
+    tracer = Tracer()
+    traced(tracer, {"tts_first_byte": 0.0, "playback_start": 0.02})
+    tracer.serve(0)
+    try:
+        host, port = tracer.httpd.server_address[:2]
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics") as response:
+            text = response.read().decode()
+    finally:
+        tracer.close()
+    assert 'voice_stage_latency_seconds{stage="playback_start",quantile="0.5"} 0.020000' in text
+    assert 'voice_stage_latency_seconds_count{stage="playback_start"} 1' in text
+    assert tracer.httpd is None
@@ -0,0 +1,95 @@
+import threading
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.speech import TTSCache, normalize_text
+
+
+def speech_bytes(samples=2400):
+    return (np.arange(samples) % 200).astype(np.int16).tobytes()
+
+
+class Synthesizer:
+    def __init__(self, data, chunk_bytes=1000, fail_after=None):
+        self.data = data
+        self.chunk_bytes = chunk_bytes
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def __call__(self, text=None):
+        self.calls += 1
+        for i, start in enumerate(range(0, len(self.data), self.chunk_bytes)):
+            if i == self.fail_after:
+                raise ConnectionError("response cut off")
+            yield self.data[start:start + self.chunk_bytes]
+
+
+def test_a_miss_is_passed_through_and_later_served_from_disk(tmp_path):
+    cache = TTSCache(str(tmp_path), chunk_bytes=700)
+    synthesize = Synthesizer(speech_bytes())
+    assert b"".join(cache.stream("Hello there!", "fable", "tts-1", 24000, synthesize)) == speech_bytes()
+    chunks = list(cache.stream("  hello   THERE! ", "fable", "tts-1", 24000, synthesize))
+    assert synthesize.calls == 1
+    assert all(len(chunk) <= 700 for chunk in chunks)
+    assert b"".join(chunks) == speech_bytes()
+    np.testing.assert_array_equal(cache.get("hello there!", "fable", "tts-1", 24000), np.frombuffer(speech_bytes(), np.int16))
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 1 and stats["hit_rate"] == 0.5
+
+
+def test_voice_model_and_rate_are_part_of_the_key(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    list(cache.stream("hi", "fable", "tts-1", 24000, Synthesizer(speech_bytes())))
+    assert cache.get("hi", "fable", "tts-1", 24000) is not None
+    assert cache.get("hi", "nova", "tts-1", 24000) is None
+    assert cache.get("hi", "fable", "tts-1-hd", 24000) is None
+    assert cache.get("hi", "fable", "tts-1", 16000) is None
+    # punctuation changes how it is spoken
+    assert normalize_text("Hi!") != normalize_text("hi")
+
+
+def test_interrupted_or_failed_responses_are_not_kept(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    stream = cache.stream("stop me", "fable", "tts-1", 24000, Synthesizer(speech_bytes()))
+    next(stream)
+    stream.close()
+    with pytest.raises(ConnectionError):
+        list(cache.stream("fail", "fable", "tts-1", 24000, Synthesizer(speech_bytes(), fail_after=1)))
+    assert cache.get("stop me", "fable", "tts-1", 24000) is None
+    assert cache.get("fail", "fable", "tts-1", 24000) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_least_recently_used_replies_are_evicted(tmp_path):
+    data = speech_bytes(1000)
+    cache = TTSCache(str(tmp_path), max_bytes=2 * len(data))
+    for text in ("one", "two", "three"):
+        list(cache.stream(text, "fable", "tts-1", 24000, Synthesizer(data)))
+    assert cache.get("one", "fable", "tts-1", 24000) is None
+    assert cache.get("three", "fable", "tts-1", 24000) is not None
+    assert cache.size() <= 2 * len(data)
+
+
+def test_prerender_synthesizes_each_phrase_once(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    synthesize = Synthesizer(speech_bytes())
+    assert cache.prerender(["one moment", "sorry?"], "fable", "tts-1", 24000, synthesize) == 2
+    assert cache.prerender(["one moment", "sorry?"], "fable", "tts-1", 24000, synthesize) == 0
+    assert synthesize.calls == 2
+
+
+def test_concurrent_misses_of_the_same_text_each_get_whole_audio(tmp_path):
+    cache = TTSCache(str(tmp_path))
+    results = []
+
+    def speak():
+        results.append(b"".join(cache.stream("same", "fable", "tts-1", 24000, Synthesizer(speech_bytes(), chunk_bytes=10))))
+
+    threads = [threading.Thread(target=speak) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [speech_bytes()] * 4
+    assert bytes(cache.get("same", "fable", "tts-1", 24000)) == speech_bytes()
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from open_voice_pilot.audio_processing import EnergyVAD, frame_view, processor_speech_mask, webrtc_speech_mask
+from open_voice_pilot.stub_server import synthetic_speech
+
+from .test_reframer import ArrayProcessor
+
+
+def speech_and_silence():
+    rng = np.random.default_rng(0)
+    speech = synthetic_speech("hello jarvis what is the weather".split())
+    noise = rng.normal(0, 30, 8000).astype(np.int16)
+    return np.concatenate((noise, speech, noise, speech[:4000], noise))
+
+
+def test_the_batch_mask_matches_frame_by_frame_decisions():
+    audio = speech_and_silence()
+    vad = EnergyVAD()
+    mask = vad.speech_mask(audio)
+    assert len(mask) == len(audio) // 160
+    assert mask.tolist() == [vad.is_speech(frame) for frame in frame_view(audio, 160)]
+    assert vad.is_speech(audio[:160].tobytes()) == mask[0]
+    assert mask.any() and not mask.all()
+
+
+def test_levels_are_in_dbfs():
+    vad = EnergyVAD()
+    full_scale = np.full(160, 32767, np.int16)
+    assert vad.frame_levels(full_scale)[0] == pytest.approx(0.0, abs=0.01)
+    assert vad.frame_levels(full_scale // 100)[0] == pytest.approx(-40.0, abs=0.05)
+
+
+def test_a_processor_read_in_uneven_chunks_gives_the_same_mask():
+    audio = speech_and_silence()
+    vad = EnergyVAD()
+    mask = processor_speech_mask(ArrayProcessor(audio, 1234), vad.speech_mask, vad.frame_size)
+    np.testing.assert_array_equal(mask, vad.speech_mask(audio))
+
+
+def test_the_webrtc_batch_mask_matches_frame_by_frame_calls():
+    webrtcvad = pytest.importorskip("webrtcvad")
+    audio = speech_and_silence()
+    # one Vad for all frames, like the streaming path
+    vad = webrtcvad.Vad(1)
+    expected = [vad.is_speech(frame.tobytes(), 16000) for frame in frame_view(audio, 160)]
+    assert webrtc_speech_mask(webrtcvad.Vad(1), audio).tolist() == expected
+
+
+def test_jarvis_batch_vad_decides_like_the_streaming_path():
+    pytest.importorskip("webrtcvad")
+    from open_voice_pilot.assistant import Jarvis
+    audio = speech_and_silence()
+    decisions = {}
+    for batch_vad in (False, True):
+        jarvis = Jarvis(wake_word_model=object(), echo_suppression=False, batch_vad=batch_vad)
+        decisions[batch_vad] = []
+        for start in range(0, len(audio), 800):
+            jarvis.frames.push(audio[start:start + 800])
+            while (frame := jarvis.vad_frames.read_chunk()) is not None:
+                decisions[batch_vad].append(jarvis.is_speech(frame))
+    assert len(decisions[True]) == len(audio) // 160
+    assert decisions[True] == decisions[False]
@@ -0,0 +1,194 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from open_voice_pilot.wake_word import BatchedWakeWord, FRAME_SAMPLES
+
+QUIET = np.zeros(FRAME_SAMPLES, np.int16)
+LOUD = np.full(FRAME_SAMPLES, 10000, np.int16)
+
+
+def loudness_detector():
+    """
+    BatchedWakeWord whose "hey_jarvis" score is 1 for a loud 80 ms frame and 0 otherwise
+    """
+    def melspectrogram(x):
+        loud = (np.abs(x[:, -FRAME_SAMPLES:]).mean(axis=1) > 3000).astype(np.float32)
+        return np.broadcast_to(loud[:, None, None], (len(x), 5, 32)).copy()
+
+    def embed(x):
+        return np.repeat(x[:, -1, 0, :], 96, axis=1)
+
+    def classify(x):
+        return {"hey_jarvis": x[:, -1, 0]}
+
+    return BatchedWakeWord(melspectrogram, embed, classify, ["hey_jarvis"], np.zeros((16, 96), np.float32))
+
+
+def test_stream_scores_line_up_with_the_chunks_they_end_in():
+    detector = loudness_detector()
+    stream = detector.add_stream("kitchen")
+    audio = np.concatenate((QUIET, LOUD, QUIET, QUIET))
+    detector.feed({"kitchen": audio})
+    scores = [stream.predict(audio[i:i + FRAME_SAMPLES])["hey_jarvis"] for i in range(0, len(audio), FRAME_SAMPLES)]
+    assert scores == [0.0, 1.0, 0.0, 0.0]
+
+
+def test_stream_reset_drops_unread_scores():
+    detector = loudness_detector()
+    stream = detector.add_stream("kitchen")
+    detector.feed({"kitchen": np.concatenate((QUIET, LOUD))})
+    stream.reset()
+    detector.feed({"kitchen": np.concatenate((QUIET, QUIET))})
+    # the loud frame was scored before the reset, it must not show up after it
+    assert [stream.predict(QUIET)["hey_jarvis"] for _ in range(2)] == [0.0, 0.0]
+    detector.feed({"kitchen": LOUD})
+    assert stream.predict(LOUD)["hey_jarvis"] == 1.0
+
+
+def test_stream_reset_keeps_partial_frames_in_line():
+    detector = loudness_detector()
+    stream = detector.add_stream("kitchen")
+    detector.feed({"kitchen": LOUD[:500]})
+    stream.reset()
+    detector.feed({"kitchen": LOUD[500:]})
+    detector.feed({"kitchen": QUIET})
+    # the first frame after the reset ends FRAME_SAMPLES - 500 samples in, within the first chunk read
+    assert stream.predict(QUIET)["hey_jarvis"] == 1.0
+    assert stream.predict(QUIET)["hey_jarvis"] == 0.0
+
+
+def test_stream_drops_scores_of_skipped_audio():
+    detector = loudness_detector()
+    stream = detector.add_stream("kitchen")
+    detector.feed({"kitchen": np.concatenate((LOUD, QUIET, QUIET))})
+    assert stream.predict(QUIET, end_index=3 * FRAME_SAMPLES)["hey_jarvis"] == 0.0
+    assert stream._scores == []
+
+
+def test_streams_are_scored_in_one_batch():
+    detector = loudness_detector()
+    kitchen, office = detector.add_stream("kitchen"), detector.add_stream("office")
+    results = detector.feed({"kitchen": LOUD, "office": QUIET})
+    assert results["kitchen"][0][1]["hey_jarvis"] == 1.0
+    assert results["office"][0][1]["hey_jarvis"] == 0.0
+    assert detector.stats()["batches"] == 1
+    assert kitchen.predict(LOUD)["hey_jarvis"] == 1.0
+    assert office.predict(QUIET)["hey_jarvis"] == 0.0
+
+
+class FakeInterpreter:
+    """
+    Stands in for tflite_runtime's Interpreter, computing something like openwakeword's
+    model of the same file name in numpy: melspectrogram [1, samples] -> [1, 1, frames, 32],
+    embedding_model [n, 76, 32, 1] -> [n, 1, 1, 96], and any other (a wake word)
+    [n, 16, 96] -> [n, 1]. Like tflite, set_tensor rejects input that isn't the shape
+    last allocated, and the melspectrogram only takes one row.
+    """
+    projection = np.random.default_rng(0).normal(0, 0.01, (76 * 32, 96)).astype(np.float32)
+
+    def __init__(self, model_path, num_threads=1):
+        self.kind = os.path.basename(model_path).split(".")[0]
+        self.shape = {"melspectrogram": [1, 1280], "embedding_model": [1, 76, 32, 1]}.get(self.kind, [1, 16, 96])
+        self.allocated = None
+        self.output = None
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self.shape)}]
+
+    def get_output_details(self):
+        return [{"index": 1, "shape": np.array([1, 1])}]
+
+    def resize_tensor_input(self, index, shape, strict=False):
+        self.shape = list(shape)
+
+    def allocate_tensors(self):
+        if self.kind == "melspectrogram" and self.shape[0] != 1:
+            raise RuntimeError("melspectrogram takes one row")
+        self.allocated = list(self.shape)
+
+    def set_tensor(self, index, x):
+        if list(x.shape) != self.allocated:
+            raise ValueError(f"Cannot set tensor: got {list(x.shape)} for input {self.allocated}")
+        self.input = x
+
+    def invoke(self):
+        x = self.input
+        if self.kind == "melspectrogram":
+            windows = np.lib.stride_tricks.sliding_window_view(x[0], 512)[::160]
+            energy = np.log1p(np.abs(windows).mean(axis=1))
+            self.output = (energy[:, None] + np.linspace(-1, 1, 32))[None, None].astype(np.float32)
+        elif self.kind == "embedding_model":
+            self.output = (x.reshape(len(x), -1) @ self.projection)[:, None, None]
+        else:
+            self.output = 1 / (1 + np.exp(-x.mean(axis=(1, 2)) * 10))[:, None].astype(np.float32)
+
+    def get_tensor(self, index):
+        return self.output
+
+
+@pytest.fixture
+def fake_tflite(tmp_path, monkeypatch):
+    """
+    Paths of fake openwakeword model files, loaded by FakeInterpreters
+    """
+    pytest.importorskip("openwakeword")
+    interpreter = pytest.importorskip("tflite_runtime.interpreter")
+    monkeypatch.setattr(interpreter, "Interpreter", FakeInterpreter)
+    paths = {}
+    for name in ("melspectrogram", "embedding_model", "hey_jarvis"):
+        paths[name] = tmp_path / f"{name}.tflite"
+        paths[name].touch()
+    return {name: str(path) for name, path in paths.items()}
+
+
+def speech_like(seconds, seed):
+    rng = np.random.default_rng(seed)
+    return (rng.normal(0, 1, seconds * 16000) * np.repeat(rng.uniform(0, 3000, seconds * 4), 4000)).astype(np.int16)
+
+
+def test_batched_tflite_scores_match_openwakeword_per_stream(fake_tflite):
+    from openwakeword.model import Model
+    model_paths = dict(melspec_model_path=fake_tflite["melspectrogram"], embedding_model_path=fake_tflite["embedding_model"])
+    # openwakeword starts its features from random audio
+    np.random.seed(0)
+    detector = BatchedWakeWord.from_openwakeword([fake_tflite["hey_jarvis"]], **model_paths)
+    audio = {name: speech_like(4, seed) for seed, name in enumerate(("kitchen", "office", "garage"))}
+    for name in audio:
+        detector.add_stream(name)
+    scores = {name: [] for name in audio}
+    for start in range(0, 4 * 16000, FRAME_SAMPLES):
+        for name, frames in detector.feed({name: samples[start:start + FRAME_SAMPLES] for name, samples in audio.items()}).items():
+            scores[name] += [frame_scores["hey_jarvis"] for _, frame_scores in frames]
+    # every frame of the three streams in one batch
+    assert detector.stats()["avg_batch_size"] == 3
+
+    for name, samples in audio.items():
+        np.random.seed(0)
+        model = Model(wakeword_models=[fake_tflite["hey_jarvis"]], inference_framework="tflite", **model_paths)
+        expected = [model.predict(samples[start:start + FRAME_SAMPLES])["hey_jarvis"] for start in range(0, len(samples), FRAME_SAMPLES)]
+        # openwakeword starts without the melspectrogram context, the first frame's mel frames
+        # are out of the window after 10 frames and their embeddings out of the features after 16 more
+        np.testing.assert_allclose(scores[name][26:], expected[26:], rtol=1e-5)
+
+
+def packaged_models():
+    try:
+        import openwakeword
+    except ImportError:
+        return []
+    return glob.glob(os.path.join(os.path.dirname(openwakeword.__file__), "resources", "models", "hey_jarvis*.tflite"))
+
+
+@pytest.mark.skipif(not packaged_models(), reason="needs openwakeword's downloaded models")
+def test_batched_streams_with_the_real_models():
+    detector = BatchedWakeWord.from_openwakeword()
+    audio = speech_like(2, 0)
+    for name in ("kitchen", "office"):
+        detector.add_stream(name)
+    results = {}
+    for start in range(0, len(audio), FRAME_SAMPLES):
+        results = detector.feed({"kitchen": audio[start:start + FRAME_SAMPLES], "office": audio[start:start + FRAME_SAMPLES]})
+    assert results["kitchen"][0][1]["hey_jarvis"] == pytest.approx(results["office"][0][1]["hey_jarvis"], abs=1e-5)
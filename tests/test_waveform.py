@@ -0,0 +1,36 @@
+import numpy as np
+
+from open_voice_pilot.audio_processing import WaveformEnvelope
+
+
+def test_columns_hold_the_extremes_of_their_samples():
+    samples = (np.random.default_rng(0).standard_normal(16000) * 3000).astype(np.int16)
+    envelope = WaveformEnvelope(16000, seconds=1.0, columns=100)
+    for start in range(0, len(samples), 333):
+        envelope.push(samples[start:start + 333])
+    columns = samples.reshape(100, 160)
+    minimum, maximum = envelope.snapshot()
+    np.testing.assert_array_equal(minimum, columns.min(axis=1))
+    np.testing.assert_array_equal(maximum, columns.max(axis=1))
+    assert envelope.samples == 16000 and envelope.seconds == 1.0
+
+
+def test_only_the_last_columns_are_kept_and_the_rest_is_nan():
+    envelope = WaveformEnvelope(1000, seconds=1.0, columns=10)
+    envelope.push(np.arange(250, dtype=np.int16))
+    snapshot = envelope.snapshot()
+    # two whole columns so far, the one being filled isn't drawn yet
+    assert np.isnan(snapshot[:, :8]).all()
+    np.testing.assert_array_equal(snapshot[:, 8:], [[0, 100], [99, 199]])
+
+    envelope.push(np.arange(250, 2000, dtype=np.int16))
+    np.testing.assert_array_equal(envelope.snapshot()[0], np.arange(1000, 2000, 100))
+    envelope.clear()
+    assert np.isnan(envelope.snapshot()).all() and envelope.samples == 0
+
+
+def test_interleaved_channels_are_averaged():
+    envelope = WaveformEnvelope(100, seconds=1.0, columns=1, channels=2)
+    stereo = np.stack((np.arange(100), np.arange(100) + 100), axis=1).astype(np.int16)
+    envelope.push(stereo.reshape(-1))
+    np.testing.assert_array_equal(envelope.snapshot()[:, 0], [50, 149])